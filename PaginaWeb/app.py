@@ -1,15 +1,43 @@
-from flask import Flask, render_template, request, jsonify, redirect, url_for, session
+from flask import Flask, Response, render_template, request, jsonify, redirect, url_for, session, send_file, abort, g, has_request_context
+import click
 import os
+import atexit
 import base64
 import io
-from PIL import Image
+from PIL import Image, ImageOps
 import time
 import json
-from datetime import datetime, timedelta
-import onnxruntime as ort
+import mimetypes
+import math
+import hmac
+import random
+import threading
+from datetime import datetime, timedelta, timezone
+from sqlalchemy import func, or_, and_, bindparam, event
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import IntegrityError
 import numpy as np
 from flask_sqlalchemy import SQLAlchemy
-from flask_migrate import Migrate
+from flask_migrate import Migrate, upgrade
+from model_registry import ModelRegistry
+from ttl_cache import TTLCache
+from vote_buffer import CounterBuffer
+from sample_buffer import SampleBuffer
+from uploads import parse_streamed_upload, sniff_image_type, ALLOWED_IMAGE_TYPES
+from content_store import ContentStore
+from renditions import RENDITION_FORMATS, RenditionCache, SingleFlight, render_image, rendition_key
+import latent_codec
+import metrics
+from profiling import ProfileStore, ProfileWriter, RequestProfile
+from network_estimator import NetworkEstimator
+import speedtest
+import image_variants
+import static_assets
+from werkzeug.security import safe_join
+from werkzeug.exceptions import RequestEntityTooLarge
+from inference_batcher import InferenceBatcher
+from image_inference import image_to_tensor, tensor_to_image, fixed_spatial_shape, run_tiled
+import enhance_jobs
 
 app = Flask(__name__)
 app.secret_key = 'grupo01'
@@ -20,16 +48,237 @@ app.config['MYSQL_USER'] = 'root'               # Usuario BDD
 app.config['MYSQL_PASSWORD'] = 'root'           # Contraseña BDD
 app.config['MYSQL_DB'] = 'dyzen_db'             # Nombre de la BDD
 
-app.config['SQLALCHEMY_DATABASE_URI'] = 'mysql+pymysql://' + app.config['MYSQL_USER'] + ':' + app.config['MYSQL_PASSWORD'] + '@' + app.config['MYSQL_HOST'] + '/' + app.config['MYSQL_DB']
+app.config['SQLALCHEMY_DATABASE_URI'] = os.environ.get(
+    'DATABASE_URL',  # p.ej. sqlite:///dyzen.db para pruebas y benchmarks
+    'mysql+pymysql://' + app.config['MYSQL_USER'] + ':' + app.config['MYSQL_PASSWORD'] + '@' + app.config['MYSQL_HOST'] + '/' + app.config['MYSQL_DB']
+)
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
 
 db = SQLAlchemy(app)
-migrate = Migrate(app, db)
+migrate = Migrate(app, db, directory=os.path.join(app.root_path, 'migrations'))
+
+# Servicios del proceso (cachés, buffers, sesiones ONNX, colas): se crean en el
+# primer uso con la configuración vigente, así que los cambios de app.config
+# posteriores a la importación (pruebas, scripts) sí se aplican
+_services = {}
+_services_lock = threading.RLock()
+
+def service(name, factory):
+    """Instancia única de un servicio; factory() la crea la primera vez"""
+    instance = _services.get(name)
+    if instance is None:
+        with _services_lock:
+            instance = _services.get(name)
+            if instance is None:
+                instance = _services[name] = factory()
+    return instance
 
 # Configuración
 UPLOAD_FOLDER = 'static/uploads'
 os.makedirs(UPLOAD_FOLDER, exist_ok=True)
 
+# Almacén por contenido: static/uploads/objects/ab/cd/<sha256>.<ext>
+content_store = ContentStore(os.path.join(UPLOAD_FOLDER, 'objects'))
+app.config['CONTENT_STORE_MAX_AGE'] = 365 * 24 * 3600  # los objetos nunca cambian
+
+# Archivos estáticos: ETag fuerte, 304 y copias precomprimidas (flask compress-assets)
+app.config['STATIC_MAX_AGE'] = 0    # resto de estáticos: 0 = revalidar siempre con el ETag
+app.config['STATIC_PRECOMPRESS_DIRS'] = ('models',)   # relativos a static/
+app.config['STATIC_PRECOMPRESS_EXTENSIONS'] = ('.onnx', '.json')
+app.config['USE_X_SENDFILE'] = False  # True detrás de Apache/nginx (X-Sendfile) para no pasar los bytes por Python
+static_etags = static_assets.ETagCache()
+
+# Versiones redimensionadas bajo demanda (/img/<post_id>/<ancho>.<formato>)
+app.config['RENDITION_WIDTHS'] = (320, 480, 640, 960, 1280)
+app.config['FEED_IMAGE_WIDTH'] = 640   # src del feed para navegadores sin srcset (debe estar en RENDITION_WIDTHS)
+app.config['RENDITION_CACHE_DIR'] = os.path.join(app.instance_path, 'renditions')
+app.config['RENDITION_CACHE_MAX_BYTES'] = 512 * 1024 * 1024
+app.config['RENDITION_MAX_AGE'] = 24 * 3600
+rendition_flight = SingleFlight()
+
+def get_rendition_cache():
+    """Caché en disco de las versiones redimensionadas"""
+    return service('rendition_cache', lambda: RenditionCache(
+        app.config['RENDITION_CACHE_DIR'], app.config['RENDITION_CACHE_MAX_BYTES']))
+
+app.config['UPLOAD_MAX_IMAGE_BYTES'] = 64 * 1024 * 1024  # por archivo en subidas binarias
+
+# Variante de imagen según la red del cliente (/media/<post_id>, srcset del feed)
+app.config['IMAGE_TIER_MAX_WIDTH'] = {'poor': 480, 'medium': 960}   # ancho máximo del srcset por calidad
+app.config['IMAGE_NEGOTIATED_MAX_AGE'] = 60   # respuestas negociadas: privadas y de vida corta
+
+# Métricas (/metrics en formato Prometheus); deshabilitadas no añaden trabajo por petición
+app.config['METRICS_ENABLED'] = True
+app.config['METRICS_JSON_LOGS'] = False   # una línea JSON por petición con etapas y consultas
+metrics_registry = metrics.MetricsRegistry(enabled=app.config['METRICS_ENABLED'])
+request_latency = metrics_registry.histogram(
+    'dyzen_request_duration_seconds', 'Latencia de las peticiones por ruta', ('endpoint', 'method', 'status'))
+stage_latency = metrics_registry.histogram(
+    'dyzen_stage_duration_seconds', 'Duración de las etapas de procesamiento', ('stage',))
+onnx_run_latency = metrics_registry.histogram(
+    'dyzen_onnx_run_duration_seconds', 'Duración de session.run por modelo', ('model',))
+db_queries_per_request = metrics_registry.histogram(
+    'dyzen_db_queries_per_request', 'Consultas SQL por petición', ('endpoint',), buckets=metrics.COUNT_BUCKETS)
+bytes_written = metrics_registry.counter(
+    'dyzen_bytes_written', 'Bytes escritos a disco', ('kind',))
+image_variants_served = metrics_registry.counter(
+    'dyzen_image_variants_served', 'Imágenes de post servidas por variante y calidad de red', ('variant', 'tier'))
+image_bytes_saved = metrics_registry.counter(
+    'dyzen_image_bytes_saved', 'Bytes ahorrados frente a servir siempre la variante más grande', ('variant',))
+network_samples = metrics_registry.counter(
+    'dyzen_network_samples', 'Mediciones de red recibidas por resultado del encolado', ('outcome',))
+app_events = metrics_registry.counter(
+    'dyzen_events', 'Eventos de la aplicación (subidas, perfiles, errores...) por tipo y nivel', ('event', 'level'))
+stage = metrics.StageTimer(metrics_registry, stage_latency,
+                           lambda: g.get('stage_timings') if has_request_context() else None)
+
+def write_json_log(record):
+    """Escribir una línea de log JSON con marca de tiempo"""
+    print(json.dumps({'ts': round(time.time(), 3), **record}, default=str), flush=True)
+
+def log_event(event, message, level='info', **fields):
+    """
+    Registrar un evento de la aplicación: se cuenta en dyzen_events y se escribe
+    como línea JSON (METRICS_JSON_LOGS) o, si no, como el mensaje legible
+    """
+    app_events.inc(event=event, level=level)
+    if app.config['METRICS_JSON_LOGS']:
+        write_json_log({'event': event, 'level': level, 'message': message, **fields})
+    else:
+        print(message)
+
+# Perfilado de peticiones: forzado por un administrador o por muestreo
+app.config['ADMIN_TOKEN'] = os.environ.get('DYZEN_ADMIN_TOKEN')  # habilita /admin/* y ?profile=1
+app.config['PROFILING_SAMPLE_RATE'] = 0.0        # fracción de peticiones perfiladas al azar (p. ej. 0.01)
+app.config['PROFILING_SAMPLE_INTERVAL_MS'] = 5   # muestreo de la pila para el flame graph
+app.config['PROFILING_MAX_PROFILES'] = 50
+app.config['PROFILING_DIR'] = os.path.join(app.instance_path, 'profiles')
+app.config['PROFILING_MAX_PENDING'] = 20        # perfiles esperando a guardarse; con la cola llena se descartan
+
+def get_profile_store():
+    """Perfiles guardados en PROFILING_DIR"""
+    return service('profile_store', lambda: ProfileStore(
+        app.config['PROFILING_DIR'], app.config['PROFILING_MAX_PROFILES']))
+
+def profile_saved(summary):
+    log_event('profile_saved',
+              f"🔬 Perfil {summary['id']}: {summary['method']} {summary['path']} en {summary['duration_ms']:.1f} ms",
+              profile_id=summary['id'], method=summary['method'], path=summary['path'],
+              duration_ms=summary['duration_ms'])
+
+def profile_save_failed(profile, error):
+    log_event('profile_save_failed', f"Error guardando perfil {profile.id}: {error}", level='error',
+              profile_id=profile.id, error=str(error))
+
+def get_profile_writer():
+    """Hilo que guarda los perfiles fuera de la petición"""
+    return service('profile_writer', lambda: ProfileWriter(
+        get_profile_store(), max_pending=app.config['PROFILING_MAX_PENDING'],
+        on_saved=profile_saved, on_error=profile_save_failed))
+
+# Condiciones de red por cliente (IP), estimadas en memoria a partir de /api/network/update
+app.config['NETWORK_EWMA_ALPHA'] = 0.3       # peso de cada medición nueva
+app.config['NETWORK_HALF_LIFE'] = 120        # segundos en que una estimación pierde la mitad del peso
+app.config['NETWORK_MAX_AGE'] = 30 * 60      # sin mediciones más recientes se usan los valores por defecto
+app.config['NETWORK_MAX_CLIENTS'] = 10000
+
+def get_network_estimator():
+    """Estimador de red por cliente"""
+    return service('network_estimator', lambda: NetworkEstimator(
+        alpha=app.config['NETWORK_EWMA_ALPHA'],
+        half_life=app.config['NETWORK_HALF_LIFE'],
+        max_age=app.config['NETWORK_MAX_AGE'],
+        max_clients=app.config['NETWORK_MAX_CLIENTS']
+    ))
+
+# Ingesta de mediciones: inserción en lote diferida y retención por minuto
+app.config['NETWORK_FLUSH_INTERVAL'] = 5.0      # segundos entre volcados
+app.config['NETWORK_FLUSH_BATCH_SIZE'] = 500    # filas por INSERT (y filas pendientes que fuerzan un volcado)
+app.config['NETWORK_MAX_PENDING'] = 10000       # al 75 % se submuestrea, lleno se descarta
+app.config['NETWORK_RAW_RETENTION'] = 2 * 3600  # segundos de filas crudas (>= NETWORK_MAX_AGE para precalentar)
+app.config['NETWORK_AGGREGATE_RETENTION'] = 30 * 24 * 3600
+app.config['NETWORK_RETENTION_INTERVAL'] = 15 * 60  # cada cuánto el hilo de volcado aplica la retención (0 = solo CLI)
+app.config['SPEEDTEST_DEFAULT_BYTES'] = 1024 * 1024  # /api/speedtest sin ?size=
+
+# Configuración de inferencia ONNX en el servidor
+app.config['ONNX_MODELS_DIR'] = os.path.join(app.root_path, 'static/models')
+app.config['ONNX_INTRA_OP_THREADS'] = 0          # 0 = ONNX Runtime decide
+app.config['ONNX_INTER_OP_THREADS'] = 0
+app.config['ONNX_GRAPH_OPTIMIZATION'] = 'all'    # disable, basic, extended, all
+app.config['ONNX_EXECUTION_MODE'] = 'sequential' # sequential, parallel
+app.config['ONNX_OPTIMIZED_CACHE_DIR'] = None    # p.ej. 'instance/onnx_cache'
+app.config['ONNX_PRELOAD_MODELS'] = False        # cargar todos al iniciar
+app.config['ONNX_WARMUP'] = True                 # inferencia de prueba al precargar
+app.config['ONNX_MODEL_VARIANTS'] = {}            # p.ej. {'espcn': 'int8_static'}; fp32 por defecto
+app.config['ONNX_ARTIFACTS_DIR'] = os.path.join(app.root_path, 'static/models/optimized')  # scripts/build_model_artifacts.py
+
+def get_model_registry():
+    """Sesiones ONNX compartidas por todos los hilos del proceso"""
+    return service('model_registry', lambda: ModelRegistry(
+        app.config['ONNX_MODELS_DIR'],
+        intra_op_threads=app.config['ONNX_INTRA_OP_THREADS'],
+        inter_op_threads=app.config['ONNX_INTER_OP_THREADS'],
+        graph_optimization=app.config['ONNX_GRAPH_OPTIMIZATION'],
+        execution_mode=app.config['ONNX_EXECUTION_MODE'],
+        optimized_cache_dir=app.config['ONNX_OPTIMIZED_CACHE_DIR'],
+        variants=app.config['ONNX_MODEL_VARIANTS'],
+        artifacts_dir=app.config['ONNX_ARTIFACTS_DIR'],
+        run_observer=lambda name, seconds: onnx_run_latency.observe(seconds, model=name)
+    ))
+
+# Micro-batching de peticiones ESPCN concurrentes
+app.config['ESPCN_BATCHING'] = True
+app.config['ESPCN_MAX_BATCH_SIZE'] = 4
+app.config['ESPCN_MAX_WAIT_MS'] = 10
+
+def get_espcn_batcher():
+    """Planificador de micro-lotes de ESPCN"""
+    return service('espcn_batcher', lambda: InferenceBatcher(
+        lambda: get_model_registry().get('espcn'),
+        max_batch_size=app.config['ESPCN_MAX_BATCH_SIZE'],
+        max_wait_ms=app.config['ESPCN_MAX_WAIT_MS'],
+        name='espcn'
+    ))
+
+# Compresión en el servidor con los autoencoders (para clientes sin ONNX en el navegador)
+app.config['AUTOENCODER_LEVELS'] = (8, 16, 32)
+app.config['AUTOENCODER_MAX_BATCH_SIZE'] = 4
+app.config['AUTOENCODER_MAX_WAIT_MS'] = 10
+app.config['AUTOENCODER_JPEG_QUALITY'] = 95   # igual que toDataURL(..., 0.95) en el cliente
+app.config['THUMBNAIL_SIZE'] = 400
+app.config['AUTOENCODER_MAX_SIZE'] = (1024, 1024)   # alto, ancho máximos con ejes dinámicos
+app.config['AUTOENCODER_SPATIAL_MULTIPLE'] = 8      # tres reducciones x2 en el codificador
+app.config['AUTOENCODER_STORAGE'] = 'jpeg'    # jpeg, latent (.dzl decodificado bajo demanda)
+
+def get_autoencoder_batchers():
+    """Planificador por nivel de compresión de AUTOENCODER_LEVELS"""
+    return service('autoencoder_batchers', lambda: {
+        level: InferenceBatcher(
+            lambda level=level: get_model_registry().get(f'autoencoder_b{level}'),
+            max_batch_size=app.config['AUTOENCODER_MAX_BATCH_SIZE'],
+            max_wait_ms=app.config['AUTOENCODER_MAX_WAIT_MS'],
+            name=f'autoencoder_b{level}'
+        )
+        for level in app.config['AUTOENCODER_LEVELS']
+    })
+
+# Inferencia ESPCN por mosaicos solapados (ignora TILE_SIZE si el modelo tiene entrada fija)
+app.config['ESPCN_TILED'] = True
+app.config['ESPCN_TILE_SIZE'] = 256
+app.config['ESPCN_TILE_HALO'] = 8
+app.config['ESPCN_TILE_BATCH'] = 4
+app.config['ESPCN_JPEG_QUALITY'] = 75
+
+# Mejora asíncrona: /api/enhance encola y el cliente consulta /api/enhance/<id>/status
+app.config['ENHANCE_ASYNC'] = True
+app.config['ENHANCE_EXECUTOR'] = 'process'      # process, thread
+app.config['ENHANCE_WORKERS'] = 2
+app.config['ENHANCE_QUEUE_BACKEND'] = 'memory'  # memory, sqlite
+app.config['ENHANCE_QUEUE_DB'] = os.path.join(app.instance_path, 'enhance_jobs.sqlite')
+app.config['ENHANCE_STALE_AFTER'] = 60          # s sin latido para reencolar un trabajo (cola sqlite)
+app.config['ENHANCE_FINISHED_TTL'] = 3600       # s que se recuerdan los trabajos terminados (cola memory)
+app.config['ENHANCE_MAX_FINISHED'] = 1000
+
 # Modelos de base de datos
 class Post(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -45,6 +294,27 @@ class Post(db.Model):
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     subreddit = db.Column(db.String(50), default='pics')
     post_metadata = db.Column(db.Text)
+    
+    # Campos desnormalizados para el feed (evitan contar comentarios y parsear JSON por post)
+    comment_count = db.Column(db.Integer, default=0, nullable=False, server_default='0')
+    thumbnail_path = db.Column(db.String(255))
+    processing_method = db.Column(db.String(50))
+    model_used = db.Column(db.String(100))
+    espcn_applied = db.Column(db.Boolean, default=False, nullable=False, server_default='0')
+    
+    # Ordenaciones del feed: puntuación neta y ranking "hot"
+    score = db.Column(db.Integer, default=0, nullable=False, server_default='0')
+    hot_score = db.Column(db.Float, default=0.0, nullable=False, server_default='0')
+    
+    # Índices compuestos para paginación por cursor (orden, id) con y sin subreddit
+    __table_args__ = (
+        db.Index('ix_post_hot', 'hot_score', 'id'),
+        db.Index('ix_post_top', 'score', 'id'),
+        db.Index('ix_post_new', 'created_at', 'id'),
+        db.Index('ix_post_subreddit_hot', 'subreddit', 'hot_score', 'id'),
+        db.Index('ix_post_subreddit_top', 'subreddit', 'score', 'id'),
+        db.Index('ix_post_subreddit_new', 'subreddit', 'created_at', 'id'),
+    )
 
     def __repr__(self):
         return f"Post('{self.title}', '{self.created_at}')"
@@ -66,10 +336,13 @@ class Vote(db.Model):
     user_ip = db.Column(db.String(50))
     vote_type = db.Column(db.String(10))
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    # 'post:<id>' o 'comment:<id>': nunca NULL, a diferencia de post_id/comment_id
+    target_key = db.Column(db.String(32), nullable=False)
     
-    # Constraints
+    # Constraints (unique_vote no impide duplicados: MySQL trata cada NULL como distinto)
     __table_args__ = (
         db.UniqueConstraint('post_id', 'user_ip', 'comment_id', name='unique_vote'),
+        db.UniqueConstraint('target_key', 'user_ip', name='unique_vote_target'),
     )
 
 class NetworkMetrics(db.Model):
@@ -81,113 +354,797 @@ class NetworkMetrics(db.Model):
     recommended_compression = db.Column(db.Integer)
     timestamp = db.Column(db.DateTime, default=datetime.utcnow)
 
+class NetworkMetricsMinute(db.Model):
+    """Mediciones de red agregadas por cliente y minuto (retención larga)"""
+    id = db.Column(db.Integer, primary_key=True)
+    minute = db.Column(db.DateTime, nullable=False, index=True)
+    user_ip = db.Column(db.String(50))
+    samples = db.Column(db.Integer, nullable=False, default=0)
+    bandwidth_sum = db.Column(db.Float, nullable=False, default=0.0)
+    bandwidth_min = db.Column(db.Float)
+    bandwidth_max = db.Column(db.Float)
+    latency_sum = db.Column(db.Float, nullable=False, default=0.0)
+    latency_min = db.Column(db.Float)
+    latency_max = db.Column(db.Float)
+    
+    __table_args__ = (
+        db.UniqueConstraint('minute', 'user_ip', name='unique_network_minute'),
+    )
+
+class StoredImage(db.Model):
+    """Objeto del almacén por contenido y número de posts que lo referencian"""
+    digest = db.Column(db.String(64), primary_key=True)
+    path = db.Column(db.String(255), nullable=False, unique=True)
+    size = db.Column(db.Integer)
+    ref_count = db.Column(db.Integer, default=0, nullable=False, server_default='0')
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
 def init_db():
-    """Initializar base de datos"""
-    db.create_all()
+    """Initializar base de datos aplicando las migraciones pendientes (migrations/)"""
+    upgrade()
+
+def load_network_samples(since):
+    """Mediciones de red guardadas desde `since` (epoch), para precalentar el estimador"""
+    rows = db.session.query(NetworkMetrics.user_ip, NetworkMetrics.bandwidth, NetworkMetrics.latency,
+                            NetworkMetrics.timestamp).filter(
+        NetworkMetrics.timestamp >= datetime.utcfromtimestamp(since)
+    ).order_by(NetworkMetrics.timestamp, NetworkMetrics.id).all()
+    # timestamp se guarda con datetime.utcnow (sin zona)
+    return [(row.user_ip, row.bandwidth, row.latency, row.timestamp.replace(tzinfo=timezone.utc).timestamp())
+            for row in rows]
+
+def warm_network_estimator():
+    """Cargar en el estimador las mediciones recientes (una sola vez por proceso)"""
+    if get_network_estimator().warmed:
+        return
+    try:
+        count = get_network_estimator().warm(load_network_samples)
+        if count:
+            log_event('network_estimator_warmed', f"📶 Estimador de red precalentado con {count} mediciones",
+                      samples=count)
+    except Exception as e:
+        db.session.rollback()
+        log_event('network_estimator_warm_failed', f"⚠️  No se pudo precalentar el estimador de red: {e}",
+                  level='warning', error=str(e))
+
+def get_network_conditions(client=None):
+    """Obtener condiciones de red estimadas del cliente (por defecto, el de la petición en curso)"""
+    warm_network_estimator()
+    if client is None and has_request_context():
+        client = request.remote_addr
+    return get_network_estimator().conditions(client)
 
-def get_network_conditions():
-    """Obtener condiciones de red actuales"""
-    return {'quality': 'medium', 'compression': 16, 'bandwidth': 50, 'latency': 100}
+def run_espcn_batch(batch):
+    """Ejecutar un lote NCHW en ESPCN (a través del planificador si está habilitado)"""
+    if app.config['ESPCN_BATCHING']:
+        futures = [get_espcn_batcher().submit(tensor) for tensor in batch]
+        return np.concatenate([future.result() for future in futures], axis=0)
+    return get_model_registry().get('espcn').run(batch)
 
 def enhance_image_espcn(image_path):
     """Mejorar imagen usando modelo ESPCN"""
     try:
         # Cargar imagen en RGB
-        img = Image.open(image_path).convert('RGB')
-        img_array = np.array(img, dtype=np.float32) / 255.0
-        
-        # Reorganizar dimensiones a NCHW
-        input_tensor = np.transpose(img_array, (2, 0, 1))  # HWC to CHW
-        input_tensor = np.expand_dims(input_tensor, 0)     # Add batch dimension
-        
-        # Cargar modelo ONNX
-        model_path = os.path.join(app.root_path, 'static/models/espcn_model.onnx')
-        session = ort.InferenceSession(model_path)
-        
-        # Inferencia
-        input_name = session.get_inputs()[0].name
-        output_name = session.get_outputs()[0].name
-        output_tensor = session.run([output_name], {input_name: input_tensor})[0]
+        with stage('espcn_decode'):
+            img = Image.open(image_path).convert('RGB')
         
-        # Postprocesamiento
-        output_tensor = np.clip(output_tensor, 0, 1) * 255.0
-        output_tensor = output_tensor.squeeze().transpose(1, 2, 0).astype(np.uint8)
-        
-        return Image.fromarray(output_tensor, 'RGB')
+        # Inferencia por mosaicos: memoria proporcional al tamaño del mosaico
+        with stage('espcn_inference'):
+            if app.config['ESPCN_TILED']:
+                model = get_model_registry().get('espcn')
+                return run_tiled(
+                    img, run_espcn_batch,
+                    tile_size=app.config['ESPCN_TILE_SIZE'],
+                    halo=app.config['ESPCN_TILE_HALO'],
+                    batch_size=app.config['ESPCN_TILE_BATCH'],
+                    fixed_shape=fixed_spatial_shape(model.input_shape)
+                )
+            
+            # Imagen completa en un solo tensor NCHW
+            output_tensor = run_espcn_batch(image_to_tensor(img))
+            return tensor_to_image(output_tensor)
         
     except Exception as e:
-        print(f"Error en procesamiento ESPCN: {e}")
+        log_event('espcn_failed', f"Error en procesamiento ESPCN: {e}", level='error', error=str(e))
         raise
 
-def save_base64_image(base64_data, filename_prefix):
-    """Guardar imagen desde datos base64"""
-    try:
-        # Extraer datos de la imagen
+def autoencoder_input_size(width, height):
+    """
+    (ancho, alto) de entrada a los autoencoders
+    
+    Modelos de tamaño fijo: su forma (768x1024, como el cliente). Modelos con
+    ejes dinámicos: la imagen sin ampliar, dentro de AUTOENCODER_MAX_SIZE y
+    redondeada al múltiplo que exigen las reducciones del codificador.
+    """
+    model = get_model_registry().get(f"autoencoder_b{app.config['AUTOENCODER_LEVELS'][0]}")
+    fixed_shape = fixed_spatial_shape(model.input_shape)
+    if fixed_shape:
+        return fixed_shape[1], fixed_shape[0]
+    
+    max_height, max_width = app.config['AUTOENCODER_MAX_SIZE']
+    scale = min(1.0, max_width / width, max_height / height)
+    multiple = app.config['AUTOENCODER_SPATIAL_MULTIPLE']
+    return (max(multiple, int(width * scale) // multiple * multiple),
+            max(multiple, int(height * scale) // multiple * multiple))
+
+def prepare_autoencoder_input(img):
+    """Redimensionar al tamaño de entrada de los autoencoders"""
+    width, height = autoencoder_input_size(img.width, img.height)
+    
+    # En JPEG se decodifica ya reducida
+    if img.format == 'JPEG':
+        img.draft('RGB', (width, height))
+    img = img.convert('RGB')
+    if img.size != (width, height):
+        img = img.resize((width, height), Image.LANCZOS)
+    return img
+
+def compress_image_autoencoder(img, compression_level):
+    """Comprimir una imagen con el autoencoder del nivel indicado (0 = solo redimensionar)"""
+    img = prepare_autoencoder_input(img)
+    if not compression_level:
+        return img
+    
+    output_tensor = get_autoencoder_batchers()[compression_level].submit(image_to_tensor(img)).result()
+    return tensor_to_image(output_tensor)
+
+def encode_image_latent(img, compression_level):
+    """
+    Codificar una imagen a latente .dzl
+    
+    Returns:
+        (bytes del latente, imagen decodificada tal como la verán los usuarios)
+    """
+    model_id = f'autoencoder_b{compression_level}'
+    latent = get_model_registry().get(f'{model_id}_encoder').run(image_to_tensor(prepare_autoencoder_input(img)))
+    data = latent_codec.encode_latent(model_id, latent)
+    return data, decode_latent_bytes(data)
+
+def decode_latent_bytes(data):
+    """Decodificar un latente .dzl a imagen PIL con el decodificador de su modelo"""
+    model_id, latent = latent_codec.decode_latent(data)
+    return tensor_to_image(get_model_registry().get(f'{model_id}_decoder').run(latent))
+
+def encode_jpeg_bytes(img, quality):
+    """Codificar una imagen PIL como JPEG en memoria"""
+    buffer = io.BytesIO()
+    img.save(buffer, 'JPEG', quality=quality)
+    return buffer.getvalue()
+
+def enhance_file_shared(image_path, output_path, options):
+    """Pipeline ESPCN en un hilo del servidor (usa el registro y el micro-batching)"""
+    enhanced_img = enhance_image_espcn(image_path)
+    with stage('espcn_encode'):
+        enhanced_img.save(output_path, 'JPEG', quality=options.get('jpeg_quality', 75))
+    return output_path
+
+def apply_espcn_result(post, enhanced_path, commit=True):
+    """Registrar la imagen mejorada en los metadatos del post (la anterior pierde su referencia)"""
+    metadata = json.loads(post.post_metadata) if post.post_metadata else {}
+    release_stored_image(metadata.get('espcn_enhanced_path'))
+    metadata.update({
+        'espcn_enhanced_path': enhanced_path,
+        'espcn_applied': True,
+        'processing_method': 'server_espcn',
+        'server_processed_at': time.time()
+    })
+    post.post_metadata = json.dumps(metadata)
+    post.espcn_applied = True
+    if commit:
+        db.session.commit()
+
+def finish_enhance_job(post_id, enhanced_path):
+    """Callback del despachador: mover el resultado al almacén y guardarlo en la base de datos"""
+    with app.app_context():
+        try:
+            stored = content_store.put_file(enhanced_path)
+            post = db.session.get(Post, post_id)
+            if post:
+                acquire_stored_image(stored)
+                apply_espcn_result(post, stored.path)
+            return stored.path
+        except Exception:
+            db.session.rollback()
+            raise
+
+def enhance_job_response(post_id, job):
+    """Respuesta JSON común para el estado de un trabajo de mejora"""
+    response = {
+        'success': job['status'] != enhance_jobs.FAILED,
+        'post_id': post_id,
+        'status': job['status'],
+        'status_url': url_for('enhance_status', post_id=post_id)
+    }
+    if job.get('enhanced_path'):
+        response['espcn_enhanced_path'] = job['enhanced_path']
+        response['enhanced_path'] = job['enhanced_path'].replace('static/', '')
+    if job.get('error'):
+        response['error'] = job['error']
+    return response
+
+def create_enhance_job_manager():
+    """Crear la cola de trabajos ESPCN según la configuración"""
+    if app.config['ENHANCE_QUEUE_BACKEND'] == 'sqlite':
+        store = enhance_jobs.SQLiteJobStore(app.config['ENHANCE_QUEUE_DB'],
+                                            stale_after=app.config['ENHANCE_STALE_AFTER'])
+    else:
+        store = enhance_jobs.MemoryJobStore(finished_ttl=app.config['ENHANCE_FINISHED_TTL'],
+                                            max_finished=app.config['ENHANCE_MAX_FINISHED'])
+    
+    options = {
+        'models_dir': app.config['ONNX_MODELS_DIR'],
+        'intra_op_threads': app.config['ONNX_INTRA_OP_THREADS'],
+        'inter_op_threads': app.config['ONNX_INTER_OP_THREADS'],
+        'graph_optimization': app.config['ONNX_GRAPH_OPTIMIZATION'],
+        'optimized_cache_dir': app.config['ONNX_OPTIMIZED_CACHE_DIR'],
+        'variants': app.config['ONNX_MODEL_VARIANTS'],
+        'artifacts_dir': app.config['ONNX_ARTIFACTS_DIR'],
+        'tile_size': app.config['ESPCN_TILE_SIZE'],
+        'tile_halo': app.config['ESPCN_TILE_HALO'],
+        'tile_batch': app.config['ESPCN_TILE_BATCH'],
+        'jpeg_quality': app.config['ESPCN_JPEG_QUALITY']
+    }
+    
+    # En procesos cada worker carga su propia sesión; en hilos se comparte la del servidor
+    if app.config['ENHANCE_EXECUTOR'] == 'process':
+        worker_fn = enhance_jobs.enhance_file
+    else:
+        worker_fn = enhance_file_shared
+    
+    manager = enhance_jobs.EnhanceJobManager(
+        store, worker_fn, options,
+        on_done=finish_enhance_job,
+        workers=app.config['ENHANCE_WORKERS'],
+        executor=app.config['ENHANCE_EXECUTOR'],
+        heartbeat_interval=app.config['ENHANCE_STALE_AFTER'] / 3
+    )
+    # Retomar los trabajos que la cola persistente conserva de la ejecución anterior
+    pending = manager.resume()
+    if pending:
+        log_event('enhance_jobs_resumed', f"🔁 {pending} trabajos de mejora pendientes retomados", pending=pending)
+    return manager
+
+def get_enhance_job_manager():
+    """Cola de trabajos ESPCN (al crearla retoma los pendientes de la cola persistente)"""
+    return service('enhance_job_manager', create_enhance_job_manager)
+
+@app.before_request
+def start_enhance_queue():
+    """En la primera petición, crear la cola ESPCN para que retome los trabajos pendientes"""
+    if 'enhance_job_manager' not in _services:
+        get_enhance_job_manager()
+
+def acquire_stored_image(stored):
+    """Sumar una referencia a un objeto del almacén (se confirma con la transacción actual)"""
+    increment = db.update(StoredImage).where(StoredImage.digest == stored.digest) \
+        .values(ref_count=StoredImage.ref_count + 1)
+    if db.session.execute(increment).rowcount == 0:
+        try:
+            with db.session.begin_nested():
+                db.session.add(StoredImage(digest=stored.digest, path=stored.path,
+                                           size=stored.size, ref_count=1))
+        except IntegrityError:
+            # Otra petición registró el mismo contenido a la vez
+            db.session.execute(increment)
+    if stored.created:
+        bytes_written.inc(stored.size, kind='object')
+    return stored.path
+
+def release_stored_image(path):
+    """Restar una referencia a un objeto del almacén (se confirma con la transacción actual)"""
+    if not path or not content_store.contains(path):
+        return
+    db.session.execute(
+        db.update(StoredImage).where(StoredImage.path == path, StoredImage.ref_count > 0)
+        .values(ref_count=StoredImage.ref_count - 1))
+
+def discard_stored_objects(stored_files):
+    """
+    Deshacer una petición fallida: revertir sus referencias y borrar los
+    objetos que creó si nadie más los referencia
+    """
+    db.session.rollback()
+    for stored in stored_files:
+        if not stored.created:
+            continue
+        row = db.session.get(StoredImage, stored.digest)
+        if row is None or row.ref_count == 0:
+            content_store.remove(stored.path)
+
+def store_base64_image(base64_data):
+    """
+    Guardar una imagen en base64 (data URL) en el almacén por contenido, sin
+    sumar referencias; ValueError si los datos no son válidos
+    """
+    # Extraer datos de la imagen
+    with stage('base64_decode'):
+        if ',' not in base64_data:
+            raise ValueError('Imagen base64 no válida')
         header, data = base64_data.split(',', 1)
         image_data = base64.b64decode(data)
-        
-        # Crear nombre de archivo único
-        timestamp = str(int(time.time()))
-        filename = f"{timestamp}_{filename_prefix}.jpg"
-        filepath = os.path.join(UPLOAD_FOLDER, filename)
-        
-        # Guardar archivo
-        with open(filepath, 'wb') as f:
-            f.write(image_data)
-        
-        # Normalizar ruta para web
-        return filepath.replace('\\', '/')
-        
+    
+    # La extensión sale del contenido real, no de la cabecera declarada
+    ext = ALLOWED_IMAGE_TYPES.get(sniff_image_type(image_data[:16]), '.jpg')
+    with stage('store_write'):
+        return content_store.put_bytes(image_data, ext)
+
+# Columnas necesarias para el feed (sin cargar el JSON de metadatos)
+FEED_COLUMNS = (
+    Post.id, Post.title, Post.image_path, Post.compressed_path,
+    Post.upvotes, Post.downvotes, Post.username, Post.created_at,
+    Post.subreddit, Post.compression_level, Post.comment_count,
+    Post.thumbnail_path, Post.processing_method, Post.model_used, Post.espcn_applied,
+    Post.score, Post.hot_score
+)
+
+# Columna de ordenación de cada modo del feed
+FEED_SORTS = {
+    'hot': Post.hot_score,
+    'top': Post.score,
+    'new': Post.created_at,
+}
+
+# Caché de páginas del feed (por proceso); se invalida al votar, comentar o publicar
+app.config['FEED_CACHE_TTL'] = 15
+app.config['FEED_PAGE_SIZE'] = 20
+app.config['FEED_MAX_PAGE_SIZE'] = 100
+
+def get_feed_cache():
+    """Caché de páginas del feed"""
+    return service('feed_cache', lambda: TTLCache(ttl=app.config['FEED_CACHE_TTL']))
+
+HOT_EPOCH = datetime(2005, 12, 8, 7, 46, 43)
+
+def compute_hot_score(upvotes, downvotes, created_at):
+    """Ranking "hot": orden logarítmico de la puntuación más antigüedad"""
+    score = (upvotes or 0) - (downvotes or 0)
+    order = math.log10(max(abs(score), 1))
+    sign = 1 if score > 0 else -1 if score < 0 else 0
+    seconds = ((created_at or datetime.utcnow()) - HOT_EPOCH).total_seconds()
+    return round(sign * order + seconds / 45000, 7)
+
+def feed_post_data(row):
+    """Diccionario para la plantilla a partir de una fila del feed"""
+    return {
+        'id': row.id,
+        'title': row.title,
+        'image_path': row.image_path,
+        'compressed_path': row.compressed_path,
+        'upvotes': row.upvotes,
+        'downvotes': row.downvotes,
+        'username': row.username,
+        'created_at': row.created_at,
+        'subreddit': row.subreddit,
+        'compression_level': row.compression_level,
+        'score': row.score,
+        'thumbnail_path': row.thumbnail_path,
+        'processing_method': row.processing_method,
+        'model_used': row.model_used,
+        'espcn_applied': row.espcn_applied,
+        'hot_score': row.hot_score,
+        'comment_count': row.comment_count
+    }
+
+def post_columns_from_metadata(metadata):
+    """Valores de las columnas desnormalizadas a partir de los metadatos del cliente"""
+    return {
+        'thumbnail_path': metadata.get('thumbnail_path'),
+        'processing_method': metadata.get('processingMethod', 'onnx_client'),
+        'model_used': metadata.get('modelUsed', 'unknown'),
+        'espcn_applied': bool(metadata.get('espcnApplied') or metadata.get('espcn_applied'))
+    }
+
+def encode_feed_cursor(sort, post_data):
+    """Cursor opaco con el valor de ordenación y el id del último post"""
+    value = post_data[FEED_SORTS[sort].key]
+    if sort == 'new':
+        value = value.isoformat()
+    raw = json.dumps([value, post_data['id']]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+def decode_feed_cursor(sort, cursor):
+    """Decodificar un cursor; ValueError si no es válido"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        value, last_id = json.loads(raw)
+        if sort == 'new':
+            value = datetime.fromisoformat(value)
+        return value, int(last_id)
+    except Exception:
+        raise ValueError('Cursor inválido')
+
+def query_feed(sort='hot', subreddit=None, cursor=None, limit=None):
+    """Página del feed con paginación por cursor (keyset), cacheada en memoria"""
+    if sort not in FEED_SORTS:
+        raise ValueError(f'Orden desconocido: {sort}')
+    limit = min(limit or app.config['FEED_PAGE_SIZE'], app.config['FEED_MAX_PAGE_SIZE'])
+    
+    cache_key = (sort, subreddit, cursor, limit)
+    page = get_feed_cache().get(cache_key)
+    if page is not None:
+        return page
+    
+    column = FEED_SORTS[sort]
+    query = db.session.query(*FEED_COLUMNS)
+    if subreddit:
+        query = query.filter(Post.subreddit == subreddit)
+    if cursor:
+        # Posts estrictamente posteriores al último de la página anterior
+        value, last_id = decode_feed_cursor(sort, cursor)
+        query = query.filter(or_(column < value, and_(column == value, Post.id < last_id)))
+    
+    # Una sola consulta: el número de comentarios ya está en la tabla post
+    rows = query.order_by(column.desc(), Post.id.desc()).limit(limit + 1).all()
+    posts_data = [feed_post_data(row) for row in rows[:limit]]
+    
+    page = {
+        'posts': posts_data,
+        'sort': sort,
+        'subreddit': subreddit,
+        'next_cursor': encode_feed_cursor(sort, posts_data[-1]) if len(rows) > limit else None
+    }
+    get_feed_cache().set(cache_key, page)
+    return page
+
+@event.listens_for(Engine, 'before_cursor_execute')
+def track_request_query(conn, cursor, statement, parameters, context, executemany):
+    """Contar las consultas SQL de la petición en curso (y cronometrarlas si se perfila)"""
+    if not has_request_context():
+        return
+    if metrics_registry.enabled and 'db_queries' in g:
+        g.db_queries += 1
+    if 'profile' in g:
+        conn.info.setdefault('profile_query_started', []).append(time.perf_counter())
+
+@event.listens_for(Engine, 'after_cursor_execute')
+def record_profiled_query(conn, cursor, statement, parameters, context, executemany):
+    if has_request_context() and 'profile' in g and conn.info.get('profile_query_started'):
+        g.profile.record_query(statement, time.perf_counter() - conn.info['profile_query_started'].pop())
+
+def is_admin():
+    """La petición trae el token de administrador (cabecera X-Admin-Token o ?admin_token=)"""
+    token = app.config['ADMIN_TOKEN']
+    provided = request.headers.get('X-Admin-Token') or request.args.get('admin_token')
+    return bool(token and provided) and hmac.compare_digest(token, provided)
+
+def require_admin():
+    if not app.config['ADMIN_TOKEN']:
+        abort(404)
+    if not is_admin():
+        abort(403)
+
+@app.before_request
+def start_profiling():
+    """Perfilar la petición si un administrador lo pide o si cae en el muestreo"""
+    trigger = None
+    if request.headers.get('X-Dyzen-Profile') or request.args.get('profile'):
+        if is_admin():
+            trigger = 'manual'
+    elif app.config['PROFILING_SAMPLE_RATE'] and random.random() < app.config['PROFILING_SAMPLE_RATE'] \
+            and not request.path.startswith(('/static/', '/metrics', '/admin/')):
+        trigger = 'sampled'
+    
+    if trigger:
+        profile = RequestProfile(trigger, app.config['PROFILING_SAMPLE_INTERVAL_MS'] / 1000.0)
+        # El perfilado nunca debe hacer fallar la petición que observa
+        try:
+            started = profile.start()
+        except Exception as e:
+            log_event('profile_start_failed', f"Error iniciando perfil: {e}", level='error', error=str(e))
+            started = False
+        if started:
+            g.profile = profile
+
+@app.after_request
+def tag_profiled_response(response):
+    if 'profile' in g:
+        g.profile_status = response.status_code
+        response.headers['X-Dyzen-Profile-Id'] = g.profile.id
+    return response
+
+@app.teardown_request
+def finish_profiling(exc):
+    """Detener el perfil (también si la petición falló) y encolarlo para guardarlo en segundo plano"""
+    profile = g.pop('profile', None)
+    if profile is None:
+        return
+    try:
+        profile.stop()
+        queued = get_profile_writer().submit(profile, {
+            'method': request.method,
+            'path': request.full_path.rstrip('?'),
+            'endpoint': request.url_rule.rule if request.url_rule else None,
+            'status': g.get('profile_status', 500),
+            'error': str(exc) if exc else None,
+        })
+        if not queued:
+            log_event('profile_dropped', f"⚠️  Perfil {profile.id} descartado: cola de escritura llena",
+                      level='warning', profile_id=profile.id)
     except Exception as e:
-        print(f"Error guardando imagen base64: {e}")
-        return None
+        log_event('profile_save_failed', f"Error guardando perfil: {e}", level='error', error=str(e))
+
+@app.before_request
+def start_request_metrics():
+    # Se lee en cada petición para respetar cambios de METRICS_ENABLED tras la importación
+    metrics_registry.enabled = app.config['METRICS_ENABLED']
+    if metrics_registry.enabled:
+        g.request_started = time.perf_counter()
+        g.db_queries = 0
+        g.stage_timings = {}
+
+@app.after_request
+def record_request_metrics(response):
+    """Latencia por ruta, consultas por petición y, opcionalmente, log JSON"""
+    started = g.get('request_started')
+    if started is None:
+        return response
+    elapsed = time.perf_counter() - started
+    # La regla de la ruta (no la URL) mantiene acotado el número de series
+    endpoint = request.url_rule.rule if request.url_rule else 'sin_ruta'
+    request_latency.observe(elapsed, endpoint=endpoint, method=request.method, status=response.status_code)
+    db_queries_per_request.observe(g.db_queries, endpoint=endpoint)
+    
+    if app.config['METRICS_JSON_LOGS']:
+        write_json_log({
+            'event': 'request',
+            'method': request.method,
+            'path': request.path,
+            'endpoint': endpoint,
+            'status': response.status_code,
+            'duration_ms': round(elapsed * 1000, 3),
+            'db_queries': g.db_queries,
+            'stages_ms': {name: round(seconds * 1000, 3) for name, seconds in g.stage_timings.items()},
+            'response_bytes': response.calculate_content_length(),
+        })
+    return response
+
+@app.route('/metrics')
+def metrics_endpoint():
+    """Métricas del proceso en formato de texto de Prometheus"""
+    if not metrics_registry.enabled:
+        abort(404)
+    return metrics_registry.render(), 200, {'Content-Type': metrics.CONTENT_TYPE}
+
+def request_network_tier():
+    """(calidad, motivo) de la red del cliente para elegir variantes; se calcula una vez por petición"""
+    if 'network_tier' not in g:
+        g.network_tier = image_variants.negotiate_tier(get_network_conditions(), request.headers)
+    return g.network_tier
+
+@app.after_request
+def add_negotiation_headers(response):
+    """Pedir client hints en el HTML y declarar Vary donde la respuesta dependió de la red"""
+    if response.mimetype == 'text/html':
+        response.headers['Accept-CH'] = ', '.join(image_variants.CLIENT_HINTS)
+    if 'network_tier' in g:
+        response.vary.update(image_variants.VARY_HEADERS)
+    return response
+
+@app.endpoint('static')
+def serve_static(filename):
+    """Estáticos con ETag fuerte, 304 condicional, copia gzip/brotli si existe y envío con sendfile"""
+    path = safe_join(app.static_folder, filename)
+    if path is None or not os.path.isfile(path):
+        abort(404)
+    
+    # Los temporales del almacén (subidas en curso o abandonadas) no son públicos
+    if content_store.is_temp('static/' + filename):
+        abort(404)
+    
+    # Los objetos del almacén se llaman como su SHA-256: son inmutables
+    content_addressed = ('static/' + filename).startswith(content_store.root + '/')
+    digest = os.path.splitext(os.path.basename(path))[0] if content_addressed else static_etags.get(path)
+    
+    precompressible = filename.endswith(app.config['STATIC_PRECOMPRESS_EXTENSIONS'])
+    encoding, served_path = (static_assets.precompressed_variant(path, request.accept_encodings)
+                             if precompressible else (None, path))
+    
+    response = send_file(served_path, mimetype=mimetypes.guess_type(path)[0] or 'application/octet-stream',
+                         etag=f"{digest}-{encoding}" if encoding else digest, conditional=True, max_age=None)
+    if encoding:
+        response.headers['Content-Encoding'] = encoding
+    if precompressible:
+        response.vary.add('Accept-Encoding')
+    
+    response.cache_control.public = True
+    response.cache_control.no_cache = None
+    if content_addressed:
+        response.cache_control.max_age = app.config['CONTENT_STORE_MAX_AGE']
+        response.cache_control.immutable = True
+    elif app.config['STATIC_MAX_AGE']:
+        response.cache_control.max_age = app.config['STATIC_MAX_AGE']
+    else:
+        response.cache_control.no_cache = True
+    return response
 
 @app.route('/')
 def index():
     """Página principal estilo Reddit"""
-    posts = Post.query.order_by(Post.upvotes.desc(), Post.created_at.desc()).limit(20).all()
+    try:
+        page = query_feed(
+            sort=request.args.get('sort', 'hot'),
+            subreddit=request.args.get('r'),
+            cursor=request.args.get('cursor')
+        )
+    except ValueError:
+        return redirect(url_for('index'))
     
-    posts_data = []
+    network = get_network_conditions()
+    return render_template('index.html', posts=page['posts'], page=page, network=network,
+                           image_sources=feed_image_sources(page['posts']))
+
+def cached_rendition(key, fmt, render):
+    """(ruta, etag) de una versión en caché; si falta, render() la genera una sola vez"""
+    def generate():
+        # Quien llega tras la generación ya la encuentra en caché
+        cached = get_rendition_cache().get(key)
+        if cached:
+            return cached
+        with stage('rendition_render'):
+            data = render()
+        bytes_written.inc(len(data), kind='rendition')
+        return get_rendition_cache().put(key, data, fmt)
+    
+    return get_rendition_cache().get(key) or rendition_flight.do(key, generate)
+
+def send_cached_rendition(key, fmt, render):
+    """Enviar una versión en caché con ETag fuerte y respuesta 304 condicional"""
+    for _ in range(2):
+        try:
+            path, etag = cached_rendition(key, fmt, render)
+        except FileNotFoundError:
+            # Falta la imagen original del post: no hay nada que generar
+            abort(404)
+        try:
+            return send_file(path, mimetype=RENDITION_FORMATS[fmt][1], etag=etag,
+                             conditional=True, max_age=app.config['RENDITION_MAX_AGE'])
+        except FileNotFoundError:
+            # Expulsada de la caché entre la búsqueda y el envío: regenerar
+            continue
+    abort(503)
+
+def decoded_latent_rendition(path):
+    """(clave de caché, generador) del JPEG decodificado de un latente almacenado"""
+    def render():
+        with open(os.path.join(app.root_path, path), 'rb') as f:
+            return encode_jpeg_bytes(decode_latent_bytes(f.read()), app.config['AUTOENCODER_JPEG_QUALITY'])
+    
+    return rendition_key(path, 'decoded', 'jpg'), render
+
+def post_image_file(path):
+    """Archivo de imagen legible de un post; los latentes se decodifican (y cachean) bajo demanda"""
+    if not latent_codec.is_latent_path(path):
+        return os.path.join(app.root_path, path)
+    
+    key, render = decoded_latent_rendition(path)
+    return cached_rendition(key, 'jpg', render)[0]
+
+def post_source_path(post_id):
+    """Ruta almacenada de la imagen principal de un post (404 si no existe)"""
+    source_path = db.session.query(func.coalesce(Post.compressed_path, Post.image_path)) \
+        .filter(Post.id == post_id).scalar()
+    if not source_path:
+        abort(404)
+    return source_path
+
+@app.route('/img/<int:post_id>/<int:width>.<fmt>')
+def post_rendition(post_id, width, fmt):
+    """Imagen de un post redimensionada y recodificada, con caché en disco y ETag fuerte"""
+    if fmt not in RENDITION_FORMATS or width not in app.config['RENDITION_WIDTHS']:
+        abort(404)
+    
+    source_path = post_source_path(post_id)
+    return send_cached_rendition(
+        rendition_key(source_path, width, fmt), fmt,
+        lambda: render_image(post_image_file(source_path), width, fmt)
+    )
+
+@app.route('/latent/<int:post_id>.jpg')
+def latent_image(post_id):
+    """Imagen de un post almacenado como latente, decodificada bajo demanda y cacheada"""
+    source_path = post_source_path(post_id)
+    if not latent_codec.is_latent_path(source_path):
+        return redirect(url_for('static', filename=source_path.replace('static/', '', 1)))
+    
+    key, render = decoded_latent_rendition(source_path)
+    return send_cached_rendition(key, 'jpg', render)
+
+def rendition_widths():
+    """Anchos del srcset, limitados según la red del cliente"""
+    max_width = app.config['IMAGE_TIER_MAX_WIDTH'].get(request_network_tier()[0])
+    widths = [width for width in app.config['RENDITION_WIDTHS'] if not max_width or width <= max_width]
+    return widths or app.config['RENDITION_WIDTHS'][:1]
+
+def feed_image_sources(posts):
+    """
+    {post_id: {'src', 'jpg', 'webp'}} con la imagen y los srcset de cada post,
+    calculados antes de renderizar: los anchos se resuelven una sola vez por
+    petición y las URL se forman a partir de un único url_for
+    """
+    widths = rendition_widths()
+    # '/img/0/0.jpg' -> '/img' (incluye SCRIPT_NAME si la aplicación no está en la raíz)
+    prefix = url_for('post_rendition', post_id=0, width=0, fmt='jpg').rsplit('/', 2)[0]
+    sources = {}
     for post in posts:
-        post_data = {
-            'id': post.id,
-            'title': post.title,
-            'image_path': post.image_path,
-            'compressed_path': post.compressed_path,
-            'upvotes': post.upvotes,
-            'downvotes': post.downvotes,
-            'username': post.username,
-            'created_at': post.created_at,
-            'subreddit': post.subreddit,
-            'compression_level': post.compression_level,
-            'score': post.upvotes - post.downvotes,
-            'metadata': post.post_metadata
+        base = f"{prefix}/{post['id']}/"
+        sources[post['id']] = {
+            'src': f"{base}{app.config['FEED_IMAGE_WIDTH']}.jpg",
+            'jpg': ', '.join(f"{base}{width}.jpg {width}w" for width in widths),
+            'webp': ', '.join(f"{base}{width}.webp {width}w" for width in widths),
         }
-        
-        # Procesar metadatos si existen
-        if post.post_metadata:
-            try:
-                metadata = json.loads(post.post_metadata)
-                post_data['thumbnail_path'] = metadata.get('thumbnail_path')
-                post_data['processing_method'] = metadata.get('processingMethod', 'onnx_client')
-                post_data['model_used'] = metadata.get('modelUsed', 'unknown')
-                post_data['espcn_applied'] = metadata.get('espcnApplied', False)
-            except:
-                post_data['thumbnail_path'] = None
-                post_data['processing_method'] = 'unknown'
-                post_data['model_used'] = 'unknown'
-                post_data['espcn_applied'] = False
-        
-        # Usar thumbnail si está disponible, sino la imagen comprimida
-        post_data['display_path'] = post_data.get('thumbnail_path') or post_data['compressed_path']
-        
-        # Obtener número de comentarios
-        post_data['comment_count'] = Comment.query.filter_by(post_id=post.id).count()
-        
-        posts_data.append(post_data)
+    return sources
+
+def post_image_variants(post):
+    """Rutas almacenadas de las variantes disponibles de un post (o fila con sus columnas de imagen)"""
+    try:
+        metadata = json.loads(post.post_metadata) if post.post_metadata else {}
+    except ValueError:
+        metadata = {}
+    paths = {
+        'thumbnail': post.thumbnail_path,
+        'compressed': post.compressed_path or post.image_path,
+        'enhanced': metadata.get('espcn_enhanced_path'),
+    }
+    return {name: path for name, path in paths.items()
+            if path and (latent_codec.is_latent_path(path) or os.path.exists(os.path.join(app.root_path, path)))}
+
+def variant_bytes(path):
+    """Bytes que ocupa una variante al servirla (None si es un latente aún sin decodificar)"""
+    if not latent_codec.is_latent_path(path):
+        return os.path.getsize(os.path.join(app.root_path, path))
+    cached = get_rendition_cache().get(decoded_latent_rendition(path)[0])
+    return os.path.getsize(cached[0]) if cached else None
+
+@app.route('/media/<int:post_id>')
+def post_media(post_id):
+    """Imagen del post en la variante adecuada a la red del cliente (?variant= para fijarla)"""
+    row = db.session.query(Post.compressed_path, Post.image_path, Post.thumbnail_path, Post.post_metadata) \
+        .filter(Post.id == post_id).first()
+    if row is None:
+        abort(404)
+    variants = post_image_variants(row)
+    variant = request.args.get('variant')
+    if variant:
+        if variant not in variants:
+            abort(404)
+        tier = 'fixed'
+    else:
+        tier = request_network_tier()[0]
+        variant = image_variants.choose_variant(tier, variants)
+        if variant is None:
+            abort(404)
     
-    network = get_network_conditions()
-    return render_template('index.html', posts=posts_data, network=network)
+    path = post_image_file(variants[variant])
+    served = os.path.getsize(path)
+    image_variants_served.inc(variant=variant, tier=tier)
+    largest = max((size for size in map(variant_bytes, variants.values()) if size is not None), default=served)
+    if largest > served:
+        image_bytes_saved.inc(largest - served, variant=variant)
+    
+    response = send_file(path, conditional=True, etag=True, max_age=app.config['RENDITION_MAX_AGE'])
+    response.headers['X-Dyzen-Variant'] = variant
+    if tier != 'fixed':
+        # Depende de la estimación de este cliente: nunca en cachés compartidas
+        response.cache_control.public = False
+        response.cache_control.private = True
+        response.cache_control.max_age = app.config['IMAGE_NEGOTIATED_MAX_AGE']
+    return response
+
+@app.route('/api/feed')
+def api_feed():
+    """API del feed: ?sort=hot|new|top&subreddit=...&cursor=...&limit=..."""
+    try:
+        page = query_feed(
+            sort=request.args.get('sort', 'hot'),
+            subreddit=request.args.get('subreddit'),
+            cursor=request.args.get('cursor'),
+            limit=request.args.get('limit', type=int)
+        )
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    posts = [dict(post, created_at=post['created_at'].isoformat()) for post in page['posts']]
+    return jsonify(dict(page, posts=posts))
 
 @app.route('/submit', methods=['GET'])
 def submit():
@@ -195,13 +1152,90 @@ def submit():
     network = get_network_conditions()
     return render_template('submit.html', network=network)
 
+def resolve_compression_level(metadata):
+    """Nivel de compresión del cliente, resolviendo "auto" con las condiciones de red"""
+    compression_level = metadata.get('compressionLevel', 16)
+    if compression_level == 'auto':
+        # Obtener condiciones de red actuales para determinar el nivel
+        network_conditions = get_network_conditions()
+        compression_level = network_conditions['compression']
+        # Actualizar metadatos con el nivel resuelto
+        metadata['compressionLevel'] = compression_level
+        metadata['resolvedFromAuto'] = True
+    else:
+        # Asegurar que sea un entero
+        try:
+            compression_level = int(compression_level)
+        except (ValueError, TypeError):
+            compression_level = 16  # Valor por defecto
+    
+    return compression_level
+
+def create_processed_post(form, metadata, compression_level, compressed_path, thumbnail_path, server_processed=False):
+    """Registrar en la base de datos un post con imágenes ya guardadas en disco"""
+    received = {
+        'source': 'server' if server_processed else 'client',
+        'processing_method': metadata.get('processingMethod', 'unknown'),
+        'model_used': metadata.get('modelUsed', 'unknown'),
+        'espcn_applied': metadata.get('espcnApplied', False),
+        'original_size': metadata.get('originalSize', 0),
+        'processed_size': metadata.get('processedSize', 0),
+        'compression_level': compression_level,
+    }
+    log_event('post_received', '\n'.join([
+        f"📥 Recibiendo imagen procesada por {'servidor' if server_processed else 'cliente'}:",
+        f"   Método: {received['processing_method']}",
+        f"   Modelo: {received['model_used']}",
+        f"   ESPCN: {received['espcn_applied']}",
+        f"   Tamaño original: {received['original_size']} bytes",
+        f"   Tamaño procesado: {received['processed_size']} bytes",
+        f"   Nivel de compresión: {compression_level}",
+    ]), **received)
+    
+    compressed_size = os.path.getsize(compressed_path)
+    
+    # Actualizar metadatos con rutas del servidor
+    metadata.update({
+        'thumbnail_path': thumbnail_path,
+        'compressed_path': compressed_path,
+        'server_processed': server_processed,
+        'client_processed': not server_processed,
+        'server_received_at': time.time()
+    })
+    
+    # Guardar en base de datos
+    created_at = datetime.utcnow()
+    new_post = Post(
+        title=form.get('title'),
+        created_at=created_at,
+        hot_score=compute_hot_score(0, 0, created_at),
+        image_path=compressed_path,  # Usar imagen procesada como original
+        compressed_path=compressed_path,
+        original_size=metadata.get('originalSize', compressed_size),
+        compressed_size=compressed_size,
+        compression_level=compression_level,
+        username=form.get('username', 'Anónimo'),
+        subreddit=form.get('subreddit', 'pics'),
+        post_metadata=json.dumps(metadata),
+        **post_columns_from_metadata(metadata)
+    )
+    
+    db.session.add(new_post)
+    with stage('db_commit'):
+        db.session.commit()
+    get_feed_cache().invalidate()
+    
+    log_event('post_created', f"✅ Imagen guardada con ID: {new_post.id}", post_id=new_post.id)
+    return new_post
+
 @app.route('/submit_processed', methods=['POST'])
 def submit_processed():
-    """Endpoint para recibir imágenes ya procesadas por el cliente"""
+    """Endpoint para recibir imágenes ya procesadas por el cliente (base64, compatibilidad)"""
+    stored_files = []
     try:
-        title = request.form.get('title')
-        subreddit = request.form.get('subreddit', 'pics')
-        username = request.form.get('username', 'Anónimo')
+        # El formulario se analiza (y se copia a memoria) en el primer acceso
+        with stage('form_parse'):
+            title = request.form.get('title')
         processed_image_data = request.form.get('processed_image_data')
         thumbnail_data = request.form.get('thumbnail_data')
         processing_metadata = request.form.get('processing_metadata')
@@ -211,90 +1245,177 @@ def submit_processed():
         
         # Parsear metadatos del procesamiento del cliente
         metadata = json.loads(processing_metadata)
+        compression_level = resolve_compression_level(metadata)
         
-        # Resolver nivel de compresión si es "auto"
-        compression_level = metadata.get('compressionLevel', 16)
-        if compression_level == 'auto':
-            # Obtener condiciones de red actuales para determinar el nivel
-            network_conditions = get_network_conditions()
-            compression_level = network_conditions['compression']
-            # Actualizar metadatos con el nivel resuelto
-            metadata['compressionLevel'] = compression_level
-            metadata['resolvedFromAuto'] = True
-        else:
-            # Asegurar que sea un entero
-            try:
-                compression_level = int(compression_level)
-            except (ValueError, TypeError):
-                compression_level = 16  # Valor por defecto
-        
-        print(f"📥 Recibiendo imagen procesada por cliente:")
-        print(f"   Método: {metadata.get('processingMethod', 'unknown')}")
-        print(f"   Modelo: {metadata.get('modelUsed', 'unknown')}")
-        print(f"   ESPCN: {metadata.get('espcnApplied', False)}")
-        print(f"   Tamaño original: {metadata.get('originalSize', 0)} bytes")
-        print(f"   Tamaño procesado: {metadata.get('processedSize', 0)} bytes")
-        print(f"   Nivel de compresión: {compression_level}")
-        
-        # Guardar imágenes procesadas (ya vienen optimizadas del cliente)
-        compressed_path = save_base64_image(processed_image_data, 'client_processed')
-        thumbnail_path = save_base64_image(thumbnail_data, 'client_thumbnail')
-        
-        if not compressed_path or not thumbnail_path:
-            return jsonify({'error': 'Error guardando imágenes procesadas'}), 500
-        
-        # Obtener tamaños de archivo
-        compressed_size = os.path.getsize(compressed_path)
-        thumbnail_size = os.path.getsize(thumbnail_path)
-        
-        # Actualizar metadatos con rutas del servidor
-        metadata.update({
-            'thumbnail_path': thumbnail_path,
-            'compressed_path': compressed_path,
-            'server_processed': False,
-            'client_processed': True,
-            'server_received_at': time.time()
+        # Guardar imágenes procesadas (ya vienen optimizadas del cliente); las
+        # referencias se suman solo cuando ambas se han guardado
+        stored_files.append(store_base64_image(processed_image_data))
+        stored_files.append(store_base64_image(thumbnail_data))
+        compressed_path, thumbnail_path = [acquire_stored_image(stored) for stored in stored_files]
+        
+        new_post = create_processed_post(request.form, metadata, compression_level, compressed_path, thumbnail_path)
+        
+        return jsonify({
+            'success': True,
+            'message': 'Imagen procesada por cliente recibida correctamente',
+            'post_id': new_post.id
         })
         
-        # Guardar en base de datos
-        new_post = Post(
-            title=title,
-            image_path=compressed_path,  # Usar imagen procesada como original
-            compressed_path=compressed_path,
-            original_size=metadata.get('originalSize', compressed_size),
-            compressed_size=compressed_size,
-            compression_level=compression_level,
-            username=username,
-            subreddit=subreddit,
-            post_metadata=json.dumps(metadata)
-        )
+    except ValueError as e:
+        discard_stored_objects(stored_files)
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        discard_stored_objects(stored_files)
+        log_event('request_failed', f"❌ Error en submit_processed: {e}", level='error',
+                  handler='submit_processed', error=str(e))
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/submit_processed/binary', methods=['POST'])
+def submit_processed_binary():
+    """Recibir imágenes procesadas como archivos multipart, escritos a disco por bloques"""
+    max_bytes = app.config['UPLOAD_MAX_IMAGE_BYTES']
+    if request.content_length and request.content_length > 2 * max_bytes + 1024 * 1024:
+        return jsonify({'error': 'La petición supera el tamaño máximo permitido'}), 413
+    
+    upload = None
+    stored_files = []
+    try:
+        with stage('upload_stream'):
+            upload = parse_streamed_upload(request.environ, content_store.temp_dir, max_bytes)
         
-        db.session.add(new_post)
-        db.session.commit()
+        title = upload.form.get('title')
+        processing_metadata = upload.form.get('processing_metadata')
+        if not title or not processing_metadata \
+                or 'processed_image' not in upload.files or 'thumbnail' not in upload.files:
+            return jsonify({'error': 'Datos incompletos'}), 400
         
-        print(f"✅ Imagen guardada con ID: {new_post.id}")
+        metadata = json.loads(processing_metadata)
+        compression_level = resolve_compression_level(metadata)
+        
+        # Validar tipo de contenido y mover los temporales al almacén por contenido;
+        # las referencias se suman solo cuando ambos archivos son válidos
+        stored_files.append(upload.store('processed_image', content_store))
+        stored_files.append(upload.store('thumbnail', content_store))
+        compressed_path, thumbnail_path = [acquire_stored_image(stored) for stored in stored_files]
+        
+        new_post = create_processed_post(upload.form, metadata, compression_level, compressed_path, thumbnail_path)
         
         return jsonify({
             'success': True,
             'message': 'Imagen procesada por cliente recibida correctamente',
             'post_id': new_post.id
         })
+    
+    except RequestEntityTooLarge as e:
+        return jsonify({'error': e.description}), 413
+    except ValueError as e:
+        discard_stored_objects(stored_files)
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        discard_stored_objects(stored_files)
+        log_event('request_failed', f"❌ Error en submit_processed_binary: {e}", level='error',
+                  handler='submit_processed_binary', error=str(e))
+        return jsonify({'error': str(e)}), 500
+    finally:
+        if upload:
+            upload.cleanup()
+
+@app.route('/submit_raw', methods=['POST'])
+def submit_raw():
+    """Recibir una imagen sin procesar y comprimirla en el servidor con el autoencoder"""
+    max_bytes = app.config['UPLOAD_MAX_IMAGE_BYTES']
+    if request.content_length and request.content_length > max_bytes + 1024 * 1024:
+        return jsonify({'error': 'La petición supera el tamaño máximo permitido'}), 413
+    
+    upload = None
+    stored_files = []
+    try:
+        upload = parse_streamed_upload(request.environ, content_store.temp_dir, max_bytes)
+        
+        if not upload.form.get('title') or 'image' not in upload.files:
+            return jsonify({'error': 'Datos incompletos'}), 400
+        
+        metadata = {'compressionLevel': upload.form.get('compression_level', 'auto')}
+        compression_level = resolve_compression_level(metadata)
+        metadata['compressionLevel'] = compression_level
+        if compression_level and compression_level not in get_autoencoder_batchers():
+            return jsonify({'error': f'Nivel de compresión no válido: {compression_level}'}), 400
+        
+        image_path, _ = upload.validated_path('image')
+        original_size = os.path.getsize(image_path)
+        
+        # Con almacenamiento de latentes se guarda la salida del codificador en lugar del JPEG
+        store_latent = app.config['AUTOENCODER_STORAGE'] == 'latent' and compression_level
+        start = time.perf_counter()
+        with Image.open(image_path) as img:
+            if store_latent:
+                compressed_data, compressed = encode_image_latent(img, compression_level)
+            else:
+                compressed = compress_image_autoencoder(img, compression_level)
+                compressed_data = encode_jpeg_bytes(compressed, app.config['AUTOENCODER_JPEG_QUALITY'])
+        
+        # Miniatura cuadrada centrada, como createThumbnail() en el cliente
+        size = app.config['THUMBNAIL_SIZE']
+        thumbnail = ImageOps.fit(compressed, (size, size), Image.LANCZOS, centering=(0.5, 0.5))
+        thumbnail_data = encode_jpeg_bytes(thumbnail, 85)
+        processing_ms = (time.perf_counter() - start) * 1000
+        
+        compressed_ext = latent_codec.EXTENSION if store_latent else '.jpg'
+        stored_files.append(content_store.put_bytes(compressed_data, compressed_ext))
+        stored_files.append(content_store.put_bytes(thumbnail_data))
+        compressed_path, thumbnail_path = [acquire_stored_image(stored) for stored in stored_files]
+        
+        metadata.update({
+            'processingMethod': 'onnx_server' if compression_level else 'resize_only',
+            'modelUsed': f'autoencoder_b{compression_level}' if compression_level else 'none',
+            'espcnApplied': False,
+            'originalSize': original_size,
+            'processedSize': len(compressed_data),
+            'storageFormat': 'latent' if store_latent else 'jpeg',
+            'serverProcessingMs': round(processing_ms, 1)
+        })
+        new_post = create_processed_post(upload.form, metadata, compression_level,
+                                         compressed_path, thumbnail_path, server_processed=True)
         
+        return jsonify({
+            'success': True,
+            'message': 'Imagen comprimida en el servidor',
+            'post_id': new_post.id,
+            'compression_level': compression_level,
+            'processing_ms': round(processing_ms, 1)
+        })
+    
+    except RequestEntityTooLarge as e:
+        return jsonify({'error': e.description}), 413
+    except ValueError as e:
+        discard_stored_objects(stored_files)
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
-        db.session.rollback()
-        print(f"❌ Error en submit_processed: {e}")
+        discard_stored_objects(stored_files)
+        log_event('request_failed', f"❌ Error en submit_raw: {e}", level='error',
+                  handler='submit_raw', error=str(e))
         return jsonify({'error': str(e)}), 500
+    finally:
+        if upload:
+            upload.cleanup()
 
 @app.route('/post/<int:post_id>')
 def view_post(post_id):
     """Ver post individual con comentarios"""
     post = Post.query.get_or_404(post_id)
+    # La variante se elige al generar la página: la URL de la imagen queda fija y cacheable
+    variants = post_image_variants(post)
+    image_variant = image_variants.choose_variant(request_network_tier()[0], variants) or 'compressed'
     
     post_data = {
         'id': post.id,
         'title': post.title,
         'image_path': post.image_path,
         'compressed_path': post.compressed_path,
+        'image_url': url_for('post_media', post_id=post.id, variant=image_variant),
+        'image_variant': image_variant,
+        'original_url': url_for('post_media', post_id=post.id, variant='compressed'),
+        'enhanced_url': url_for('post_media', post_id=post.id, variant='enhanced') if 'enhanced' in variants else None,
         'upvotes': post.upvotes,
         'downvotes': post.downvotes,
         'username': post.username,
@@ -339,28 +1460,29 @@ def enhance_post(post_id):
                 'already_enhanced': True
             })
         
-        # Procesar imagen en el servidor
-        image_path = os.path.join(app.root_path, post.compressed_path)
-        enhanced_img = enhance_image_espcn(image_path)
+        image_path = post_image_file(post.compressed_path)
         
-        # Guardar imagen mejorada
-        timestamp = str(int(time.time()))
-        enhanced_filename = f"espcn_enhanced_{post_id}_{timestamp}.jpg"
-        enhanced_path = os.path.join(UPLOAD_FOLDER, enhanced_filename)
-        enhanced_img.save(enhanced_path)
-        enhanced_path = enhanced_path.replace('\\', '/')
+        # Encolar el trabajo (deduplicado por post) y responder de inmediato
+        if app.config['ENHANCE_ASYNC']:
+            enhanced_path = content_store.temp_path('.jpg')
+            created = False
+            try:
+                job, created = get_enhance_job_manager().submit(post_id, image_path, enhanced_path)
+            finally:
+                # El temporal solo se conserva si el trabajo nuevo va a escribirlo
+                if not created:
+                    os.remove(enhanced_path)
+            response = enhance_job_response(post_id, job)
+            response['message'] = 'Mejora ESPCN encolada' if created else 'Mejora ESPCN ya en proceso'
+            return jsonify(response), 202
         
-        # Actualizar metadatos
-        metadata.update({
-            'espcn_enhanced_path': enhanced_path,
-            'espcn_applied': True,
-            'processing_method': 'server_espcn',
-            'server_processed_at': time.time()
-        })
+        # Procesar imagen en el servidor (el almacén solo crea el temporal al escribir)
+        enhanced_img = enhance_image_espcn(image_path)
+        enhanced_data = encode_jpeg_bytes(enhanced_img, app.config['ESPCN_JPEG_QUALITY'])
+        enhanced_path = acquire_stored_image(content_store.put_bytes(enhanced_data, '.jpg'))
         
-        # Actualizar base de datos
-        post.post_metadata = json.dumps(metadata)
-        db.session.commit()
+        # Actualizar metadatos y base de datos
+        apply_espcn_result(post, enhanced_path)
         
         return jsonify({
             'success': True,
@@ -369,12 +1491,33 @@ def enhance_post(post_id):
         })
         
     except Exception as e:
-        print(f"Error en enhance_post: {e}")
+        db.session.rollback()
+        log_event('request_failed', f"Error en enhance_post: {e}", level='error',
+                  handler='enhance_post', error=str(e))
         return jsonify({'error': str(e)}), 500
 
+@app.route('/api/enhance/<int:post_id>/status')
+def enhance_status(post_id):
+    """Estado del trabajo de mejora ESPCN de un post"""
+    job = get_enhance_job_manager().status(post_id)
+    if job:
+        return jsonify(enhance_job_response(post_id, job))
+    
+    # Sin trabajo en cola: puede haberse mejorado antes (o desde el cliente)
+    post = Post.query.get_or_404(post_id)
+    metadata = json.loads(post.post_metadata) if post.post_metadata else {}
+    if metadata.get('espcn_enhanced_path'):
+        return jsonify(enhance_job_response(post_id, {
+            'status': enhance_jobs.DONE,
+            'enhanced_path': metadata['espcn_enhanced_path']
+        }))
+    
+    return jsonify({'post_id': post_id, 'status': 'none'}), 404
+
 @app.route('/api/enhance/save/<int:post_id>', methods=['POST'])
 def save_enhanced_image(post_id):
     """Guardar imagen mejorada con ESPCN desde el cliente"""
+    stored_files = []
     try:
         data = request.get_json()
         enhanced_image_data = data.get('enhanced_image_data')
@@ -383,15 +1526,13 @@ def save_enhanced_image(post_id):
             return jsonify({'error': 'Datos de imagen mejorada requeridos'}), 400
         
         # Guardar imagen mejorada
-        enhanced_path = save_base64_image(enhanced_image_data, f'enhanced_{post_id}')
-        
-        if not enhanced_path:
-            return jsonify({'error': 'Error guardando imagen mejorada'}), 500
-        
-        # Actualizar metadatos del post
         post = Post.query.get_or_404(post_id)
+        stored_files.append(store_base64_image(enhanced_image_data))
+        enhanced_path = acquire_stored_image(stored_files[0])
         
+        # Actualizar metadatos del post; la versión mejorada anterior pierde su referencia
         metadata = json.loads(post.post_metadata) if post.post_metadata else {}
+        release_stored_image(metadata.get('espcn_enhanced_path'))
         metadata.update({
             'espcn_enhanced_path': enhanced_path,
             'espcn_enhanced_at': time.time(),
@@ -399,6 +1540,7 @@ def save_enhanced_image(post_id):
         })
         
         post.post_metadata = json.dumps(metadata)
+        post.espcn_applied = True
         db.session.commit()
         
         return jsonify({
@@ -407,10 +1549,84 @@ def save_enhanced_image(post_id):
             'message': 'Imagen mejorada guardada exitosamente'
         })
         
+    except ValueError as e:
+        discard_stored_objects(stored_files)
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
-        print(f"Error guardando imagen mejorada: {e}")
+        discard_stored_objects(stored_files)
+        log_event('request_failed', f"Error guardando imagen mejorada: {e}", level='error',
+                  handler='save_enhanced_image', error=str(e))
         return jsonify({'error': str(e)}), 500
 
+# Votos: contadores incrementales con escritura diferida opcional
+app.config['VOTE_WRITE_BEHIND'] = False
+app.config['VOTE_FLUSH_INTERVAL'] = 1.0    # segundos entre volcados
+app.config['VOTE_FLUSH_MAX_PENDING'] = 500 # objetivos pendientes que fuerzan un volcado
+
+VOTE_TARGETS = {'post': Post, 'comment': Comment}
+
+def vote_target_key(target, target_id):
+    """Clave del objeto votado para la restricción única (target_key, user_ip)"""
+    return f'{target}:{target_id}'
+
+def find_vote(target_key, user_ip):
+    """Voto previo del usuario (bloqueado hasta el commit en bases que lo soportan)"""
+    return Vote.query.filter_by(target_key=target_key, user_ip=user_ip).with_for_update().first()
+
+def vote_counter_deltas(previous_type, new_type):
+    """(Δup, Δdown) al pasar de previous_type a new_type (None = sin voto)"""
+    up_delta = int(new_type == 'up') - int(previous_type == 'up')
+    down_delta = int(new_type == 'down') - int(previous_type == 'down')
+    return up_delta, down_delta
+
+def apply_vote_deltas(batch):
+    """Aplicar deltas {(tipo, id): [Δup, Δdown]} con UPDATE atómicos en lote"""
+    for target, model in VOTE_TARGETS.items():
+        rows = [
+            {'target_id': target_id, 'up_delta': deltas[0], 'down_delta': deltas[1]}
+            for (kind, target_id), deltas in batch.items() if kind == target
+        ]
+        if not rows:
+            continue
+        
+        table = model.__table__
+        values = {
+            'upvotes': table.c.upvotes + bindparam('up_delta'),
+            'downvotes': table.c.downvotes + bindparam('down_delta'),
+        }
+        if model is Post:
+            values['score'] = table.c.score + bindparam('up_delta') - bindparam('down_delta')
+        db.session.execute(
+            table.update().where(table.c.id == bindparam('target_id')).values(**values), rows)
+        
+        # El ranking hot depende del logaritmo de la puntuación: se recalcula en Python
+        if model is Post:
+            ids = [row['target_id'] for row in rows]
+            posts = db.session.query(Post.id, Post.upvotes, Post.downvotes, Post.created_at).filter(Post.id.in_(ids)).all()
+            db.session.execute(
+                table.update().where(table.c.id == bindparam('target_id')).values(hot_score=bindparam('hot')),
+                [{'target_id': post.id, 'hot': compute_hot_score(post.upvotes, post.downvotes, post.created_at)} for post in posts]
+            )
+
+def flush_vote_buffer(batch):
+    """Callback del buffer: volcar deltas en una transacción"""
+    with app.app_context():
+        try:
+            apply_vote_deltas(batch)
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+    get_feed_cache().invalidate()
+
+def get_vote_buffer():
+    """Buffer de votos con escritura diferida (VOTE_WRITE_BEHIND)"""
+    return service('vote_buffer', lambda: CounterBuffer(
+        flush_vote_buffer,
+        flush_interval=app.config['VOTE_FLUSH_INTERVAL'],
+        max_pending=app.config['VOTE_FLUSH_MAX_PENDING']
+    ))
+
 # APIs para funcionalidad básica (sin procesamiento de imágenes)
 @app.route('/api/vote', methods=['POST'])
 def vote():
@@ -421,51 +1637,64 @@ def vote():
     vote_type = data.get('vote_type')
     user_ip = request.remote_addr
     
+    if vote_type not in ('up', 'down') or not (post_id or comment_id):
+        return jsonify({'error': 'Datos incompletos'}), 400
+    
+    target, target_id = ('post', post_id) if post_id else ('comment', comment_id)
+    model = VOTE_TARGETS[target]
+    
     try:
-        # Check if the user has already voted
-        if post_id:
-            existing_vote = Vote.query.filter_by(post_id=post_id, user_ip=user_ip, comment_id=None).first()
-        else:
-            existing_vote = Vote.query.filter_by(comment_id=comment_id, user_ip=user_ip, post_id=None).first()
-            
-        if existing_vote:
-            if existing_vote.vote_type == vote_type:
-                db.session.delete(existing_vote)
-            else:
-                existing_vote.vote_type = vote_type
-        else:
-            new_vote = Vote(post_id=post_id, comment_id=comment_id, user_ip=user_ip, vote_type=vote_type)
-            db.session.add(new_vote)
-            
-        db.session.commit()
+        target_key = vote_target_key(target, target_id)
+        existing_vote = find_vote(target_key, user_ip)
+        if existing_vote is None:
+            try:
+                with db.session.begin_nested():
+                    db.session.add(Vote(post_id=post_id if target == 'post' else None,
+                                        comment_id=comment_id if target == 'comment' else None,
+                                        target_key=target_key, user_ip=user_ip, vote_type=vote_type))
+            except IntegrityError:
+                # Otra petición de la misma IP insertó el voto a la vez: se aplica como cambio sobre el suyo
+                existing_vote = find_vote(target_key, user_ip)
+                if existing_vote is None:
+                    raise
         
-        # Update the upvotes and downvotes count
-        if post_id:
-            upvotes = Vote.query.filter_by(post_id=post_id, vote_type='up').count()
-            downvotes = Vote.query.filter_by(post_id=post_id, vote_type='down').count()
-            
-            # Update post counts
-            post = Post.query.get(post_id)
-            if post:
-                post.upvotes = upvotes
-                post.downvotes = downvotes
-                db.session.commit()
+        previous_type = existing_vote.vote_type if existing_vote else None
+        if existing_vote is None:
+            new_type = vote_type
+        elif existing_vote.vote_type == vote_type:
+            db.session.delete(existing_vote)
+            new_type = None
         else:
-            upvotes = Vote.query.filter_by(comment_id=comment_id, vote_type='up').count()
-            downvotes = Vote.query.filter_by(comment_id=comment_id, vote_type='down').count()
+            existing_vote.vote_type = vote_type
+            new_type = vote_type
+        
+        # Delta derivado del estado anterior, sin recontar la tabla Vote
+        up_delta, down_delta = vote_counter_deltas(previous_type, new_type)
+        
+        if app.config['VOTE_WRITE_BEHIND']:
+            db.session.commit()
+            get_vote_buffer().add((target, target_id), up_delta, down_delta)
             
-            # Update comment counts
-            comment = Comment.query.get(comment_id)
-            if comment:
-                comment.upvotes = upvotes
-                comment.downvotes = downvotes
-                db.session.commit()
+            def read_counts():
+                counts = db.session.query(model.upvotes, model.downvotes).filter(model.id == target_id).first()
+                return (counts.upvotes, counts.downvotes) if counts else (0, 0)
             
+            upvotes, downvotes = get_vote_buffer().totals((target, target_id), read_counts)
+        else:
+            # Voto y contadores en una sola transacción
+            apply_vote_deltas({(target, target_id): [up_delta, down_delta]})
+            counts = db.session.query(model.upvotes, model.downvotes).filter(model.id == target_id).first()
+            db.session.commit()
+            upvotes = counts.upvotes if counts else 0
+            downvotes = counts.downvotes if counts else 0
+            if target == 'post':
+                get_feed_cache().invalidate()
+        
         return jsonify({'upvotes': upvotes, 'downvotes': downvotes})
         
     except Exception as e:
         db.session.rollback()
-        print(f"Error en votación: {e}")
+        log_event('request_failed', f"Error en votación: {e}", level='error', handler='vote', error=str(e))
         return jsonify({'error': str(e)}), 500
 
 @app.route('/api/comment', methods=['POST'])
@@ -481,10 +1710,114 @@ def add_comment():
     
     new_comment = Comment(post_id=post_id, username=username, content=content)
     db.session.add(new_comment)
+    
+    # Mantener el contador desnormalizado en la misma transacción
+    Post.query.filter_by(id=post_id).update(
+        {Post.comment_count: Post.comment_count + 1}, synchronize_session=False)
     db.session.commit()
+    get_feed_cache().invalidate()
     
     return jsonify({'success': True, 'comment_id': new_comment.id})
 
+def insert_network_samples(rows):
+    """Callback del buffer: INSERT de varias filas en una transacción"""
+    with app.app_context():
+        try:
+            db.session.execute(NetworkMetrics.__table__.insert(), rows)
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+        run_network_retention_if_due()
+
+def merge_network_minute(aggregate, bandwidth, latency):
+    """Sumar una medición cruda a su agregado por minuto"""
+    aggregate.samples += 1
+    aggregate.bandwidth_sum += bandwidth
+    aggregate.latency_sum += latency
+    aggregate.bandwidth_min = bandwidth if aggregate.bandwidth_min is None else min(aggregate.bandwidth_min, bandwidth)
+    aggregate.bandwidth_max = bandwidth if aggregate.bandwidth_max is None else max(aggregate.bandwidth_max, bandwidth)
+    aggregate.latency_min = latency if aggregate.latency_min is None else min(aggregate.latency_min, latency)
+    aggregate.latency_max = latency if aggregate.latency_max is None else max(aggregate.latency_max, latency)
+
+def apply_network_retention(chunk_size=5000):
+    """
+    Agregar por minuto las mediciones crudas más antiguas que NETWORK_RAW_RETENTION
+    y borrar los agregados más antiguos que NETWORK_AGGREGATE_RETENTION
+    
+    Returns:
+        (filas crudas agregadas, agregados borrados)
+    """
+    now = datetime.utcnow()
+    # Se corta en un minuto exacto para no partir ningún agregado
+    cutoff = (now - timedelta(seconds=app.config['NETWORK_RAW_RETENTION'])).replace(second=0, microsecond=0)
+    rolled = 0
+    while True:
+        rows = db.session.query(NetworkMetrics.id, NetworkMetrics.user_ip, NetworkMetrics.bandwidth,
+                                NetworkMetrics.latency, NetworkMetrics.timestamp).filter(
+            NetworkMetrics.timestamp < cutoff
+        ).order_by(NetworkMetrics.id).limit(chunk_size).all()
+        if not rows:
+            break
+        
+        minutes = {row.timestamp.replace(second=0, microsecond=0) for row in rows}
+        aggregates = {(item.minute, item.user_ip): item
+                      for item in NetworkMetricsMinute.query.filter(NetworkMetricsMinute.minute.in_(minutes))}
+        for row in rows:
+            if row.bandwidth is None or row.latency is None:
+                continue
+            key = (row.timestamp.replace(second=0, microsecond=0), row.user_ip)
+            aggregate = aggregates.get(key)
+            if aggregate is None:
+                aggregate = aggregates[key] = NetworkMetricsMinute(
+                    minute=key[0], user_ip=key[1], samples=0, bandwidth_sum=0.0, latency_sum=0.0)
+                db.session.add(aggregate)
+            merge_network_minute(aggregate, row.bandwidth, row.latency)
+        
+        NetworkMetrics.query.filter(NetworkMetrics.id.in_([row.id for row in rows])).delete(synchronize_session=False)
+        db.session.commit()
+        rolled += len(rows)
+    
+    expired = now - timedelta(seconds=app.config['NETWORK_AGGREGATE_RETENTION'])
+    pruned = NetworkMetricsMinute.query.filter(NetworkMetricsMinute.minute < expired).delete(synchronize_session=False)
+    db.session.commit()
+    return rolled, pruned
+
+network_retention_state = {'last_run': time.monotonic()}
+
+def run_network_retention_if_due():
+    """Aplicar la retención desde el hilo de volcado cada NETWORK_RETENTION_INTERVAL segundos"""
+    interval = app.config['NETWORK_RETENTION_INTERVAL']
+    if not interval or time.monotonic() - network_retention_state['last_run'] < interval:
+        return
+    network_retention_state['last_run'] = time.monotonic()
+    try:
+        rolled, pruned = apply_network_retention()
+        if rolled or pruned:
+            log_event('network_retention',
+                      f"📶 Retención de red: {rolled} mediciones agregadas, {pruned} agregados borrados",
+                      rolled=rolled, pruned=pruned)
+    except Exception as e:
+        db.session.rollback()
+        log_event('network_retention_failed', f"Error aplicando la retención de mediciones de red: {e}",
+                  level='error', error=str(e))
+
+def get_network_buffer():
+    """Buffer de inserción en lote de mediciones de red"""
+    return service('network_buffer', lambda: SampleBuffer(
+        insert_network_samples,
+        flush_interval=app.config['NETWORK_FLUSH_INTERVAL'],
+        batch_size=app.config['NETWORK_FLUSH_BATCH_SIZE'],
+        max_pending=app.config['NETWORK_MAX_PENDING']
+    ))
+
+@atexit.register
+def flush_buffers():
+    """Volcar al salir los buffers de escritura diferida que se llegaron a crear"""
+    for name in ('vote_buffer', 'network_buffer', 'profile_writer'):
+        if name in _services:
+            _services[name].flush()
+
 @app.route('/api/network')
 def network_status():
     """API para obtener condiciones de red"""
@@ -500,52 +1833,507 @@ def update_network_conditions():
         if not all(field in data for field in required_fields):
             return jsonify({'error': 'Datos incompletos'}), 400
         
-        new_metrics = NetworkMetrics(
-            user_ip=request.remote_addr,
-            bandwidth=data['bandwidth'],
-            latency=data['latency'],
-            quality=data['quality'],
-            recommended_compression=data['compression']
-        )
+        try:
+            row = {
+                'user_ip': request.remote_addr,
+                'bandwidth': float(data['bandwidth']),
+                'latency': float(data['latency']),
+                'quality': str(data['quality'])[:20],
+                'recommended_compression': int(data['compression']),
+                'timestamp': datetime.utcnow(),
+            }
+        except (TypeError, ValueError):
+            return jsonify({'error': 'Medición no válida'}), 400
         
-        db.session.add(new_metrics)
-        db.session.commit()
+        warm_network_estimator()
+        if not get_network_estimator().observe(row['user_ip'], row['bandwidth'], row['latency']):
+            return jsonify({'error': 'Medición no válida'}), 400
+        
+        # La estimación ya usa la medición; guardarla se difiere (y se descarta si la cola está llena)
+        outcome = get_network_buffer().add(row)
+        network_samples.inc(outcome=outcome)
         
-        return jsonify({'success': True})
+        return jsonify({'success': True, 'stored': outcome == 'queued', 'network': get_network_conditions()})
         
     except Exception as e:
-        print(f"Error actualizando condiciones de red: {e}")
+        log_event('request_failed', f"Error actualizando condiciones de red: {e}", level='error',
+                  handler='update_network_conditions', error=str(e))
         return jsonify({'error': str(e)}), 500
 
+@app.route('/api/network/stats')
+def network_stats():
+    """API con el estado del estimador de red y de la ingesta de mediciones"""
+    return jsonify({
+        'estimator': get_network_estimator().stats(),
+        'ingestion': get_network_buffer().stats()
+    })
+
+@app.route('/api/speedtest')
+def speedtest_download():
+    """Carga incompresible de ?size= bytes (64 KB a 50 MB) para medir la descarga; admite Range"""
+    size = request.args.get('size', app.config['SPEEDTEST_DEFAULT_BYTES'], type=int)
+    if not speedtest.MIN_PAYLOAD_BYTES <= size <= speedtest.MAX_PAYLOAD_BYTES:
+        return jsonify({'error': f'size debe estar entre {speedtest.MIN_PAYLOAD_BYTES} '
+                                 f'y {speedtest.MAX_PAYLOAD_BYTES} bytes'}), 400
+    
+    headers = {'Accept-Ranges': 'bytes', 'Cache-Control': 'no-store, no-transform'}
+    try:
+        bounds = speedtest.resolve_range(request.range, size)
+    except ValueError:
+        headers['Content-Range'] = f'bytes */{size}'
+        return Response(status=416, headers=headers)
+    
+    if bounds:
+        start, end = bounds
+        status = 206
+        headers['Content-Range'] = f'bytes {start}-{end - 1}/{size}'
+    else:
+        start, end = 0, size
+        status = 200
+    headers['Content-Length'] = str(end - start)
+    return Response(speedtest.iter_payload(start, end), status=status, headers=headers,
+                    mimetype='application/octet-stream', direct_passthrough=True)
+
+@app.route('/api/speedtest/upload', methods=['POST'])
+def speedtest_upload():
+    """Consumir el cuerpo por bloques, sin guardarlo, para medir la subida del cliente"""
+    start = time.perf_counter()
+    try:
+        received = speedtest.consume_stream(request.stream, speedtest.MAX_PAYLOAD_BYTES)
+    except RequestEntityTooLarge as e:
+        return jsonify({'error': e.description}), 413
+    elapsed = time.perf_counter() - start
+    return jsonify({'bytes': received, 'server_ms': round(elapsed * 1000, 3)})
+
 @app.route('/api/ping')
 def ping():
     """Endpoint simple para medir latencia"""
     return jsonify({'status': 'ok', 'timestamp': time.time()})
 
+@app.route('/api/inference/stats')
+def inference_stats():
+    """API con estadísticas del planificador de inferencia"""
+    return jsonify({
+        'batching_enabled': app.config['ESPCN_BATCHING'],
+        'espcn': get_espcn_batcher().stats(),
+        'autoencoders': {f'autoencoder_b{level}': batcher.stats() for level, batcher in get_autoencoder_batchers().items()},
+        'enhance_jobs': get_enhance_job_manager().stats()
+    })
+
+@app.route('/admin/profiles')
+def admin_profiles():
+    """Perfiles guardados (solo administradores)"""
+    require_admin()
+    return jsonify({
+        'sample_rate': app.config['PROFILING_SAMPLE_RATE'],
+        'writer': get_profile_writer().stats(),
+        'profiles': get_profile_store().list()
+    })
+
+@app.route('/admin/profiles/sampling', methods=['POST'])
+def admin_profiling_sampling():
+    """Cambiar la tasa de muestreo en caliente, sin redesplegar"""
+    require_admin()
+    data = request.get_json(silent=True) or {}
+    try:
+        rate = float(data.get('sample_rate'))
+    except (TypeError, ValueError):
+        return jsonify({'error': 'sample_rate debe ser un número entre 0 y 1'}), 400
+    if not 0.0 <= rate <= 1.0:
+        return jsonify({'error': 'sample_rate debe ser un número entre 0 y 1'}), 400
+    app.config['PROFILING_SAMPLE_RATE'] = rate
+    return jsonify({'sample_rate': rate})
+
+@app.route('/admin/profiles/<profile_id>')
+def admin_profile(profile_id):
+    """Resumen de un perfil: consultas SQL con su duración y funciones más costosas"""
+    require_admin()
+    summary = get_profile_store().get(profile_id)
+    if summary is None:
+        abort(404)
+    return jsonify(summary)
+
+@app.route('/admin/profiles/<profile_id>.<any(prof, collapsed):kind>')
+def admin_profile_file(profile_id, kind):
+    """Descargar las estadísticas de cProfile (.prof) o las pilas colapsadas (.collapsed)"""
+    require_admin()
+    path = get_profile_store().path(profile_id, '.' + kind)
+    if not path or not os.path.exists(path):
+        abort(404)
+    return send_file(os.path.abspath(path), as_attachment=True, download_name=f'{profile_id}.{kind}',
+                     mimetype='text/plain' if kind == 'collapsed' else 'application/octet-stream')
+
 @app.route('/api/models/status')
 def models_status():
     """API para verificar estado de modelos ONNX"""
-    models_dir = 'static/models'
+    registry_status = get_model_registry().status()
     status = {
         'autoencoders': {},
-        'espcn': False,
-        'models_directory_exists': os.path.exists(models_dir)
+        'espcn': registry_status['espcn']['available'],
+        'models_directory_exists': get_model_registry().models_dir_exists,
+        'models': registry_status
     }
     
-    # Verificar autoencoders
+    # Mantener el formato anterior para los autoencoders
     for level in [8, 16, 32]:
-        model_path = os.path.join(models_dir, f'autoencoder_b{level}.onnx')
-        status['autoencoders'][level] = os.path.exists(model_path)
-    
-    # Verificar ESPCN
-    espcn_path = os.path.join(models_dir, 'espcn_model.onnx')
-    status['espcn'] = os.path.exists(espcn_path)
+        status['autoencoders'][level] = registry_status[f'autoencoder_b{level}']['available']
     
     return jsonify(status)
 
+@app.cli.command('backfill-post-columns')
+def backfill_post_columns():
+    """Rellenar comment_count, puntuaciones y campos de miniatura en posts existentes"""
+    comment_counts = dict(
+        db.session.query(Comment.post_id, func.count(Comment.id)).group_by(Comment.post_id).all()
+    )
+    
+    updated = 0
+    for post in Post.query.order_by(Post.id).yield_per(500):
+        try:
+            metadata = json.loads(post.post_metadata) if post.post_metadata else {}
+        except ValueError:
+            metadata = {}
+        
+        post.comment_count = comment_counts.get(post.id, 0)
+        for column, value in post_columns_from_metadata(metadata).items():
+            setattr(post, column, value)
+        post.espcn_applied = post.espcn_applied or bool(metadata.get('espcn_enhanced_path'))
+        post.score = (post.upvotes or 0) - (post.downvotes or 0)
+        post.hot_score = compute_hot_score(post.upvotes, post.downvotes, post.created_at)
+        updated += 1
+    
+    db.session.commit()
+    print(f"✅ {updated} posts actualizados")
+
+@app.cli.command('reconcile-votes')
+@click.option('--fix', is_flag=True, help='Corregir los contadores que no coincidan')
+def reconcile_votes(fix):
+    """Verificar upvotes/downvotes de posts y comentarios contra la tabla Vote"""
+    get_vote_buffer().flush()
+    
+    mismatches = 0
+    for target, model in VOTE_TARGETS.items():
+        column = Vote.post_id if model is Post else Vote.comment_id
+        real_counts = {}
+        for target_id, vote_type, count in db.session.query(column, Vote.vote_type, func.count(Vote.id)) \
+                .filter(column.isnot(None)).group_by(column, Vote.vote_type):
+            real_counts.setdefault(target_id, {'up': 0, 'down': 0})[vote_type] = count
+        
+        for item in model.query.yield_per(500):
+            real = real_counts.get(item.id, {'up': 0, 'down': 0})
+            if (item.upvotes, item.downvotes) == (real['up'], real['down']):
+                continue
+            
+            mismatches += 1
+            print(f"⚠️  {target} {item.id}: contadores {item.upvotes}/{item.downvotes}, votos reales {real['up']}/{real['down']}")
+            if fix:
+                item.upvotes = real['up']
+                item.downvotes = real['down']
+                if model is Post:
+                    item.score = real['up'] - real['down']
+                    item.hot_score = compute_hot_score(item.upvotes, item.downvotes, item.created_at)
+    
+    if fix and mismatches:
+        db.session.commit()
+        get_feed_cache().invalidate()
+        print(f"✅ {mismatches} contadores corregidos")
+    elif mismatches:
+        print(f"❌ {mismatches} contadores no coinciden (usar --fix para corregir)")
+    else:
+        print("✅ Todos los contadores coinciden con la tabla Vote")
+
+@app.cli.command('compress-assets')
+def compress_assets():
+    """Generar las copias gzip/brotli de los modelos ONNX y models_info.json"""
+    if static_assets.brotli is None:
+        print("⚠️  brotli no está instalado: solo se generan copias gzip")
+    for directory in app.config['STATIC_PRECOMPRESS_DIRS']:
+        results = static_assets.precompress(os.path.join(app.static_folder, directory),
+                                            app.config['STATIC_PRECOMPRESS_EXTENSIONS'])
+        for name, encoding, size, compressed in results:
+            if compressed is None:
+                print(f"   {name:<40}{encoding:<6}no compensa")
+            else:
+                print(f"   {name:<40}{encoding:<6}{size / 1024:>8.0f} KB -> {compressed / 1024:>6.0f} KB "
+                      f"({1 - compressed / size:.0%} menos)")
+    print("✅ Copias precomprimidas actualizadas")
+
+@app.cli.command('network-retention')
+def network_retention():
+    """Agregar por minuto las mediciones de red antiguas y borrar los agregados caducados"""
+    get_network_buffer().flush()
+    rolled, pruned = apply_network_retention()
+    print(f"✅ {rolled} mediciones agregadas por minuto, {pruned} agregados borrados")
+
+IMAGE_METADATA_KEYS = ('thumbnail_path', 'compressed_path', 'espcn_enhanced_path')
+
+def post_image_paths(post, metadata):
+    """Rutas de imagen que referencia un post (columnas y metadatos)"""
+    paths = {post.image_path, post.compressed_path, post.thumbnail_path}
+    paths.update(metadata.get(key) for key in IMAGE_METADATA_KEYS)
+    return {path for path in paths if path}
+
+@app.cli.command('migrate-uploads')
+@click.option('--dry-run', is_flag=True, help='Mostrar lo que se movería sin modificar nada')
+@click.option('--prune', is_flag=True, help='Borrar objetos del almacén sin referencias')
+def migrate_uploads(dry_run, prune):
+    """Mover las subidas antiguas al almacén por contenido y recalcular referencias"""
+    migrated = {}   # ruta antigua -> StoredFile
+    ref_counts = {}
+    missing = 0
+    
+    for post in Post.query.order_by(Post.id).yield_per(200):
+        try:
+            metadata = json.loads(post.post_metadata) if post.post_metadata else {}
+        except ValueError:
+            metadata = {}
+        
+        for path in post_image_paths(post, metadata):
+            if content_store.contains(path) or path in migrated:
+                continue
+            if not os.path.exists(path):
+                missing += 1
+                print(f"⚠️  Post {post.id}: no existe {path}")
+                continue
+            with open(path, 'rb') as f:
+                ext = ALLOWED_IMAGE_TYPES.get(sniff_image_type(f.read(16)), '.jpg')
+            migrated[path] = None if dry_run else content_store.put_file(path, ext, move=False)
+            print(f"   {path} -> {migrated[path].path if migrated[path] else '(dry-run)'}")
+        
+        if dry_run:
+            continue
+        
+        # Reescribir columnas y metadatos con las rutas del almacén
+        def new_path(path):
+            return migrated[path].path if migrated.get(path) else path
+        
+        post.image_path = new_path(post.image_path)
+        post.compressed_path = new_path(post.compressed_path)
+        post.thumbnail_path = new_path(post.thumbnail_path)
+        for key in IMAGE_METADATA_KEYS:
+            if metadata.get(key):
+                metadata[key] = new_path(metadata[key])
+        post.post_metadata = json.dumps(metadata)
+        
+        for path in post_image_paths(post, metadata):
+            if content_store.contains(path):
+                ref_counts[path] = ref_counts.get(path, 0) + 1
+    
+    if dry_run:
+        print(f"🔍 {len(migrated)} archivos se moverían al almacén ({missing} no encontrados)")
+        return
+    
+    # Reconstruir los contadores de referencias desde los posts
+    stored = {row.path: row for row in StoredImage.query}
+    for path, count in ref_counts.items():
+        row = stored.pop(path, None)
+        if row is None:
+            digest = os.path.splitext(os.path.basename(path))[0]
+            size = os.path.getsize(path) if os.path.exists(path) else None
+            db.session.add(StoredImage(digest=digest, path=path, size=size, ref_count=count))
+        else:
+            row.ref_count = count
+    
+    orphans = list(stored.values())
+    for row in orphans:
+        row.ref_count = 0
+        if prune:
+            db.session.delete(row)
+    
+    db.session.commit()
+    get_feed_cache().invalidate()
+    
+    # Solo tras confirmar la base de datos se borran los archivos antiguos
+    old_bytes = 0
+    for path in migrated:
+        old_bytes += os.path.getsize(path)
+        os.remove(path)
+    if prune:
+        for row in orphans:
+            content_store.remove(row.path)
+    
+    new_bytes = sum({result.digest: result.size for result in migrated.values()}.values())
+    print(f"✅ {len(migrated)} archivos migrados a {len({result.digest for result in migrated.values()})} objetos "
+          f"({(old_bytes - new_bytes) / 1024:.1f} KB ahorrados por duplicados)")
+    print(f"   Objetos referenciados: {len(ref_counts)}  Sin referencias: {len(orphans)}"
+          f"{' (borrados)' if prune else ''}  No encontrados: {missing}")
+
+@app.cli.command('prune-objects')
+@click.option('--min-age', default=3600, show_default=True, help='Segundos desde que se registró el objeto')
+@click.option('--dry-run', is_flag=True, help='Mostrar lo que se borraría sin modificar nada')
+def prune_objects(min_age, dry_run):
+    """Borrar los objetos del almacén que ya no referencia ningún post"""
+    cutoff = datetime.utcnow() - timedelta(seconds=min_age)
+    orphans = StoredImage.query.filter(StoredImage.ref_count <= 0, StoredImage.created_at < cutoff).all()
+    freed = sum(row.size or 0 for row in orphans)
+    if dry_run:
+        print(f"🔍 {len(orphans)} objetos sin referencias ({freed / 1024:.1f} KB)")
+        return
+    
+    # Solo se borran las filas que siguen sin referencias al confirmar
+    removed = []
+    for row in orphans:
+        deleted = db.session.execute(
+            db.delete(StoredImage).where(StoredImage.digest == row.digest, StoredImage.ref_count <= 0))
+        if deleted.rowcount:
+            removed.append((row.path, row.size or 0))
+    db.session.commit()
+    for path, _ in removed:
+        content_store.remove(path)
+    print(f"✅ {len(removed)} objetos sin referencias borrados "
+          f"({sum(size for _, size in removed) / 1024:.1f} KB)")
+
+# Ids de posts fallidos que se guardan en el checkpoint (los más recientes)
+BACKFILL_MAX_FAILED_IDS = 1000
+
+def load_backfill_checkpoint(path):
+    """Estado guardado del backfill ESPCN (último post procesado y fallos)"""
+    state = {'last_post_id': 0, 'enhanced': 0, 'failed': []}
+    if path and os.path.exists(path):
+        with open(path) as f:
+            state.update(json.load(f))
+    state.setdefault('failed_count', len(state['failed']))
+    return state
+
+def save_backfill_checkpoint(path, checkpoint):
+    """Escribir el checkpoint de forma atómica"""
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    temp_path = path + '.tmp'
+    with open(temp_path, 'w') as f:
+        json.dump(checkpoint, f)
+    os.replace(temp_path, path)
+
+@app.cli.command('enhance-backfill')
+@click.option('--batch-size', default=16, show_default=True, help='Posts por lote (y por commit)')
+@click.option('--workers', default=2, show_default=True, help='Procesos para decodificar/codificar')
+@click.option('--max-rate', default=0.0, help='Máximo de imágenes por segundo (0 = sin límite)')
+@click.option('--limit', default=0, help='Procesar como mucho N posts (0 = todos)')
+@click.option('--checkpoint', default=None, help='Archivo de checkpoint (por defecto en instance/)')
+@click.option('--reset', is_flag=True, help='Ignorar el checkpoint y empezar desde el principio')
+@click.option('--retry-failed', is_flag=True, help='Reintentar solo los posts fallidos del checkpoint')
+def enhance_backfill(batch_size, workers, max_rate, limit, checkpoint, reset, retry_failed):
+    """Mejorar con ESPCN los posts existentes que aún no tienen versión mejorada en el servidor"""
+    from concurrent.futures import ProcessPoolExecutor
+    import multiprocessing
+    
+    checkpoint_path = checkpoint or os.path.join(app.instance_path, 'espcn_backfill.json')
+    state = load_backfill_checkpoint(None if reset else checkpoint_path)
+    
+    # Sin espcn_enhanced_path en los metadatos, aunque el cliente ya aplicara ESPCN
+    pending = Post.query.filter(or_(Post.post_metadata.is_(None),
+                                    ~Post.post_metadata.contains('"espcn_enhanced_path"', autoescape=True)))
+    if retry_failed:
+        # Los fallidos quedan por detrás del cursor: se recorren aparte sin moverlo
+        pending = pending.filter(Post.id.in_(state['failed']))
+        start_after = 0
+    else:
+        pending = pending.filter(Post.id > state['last_post_id'])
+        start_after = state['last_post_id']
+    total = pending.count()
+    if limit:
+        total = min(total, limit)
+    if not total:
+        print("✅ No hay posts pendientes de mejorar")
+        return
+    
+    model = get_model_registry().get('espcn')
+    fixed_shape = fixed_spatial_shape(model.input_shape)
+    quality = app.config['ESPCN_JPEG_QUALITY']
+    min_interval = 1.0 / max_rate if max_rate > 0 else 0.0
+    if retry_failed:
+        print(f"🔁 Backfill ESPCN: reintentando {total} posts fallidos")
+    else:
+        print(f"🚀 Backfill ESPCN: {total} posts pendientes (desde el post {state['last_post_id']})")
+    
+    def next_batch(after_id):
+        rows = pending.filter(Post.id > after_id).order_by(Post.id).limit(batch_size).all()
+        return [post for post in rows if post.compressed_path or post.image_path]
+    
+    def record_failure(post_id):
+        # Solo se guardan los últimos ids; el total se cuenta aparte
+        state['failed_count'] += 1
+        if post_id not in state['failed']:
+            state['failed'] = (state['failed'] + [post_id])[-BACKFILL_MAX_FAILED_IDS:]
+    
+    done = 0
+    start = time.perf_counter()
+    last_inference = 0.0
+    # spawn: los workers no heredan la sesión ONNX ni la conexión a la base de datos
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn')) as pool:
+        batch = next_batch(start_after)
+        decodes = [pool.submit(enhance_jobs.decode_rgb, post_image_file(post.compressed_path or post.image_path)) for post in batch]
+        
+        while batch and done < total:
+            batch = batch[:total - done]
+            decodes = decodes[:len(batch)]
+            
+            # Decodificar el siguiente lote mientras este pasa por el modelo
+            following = next_batch(batch[-1].id)
+            following_decodes = [pool.submit(enhance_jobs.decode_rgb, post_image_file(post.compressed_path or post.image_path))
+                                 for post in following]
+            
+            encodes = []
+            for post, decoded in zip(batch, decodes):
+                try:
+                    pixels = decoded.result()
+                    
+                    # Limitar el ritmo para dejar capacidad al tráfico en vivo
+                    wait = min_interval - (time.perf_counter() - last_inference)
+                    if wait > 0:
+                        time.sleep(wait)
+                    last_inference = time.perf_counter()
+                    
+                    enhanced = run_tiled(
+                        Image.fromarray(pixels), model.run,
+                        tile_size=app.config['ESPCN_TILE_SIZE'],
+                        halo=app.config['ESPCN_TILE_HALO'],
+                        batch_size=app.config['ESPCN_TILE_BATCH'],
+                        fixed_shape=fixed_shape
+                    )
+                    output_path = content_store.temp_path('.jpg')
+                    encodes.append((post, pool.submit(enhance_jobs.encode_jpeg, np.asarray(enhanced), output_path, quality)))
+                except Exception as e:
+                    print(f"❌ Post {post.id}: {e}")
+                    record_failure(post.id)
+            
+            # Guardar resultados y confirmar el lote completo en un solo commit
+            for post, encoded in encodes:
+                try:
+                    stored = content_store.put_file(encoded.result())
+                    acquire_stored_image(stored)
+                    apply_espcn_result(post, stored.path, commit=False)
+                    state['enhanced'] += 1
+                    if post.id in state['failed']:
+                        state['failed'].remove(post.id)
+                except Exception as e:
+                    print(f"❌ Post {post.id}: {e}")
+                    record_failure(post.id)
+            db.session.commit()
+            
+            done += len(batch)
+            if not retry_failed:
+                state['last_post_id'] = batch[-1].id
+            save_backfill_checkpoint(checkpoint_path, state)
+            
+            elapsed = time.perf_counter() - start
+            rate = done / elapsed
+            eta = (total - done) / rate if rate else 0
+            print(f"   {done}/{total}  {rate:.2f} img/s  ETA {timedelta(seconds=int(eta))}  "
+                  f"(último post {batch[-1].id})")
+            
+            batch, decodes = following, following_decodes
+    
+    get_feed_cache().invalidate()
+    print(f"✅ Backfill terminado: {state['enhanced']} mejorados, {len(state['failed'])} fallidos pendientes "
+          f"de reintentar ({state['failed_count']} fallos en total) en {time.perf_counter() - start:.1f} s")
+
 if __name__ == '__main__':
     with app.app_context():
         init_db()
+        warm_network_estimator()
+    get_enhance_job_manager()
+    if app.config['ONNX_PRELOAD_MODELS']:
+        get_model_registry().preload(warmup=app.config['ONNX_WARMUP'])
     print("🚀 Servidor Dyzen iniciado")
     
     app.run(debug=True, host='0.0.0.0', port=5000)
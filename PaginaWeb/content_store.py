@@ -0,0 +1,107 @@
+"""
+Almacén de imágenes direccionado por contenido
+Cada archivo se guarda una sola vez bajo su hash SHA-256, en directorios
+fragmentados (ab/cd/abcd....jpg), escribiendo a un temporal y renombrando
+"""
+
+import hashlib
+import os
+import shutil
+import tempfile
+from collections import namedtuple
+
+CHUNK_SIZE = 1024 * 1024
+
+# Resultado de guardar un objeto: ruta web, hash, tamaño y si el archivo es nuevo
+StoredFile = namedtuple('StoredFile', ['path', 'digest', 'size', 'created'])
+
+
+def file_digest(path):
+    """SHA-256 de un archivo leído por bloques"""
+    sha256 = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b''):
+            sha256.update(chunk)
+    return sha256.hexdigest()
+
+
+class ContentStore:
+    """Objetos inmutables en root/<2 hex>/<2 hex>/<sha256><ext>"""
+
+    def __init__(self, root):
+        self.root = root
+        self.temp_dir = os.path.join(root, '.tmp')
+        os.makedirs(self.temp_dir, exist_ok=True)
+
+    def object_path(self, digest, ext):
+        """Ruta de un objeto a partir de su hash"""
+        return os.path.join(self.root, digest[:2], digest[2:4], digest + ext).replace('\\', '/')
+
+    def contains(self, path):
+        """Indica si una ruta pertenece al almacén"""
+        root = os.path.normpath(self.root)
+        return os.path.normpath(path).startswith(root + os.sep)
+
+    def is_temp(self, path):
+        """Indica si una ruta está en el directorio de temporales (nunca se sirve)"""
+        temp_dir = os.path.normpath(self.temp_dir)
+        return os.path.normpath(path).startswith(temp_dir + os.sep)
+
+    def temp_path(self, suffix=''):
+        """Ruta temporal en el mismo sistema de archivos (renombrar es atómico)"""
+        fd, path = tempfile.mkstemp(dir=self.temp_dir, suffix=suffix)
+        os.close(fd)
+        return path
+
+    def _commit(self, temp_path, digest, ext):
+        """Mover un temporal a su ruta final; si ya existe se descarta el duplicado"""
+        final_path = self.object_path(digest, ext)
+        size = os.path.getsize(temp_path)
+        if os.path.exists(final_path):
+            os.remove(temp_path)
+            return StoredFile(final_path, digest, size, False)
+
+        os.makedirs(os.path.dirname(final_path), exist_ok=True)
+        os.replace(temp_path, final_path)
+        return StoredFile(final_path, digest, size, True)
+
+    def put_bytes(self, data, ext='.jpg'):
+        """Guardar bytes en memoria"""
+        digest = hashlib.sha256(data).hexdigest()
+        final_path = self.object_path(digest, ext)
+        if os.path.exists(final_path):
+            return StoredFile(final_path, digest, len(data), False)
+
+        temp_path = self.temp_path(ext)
+        try:
+            with open(temp_path, 'wb') as f:
+                f.write(data)
+            return self._commit(temp_path, digest, ext)
+        except Exception:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+
+    def put_file(self, src_path, ext='.jpg', digest=None, move=True):
+        """
+        Guardar un archivo existente
+
+        Con move=True el origen debe estar en el mismo sistema de archivos
+        (por ejemplo, un temporal de temp_path()) y se renombra; con
+        move=False se copia y el origen queda intacto.
+        """
+        digest = digest or file_digest(src_path)
+        if not move:
+            temp_path = self.temp_path(ext)
+            try:
+                shutil.copyfile(src_path, temp_path)
+            except Exception:
+                os.remove(temp_path)
+                raise
+            src_path = temp_path
+        return self._commit(src_path, digest, ext)
+
+    def remove(self, path):
+        """Borrar un objeto sin referencias"""
+        if self.contains(path) and os.path.exists(path):
+            os.remove(path)
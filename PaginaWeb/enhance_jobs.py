@@ -0,0 +1,433 @@
+"""
+Trabajos asíncronos de mejora ESPCN
+Cola deduplicada por post (en memoria o en SQLite) y un pool de workers
+que ejecuta el pipeline fuera del hilo de la petición HTTP
+"""
+
+import multiprocessing
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+import numpy as np
+from PIL import Image
+
+from image_inference import fixed_spatial_shape, run_tiled
+
+QUEUED = 'queued'
+RUNNING = 'running'
+DONE = 'done'
+FAILED = 'failed'
+# Un trabajo terminado (done/failed) no impide volver a encolar el post
+ACTIVE = (QUEUED, RUNNING)
+
+# Registro de modelos del proceso worker (se crea la primera vez que se usa)
+_worker_registry = None
+
+
+def set_worker_registry(registry):
+    """Compartir un registro existente (modo hilos, mismo proceso)"""
+    global _worker_registry
+    _worker_registry = registry
+
+
+def _get_worker_registry(options):
+    """Registro de modelos propio de cada proceso worker"""
+    global _worker_registry
+    if _worker_registry is None:
+        from model_registry import ModelRegistry
+        _worker_registry = ModelRegistry(
+            options['models_dir'],
+            intra_op_threads=options.get('intra_op_threads', 0),
+            inter_op_threads=options.get('inter_op_threads', 0),
+            graph_optimization=options.get('graph_optimization', 'all'),
+            optimized_cache_dir=options.get('optimized_cache_dir'),
+            variants=options.get('variants'),
+            artifacts_dir=options.get('artifacts_dir')
+        )
+    return _worker_registry
+
+
+def enhance_file(image_path, output_path, options):
+    """Pipeline ESPCN completo: decodificar, inferir por mosaicos, codificar y guardar"""
+    model = _get_worker_registry(options).get('espcn')
+
+    img = Image.open(image_path).convert('RGB')
+    enhanced = run_tiled(
+        img, model.run,
+        tile_size=options.get('tile_size', 256),
+        halo=options.get('tile_halo', 8),
+        batch_size=options.get('tile_batch', 1),
+        fixed_shape=fixed_spatial_shape(model.input_shape)
+    )
+    enhanced.save(output_path, 'JPEG', quality=options.get('jpeg_quality', 75))
+    return output_path
+
+
+def decode_rgb(image_path):
+    """Decodificar una imagen a un array RGB uint8 (worker de backfill)"""
+    with Image.open(image_path) as img:
+        return np.asarray(img.convert('RGB'))
+
+
+def encode_jpeg(array, output_path, quality=75):
+    """Codificar un array RGB uint8 como JPEG (worker de backfill)"""
+    Image.fromarray(array).save(output_path, 'JPEG', quality=quality)
+    return output_path
+
+
+class MemoryJobStore:
+    """Cola de trabajos en memoria del proceso"""
+
+    def __init__(self, finished_ttl=3600, max_finished=1000):
+        self.finished_ttl = finished_ttl
+        self.max_finished = max_finished
+        self._jobs = {}
+        self._queue = []
+        # Trabajos terminados (done/failed) en orden de finalización, para podarlos
+        self._finished = OrderedDict()
+        self._lock = threading.Lock()
+
+    def enqueue(self, post_id, image_path, output_path):
+        """Encolar un trabajo; devuelve (trabajo, creado) sin duplicar los activos del post"""
+        with self._lock:
+            job = self._jobs.get(post_id)
+            if job and job['status'] in ACTIVE:
+                return dict(job), False
+
+            job = {
+                'post_id': post_id,
+                'status': QUEUED,
+                'image_path': image_path,
+                'output_path': output_path,
+                'enhanced_path': None,
+                'error': None,
+                'created_at': time.time(),
+                'started_at': None,
+                'finished_at': None,
+            }
+            self._jobs[post_id] = job
+            self._finished.pop(post_id, None)
+            self._queue.append(post_id)
+            return dict(job), True
+
+    def claim_next(self):
+        """Tomar el siguiente trabajo en cola y marcarlo en ejecución"""
+        with self._lock:
+            while self._queue:
+                post_id = self._queue.pop(0)
+                job = self._jobs.get(post_id)
+                if job and job['status'] == QUEUED:
+                    job['status'] = RUNNING
+                    job['started_at'] = time.time()
+                    return dict(job)
+        return None
+
+    def finish(self, post_id, status, enhanced_path=None, error=None):
+        """Registrar el resultado de un trabajo"""
+        with self._lock:
+            job = self._jobs.get(post_id)
+            if job:
+                job.update({
+                    'status': status,
+                    'enhanced_path': enhanced_path,
+                    'error': error,
+                    'finished_at': time.time(),
+                })
+                self._finished[post_id] = job['finished_at']
+                self._finished.move_to_end(post_id)
+                self._prune(job['finished_at'])
+
+    def _prune(self, now):
+        """Olvidar los trabajos terminados más antiguos que finished_ttl o por encima de max_finished"""
+        cutoff = now - self.finished_ttl
+        while self._finished:
+            post_id, finished_at = next(iter(self._finished.items()))
+            if len(self._finished) <= self.max_finished and finished_at >= cutoff:
+                break
+            self._finished.popitem(last=False)
+            self._jobs.pop(post_id, None)
+
+    def heartbeat(self, post_ids):
+        """Sin efecto: los trabajos en memoria mueren con el proceso"""
+
+    def get(self, post_id):
+        """Estado de un trabajo por post"""
+        with self._lock:
+            job = self._jobs.get(post_id)
+            return dict(job) if job else None
+
+    def counts(self):
+        """Número de trabajos por estado"""
+        with self._lock:
+            counts = {QUEUED: 0, RUNNING: 0, DONE: 0, FAILED: 0}
+            for job in self._jobs.values():
+                counts[job['status']] += 1
+            return counts
+
+
+class SQLiteJobStore:
+    """
+    Cola de trabajos persistente en SQLite (compartida entre procesos)
+
+    El despachador renueva heartbeat_at de sus trabajos en ejecución; los que
+    pasan stale_after segundos sin latido (proceso caído o reiniciado) vuelven
+    a la cola.
+    """
+
+    COLUMNS = ['post_id', 'status', 'image_path', 'output_path', 'enhanced_path',
+               'error', 'created_at', 'started_at', 'finished_at', 'heartbeat_at']
+
+    def __init__(self, db_path, stale_after=60):
+        self.db_path = db_path
+        self.stale_after = stale_after
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(db_path) or '.', exist_ok=True)
+
+        with self._connect() as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS enhance_jobs (
+                    post_id INTEGER PRIMARY KEY,
+                    status TEXT NOT NULL,
+                    image_path TEXT NOT NULL,
+                    output_path TEXT NOT NULL,
+                    enhanced_path TEXT,
+                    error TEXT,
+                    created_at REAL NOT NULL,
+                    started_at REAL,
+                    finished_at REAL,
+                    heartbeat_at REAL
+                )
+            """)
+            # Colas creadas antes de existir el latido
+            columns = [row[1] for row in conn.execute("PRAGMA table_info(enhance_jobs)")]
+            if 'heartbeat_at' not in columns:
+                conn.execute("ALTER TABLE enhance_jobs ADD COLUMN heartbeat_at REAL")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_enhance_jobs_status "
+                         "ON enhance_jobs(status, created_at)")
+            # Trabajos interrumpidos por un reinicio vuelven a la cola
+            self._requeue_stale(conn)
+
+    def _requeue_stale(self, conn):
+        """Devolver a la cola los trabajos en ejecución sin latido reciente"""
+        return conn.execute("UPDATE enhance_jobs SET status = ?, started_at = NULL, heartbeat_at = NULL "
+                            "WHERE status = ? AND COALESCE(heartbeat_at, started_at, 0) < ?",
+                            (QUEUED, RUNNING, time.time() - self.stale_after)).rowcount
+
+    @contextmanager
+    def _connect(self):
+        """Conexión en modo autocommit; se cierra (y revierte) al salir"""
+        conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+        try:
+            conn.execute("PRAGMA journal_mode=WAL")
+            yield conn
+        finally:
+            conn.close()
+
+    def _row_to_job(self, row):
+        return dict(zip(self.COLUMNS, row)) if row else None
+
+    def enqueue(self, post_id, image_path, output_path):
+        """Encolar un trabajo; devuelve (trabajo, creado) sin duplicar los activos del post"""
+        with self._lock, self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            row = conn.execute(f"SELECT {', '.join(self.COLUMNS)} FROM enhance_jobs WHERE post_id = ?",
+                               (post_id,)).fetchone()
+            job = self._row_to_job(row)
+            if job and job['status'] in ACTIVE:
+                conn.execute("COMMIT")
+                return job, False
+
+            job = {
+                'post_id': post_id,
+                'status': QUEUED,
+                'image_path': image_path,
+                'output_path': output_path,
+                'enhanced_path': None,
+                'error': None,
+                'created_at': time.time(),
+                'started_at': None,
+                'finished_at': None,
+                'heartbeat_at': None,
+            }
+            conn.execute(f"INSERT OR REPLACE INTO enhance_jobs ({', '.join(self.COLUMNS)}) "
+                         f"VALUES ({', '.join('?' * len(self.COLUMNS))})",
+                         [job[column] for column in self.COLUMNS])
+            conn.execute("COMMIT")
+            return job, True
+
+    def claim_next(self):
+        """Tomar atómicamente el trabajo más antiguo en cola"""
+        with self._lock, self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            self._requeue_stale(conn)
+            row = conn.execute(f"SELECT {', '.join(self.COLUMNS)} FROM enhance_jobs "
+                               "WHERE status = ? ORDER BY created_at LIMIT 1", (QUEUED,)).fetchone()
+            job = self._row_to_job(row)
+            if job:
+                job['status'] = RUNNING
+                job['started_at'] = job['heartbeat_at'] = time.time()
+                conn.execute("UPDATE enhance_jobs SET status = ?, started_at = ?, heartbeat_at = ? "
+                             "WHERE post_id = ?",
+                             (RUNNING, job['started_at'], job['heartbeat_at'], job['post_id']))
+            conn.execute("COMMIT")
+            return job
+
+    def heartbeat(self, post_ids):
+        """Renovar el latido de los trabajos que este proceso sigue ejecutando"""
+        if not post_ids:
+            return
+        with self._lock, self._connect() as conn:
+            conn.executemany("UPDATE enhance_jobs SET heartbeat_at = ? WHERE post_id = ? AND status = ?",
+                             [(time.time(), post_id, RUNNING) for post_id in post_ids])
+
+    def finish(self, post_id, status, enhanced_path=None, error=None):
+        """Registrar el resultado de un trabajo"""
+        with self._lock, self._connect() as conn:
+            conn.execute("UPDATE enhance_jobs SET status = ?, enhanced_path = ?, error = ?, "
+                         "finished_at = ? WHERE post_id = ?",
+                         (status, enhanced_path, error, time.time(), post_id))
+
+    def get(self, post_id):
+        """Estado de un trabajo por post"""
+        with self._lock, self._connect() as conn:
+            row = conn.execute(f"SELECT {', '.join(self.COLUMNS)} FROM enhance_jobs WHERE post_id = ?",
+                               (post_id,)).fetchone()
+            return self._row_to_job(row)
+
+    def counts(self):
+        """Número de trabajos por estado"""
+        with self._lock, self._connect() as conn:
+            counts = {QUEUED: 0, RUNNING: 0, DONE: 0, FAILED: 0}
+            for status, count in conn.execute("SELECT status, COUNT(*) FROM enhance_jobs GROUP BY status"):
+                counts[status] = count
+            return counts
+
+
+class EnhanceJobManager:
+    """Despachador que reparte los trabajos en cola a un pool de workers"""
+
+    def __init__(self, store, worker_fn, options, on_done=None, workers=2, executor='process',
+                 heartbeat_interval=20):
+        self.store = store
+        self.worker_fn = worker_fn
+        self.options = options
+        self.on_done = on_done
+        self.workers = max(1, int(workers))
+        self.executor_kind = executor
+        self.heartbeat_interval = heartbeat_interval
+
+        self._executor = None
+        self._in_flight = 0
+        self._running = set()
+        self._last_heartbeat = 0.0
+        self._wakeup = threading.Event()
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def _get_executor(self):
+        if self._executor is None:
+            if self.executor_kind == 'process':
+                # spawn: los workers no heredan hilos ni sesiones ONNX del servidor
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=multiprocessing.get_context('spawn'))
+            else:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self.workers, thread_name_prefix='enhance')
+        return self._executor
+
+    def start(self):
+        """Iniciar el hilo despachador si aún no está en marcha"""
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._loop, name='enhance-dispatcher', daemon=True)
+                self._thread.start()
+
+    def resume(self):
+        """
+        Arrancar el despachador si la cola ya tiene trabajos pendientes (tras
+        un reinicio con la cola en SQLite); devuelve cuántos hay
+        """
+        # Los procesos worker (spawn) importan la aplicación pero nunca despachan
+        if multiprocessing.parent_process() is not None:
+            return 0
+        pending = self.store.counts()[QUEUED]
+        if pending:
+            self.start()
+            self._wakeup.set()
+        return pending
+
+    def submit(self, post_id, image_path, output_path):
+        """Encolar la mejora de un post (deduplicada) y despertar al despachador"""
+        job, created = self.store.enqueue(post_id, image_path, output_path)
+        if created:
+            self.start()
+            self._wakeup.set()
+        return job, created
+
+    def status(self, post_id):
+        """Estado del trabajo de un post"""
+        return self.store.get(post_id)
+
+    def stats(self):
+        """Resumen de la cola y de la ocupación de workers"""
+        return {
+            'executor': self.executor_kind,
+            'workers': self.workers,
+            'in_flight': self._in_flight,
+            'jobs': self.store.counts(),
+        }
+
+    def _loop(self):
+        while True:
+            self._wakeup.wait(timeout=1.0)
+            self._wakeup.clear()
+
+            if time.monotonic() - self._last_heartbeat >= self.heartbeat_interval:
+                with self._lock:
+                    running = list(self._running)
+                try:
+                    self.store.heartbeat(running)
+                except Exception as e:
+                    print(f"Error renovando el latido de los trabajos de mejora: {e}")
+                self._last_heartbeat = time.monotonic()
+
+            while True:
+                with self._lock:
+                    if self._in_flight >= self.workers:
+                        break
+                job = self.store.claim_next()
+                if job is None:
+                    break
+
+                with self._lock:
+                    self._in_flight += 1
+                    self._running.add(job['post_id'])
+                future = self._get_executor().submit(
+                    self.worker_fn, job['image_path'], job['output_path'], self.options)
+                future.add_done_callback(lambda f, job=job: self._finish(job, f))
+
+    def _finish(self, job, future):
+        """Guardar el resultado y liberar el hueco del worker"""
+        post_id = job['post_id']
+        try:
+            enhanced_path = future.result().replace('\\', '/')
+            if self.on_done:
+                # El callback puede mover el resultado y devolver su ruta definitiva
+                enhanced_path = self.on_done(post_id, enhanced_path) or enhanced_path
+            self.store.finish(post_id, DONE, enhanced_path=enhanced_path)
+        except Exception as e:
+            print(f"Error en trabajo de mejora del post {post_id}: {e}")
+            if os.path.exists(job['output_path']):
+                os.remove(job['output_path'])
+            self.store.finish(post_id, FAILED, error=str(e))
+        finally:
+            with self._lock:
+                self._in_flight -= 1
+                self._running.discard(post_id)
+            self._wakeup.set()
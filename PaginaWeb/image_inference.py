@@ -0,0 +1,123 @@
+"""
+Utilidades de inferencia sobre imágenes
+Conversión PIL <-> tensores NCHW e inferencia por mosaicos (tiles) con memoria acotada
+"""
+
+import numpy as np
+from PIL import Image
+
+
+def image_to_tensor(img):
+    """Convertir imagen PIL RGB a tensor float32 NCHW en [0, 1]"""
+    img_array = np.asarray(img.convert('RGB'), dtype=np.float32) / 255.0
+    return np.expand_dims(np.transpose(img_array, (2, 0, 1)), 0)
+
+
+def tensor_to_array(tensor):
+    """Convertir salida NCHW (o CHW) en [0, 1] a arreglo uint8 HWC"""
+    if tensor.ndim == 4:
+        tensor = tensor[0]
+    output = np.clip(tensor, 0, 1) * 255.0
+    return output.transpose(1, 2, 0).astype(np.uint8)
+
+
+def tensor_to_image(tensor):
+    """Convertir salida NCHW en [0, 1] a imagen PIL RGB"""
+    return Image.fromarray(tensor_to_array(tensor), 'RGB')
+
+
+def fixed_spatial_shape(input_shape):
+    """(alto, ancho) si el modelo tiene ejes espaciales fijos, None si son dinámicos"""
+    height, width = input_shape[2], input_shape[3]
+    if isinstance(height, int) and isinstance(width, int):
+        return height, width
+    return None
+
+
+def tile_windows(length, window, core):
+    """
+    Posiciones de los mosaicos sobre un eje
+
+    Returns:
+        Lista de (inicio_núcleo, fin_núcleo, inicio_ventana). La ventana de
+        tamaño `window` siempre cubre el núcleo más el halo disponible y se
+        desplaza hacia dentro en los bordes para no salir de la imagen.
+    """
+    halo = (window - core) // 2
+    positions = []
+    for core_start in range(0, length, core):
+        core_end = min(core_start + core, length)
+        window_start = min(max(core_start - halo, 0), max(length - window, 0))
+        positions.append((core_start, core_end, window_start))
+    return positions
+
+
+def run_tiled(img, run, tile_size=256, halo=8, batch_size=1, fixed_shape=None):
+    """
+    Inferencia por mosaicos solapados para modelos totalmente convolucionales
+
+    Args:
+        img: Imagen PIL de entrada
+        run: Función que recibe un lote NCHW float32 y devuelve la salida NCHW
+        tile_size: Lado del núcleo de cada mosaico (modelos con ejes dinámicos)
+        halo: Píxeles de contexto a cada lado para evitar costuras
+        batch_size: Mosaicos por llamada a `run`
+        fixed_shape: (alto, ancho) de entrada si el modelo no admite otros tamaños
+
+    Returns:
+        Imagen PIL con la salida completa, ensamblada en un buffer uint8
+    """
+    pixels = np.asarray(img.convert('RGB'))
+    height, width = pixels.shape[:2]
+
+    if fixed_shape:
+        window_h, window_w = fixed_shape
+    else:
+        window_h = min(tile_size + 2 * halo, height)
+        window_w = min(tile_size + 2 * halo, width)
+
+    # Imágenes más pequeñas que la ventana fija se rellenan con ceros
+    if height < window_h or width < window_w:
+        padded = np.zeros((max(height, window_h), max(width, window_w), 3), dtype=np.uint8)
+        padded[:height, :width] = pixels
+        source = padded
+    else:
+        source = pixels
+
+    core_h = window_h - 2 * halo if window_h < height else window_h
+    core_w = window_w - 2 * halo if window_w < width else window_w
+    if core_h <= 0 or core_w <= 0:
+        raise ValueError("El halo es demasiado grande para el tamaño de mosaico")
+
+    tiles = [
+        (row, col)
+        for row in tile_windows(height, window_h, core_h)
+        for col in tile_windows(width, window_w, core_w)
+    ]
+
+    output = None
+    scale = None
+    for i in range(0, len(tiles), batch_size):
+        group = tiles[i:i + batch_size]
+
+        # Solo se convierte a float32 la ventana de cada mosaico
+        batch = np.empty((len(group), 3, window_h, window_w), dtype=np.float32)
+        for j, ((_, _, wy), (_, _, wx)) in enumerate(group):
+            window = source[wy:wy + window_h, wx:wx + window_w]
+            batch[j] = window.transpose(2, 0, 1)
+        batch /= 255.0
+
+        result = run(batch)
+
+        if output is None:
+            # El factor de escala se deduce de la primera salida
+            scale = result.shape[2] // window_h
+            output = np.empty((height * scale, width * scale, 3), dtype=np.uint8)
+
+        for j, ((y0, y1, wy), (x0, x1, wx)) in enumerate(group):
+            core = result[j, :,
+                          (y0 - wy) * scale:(y1 - wy) * scale,
+                          (x0 - wx) * scale:(x1 - wx) * scale]
+            output[y0 * scale:y1 * scale, x0 * scale:x1 * scale] = tensor_to_array(core)
+
+    return Image.fromarray(output, 'RGB')
@@ -0,0 +1,76 @@
+"""
+Negociación de la variante de imagen según la red del cliente
+Combina la estimación de red del servidor con Save-Data y las client hints
+(ECT, RTT, Downlink) para elegir entre miniatura, imagen comprimida y versión
+mejorada con ESPCN. Las cabeceras solo pueden empeorar la estimación.
+"""
+
+from network_estimator import classify
+
+# De menor a mayor tamaño
+VARIANTS = ('thumbnail', 'compressed', 'enhanced')
+TIERS = ('poor', 'medium', 'good')
+TIER_VARIANTS = {'poor': 'thumbnail', 'medium': 'compressed', 'good': 'enhanced'}
+
+# Client hints que se piden con Accept-CH; Save-Data se envía siempre que está activo
+CLIENT_HINTS = ('ECT', 'RTT', 'Downlink')
+VARY_HEADERS = ('Save-Data',) + CLIENT_HINTS
+
+ECT_TIERS = {'slow-2g': 'poor', '2g': 'poor', '3g': 'medium'}
+# Chromium redondea Downlink y no informa de más de 10 Mbps: por encima no dice nada
+DOWNLINK_HINT_CAP = 10.0
+
+
+def _float_header(headers, name):
+    try:
+        return float(headers.get(name, ''))
+    except ValueError:
+        return None
+
+
+def hint_tier(headers):
+    """(calidad, motivo) según Save-Data y client hints, o (None, None) si no limitan nada"""
+    if headers.get('Save-Data', '').strip().lower() == 'on':
+        return 'poor', 'save-data'
+
+    tiers = []
+    ect = headers.get('ECT', '').strip().lower()
+    if ect in ECT_TIERS:
+        tiers.append(ECT_TIERS[ect])
+    rtt = _float_header(headers, 'RTT')
+    downlink = _float_header(headers, 'Downlink')
+    if rtt is not None or (downlink is not None and downlink < DOWNLINK_HINT_CAP):
+        bandwidth = downlink if downlink is not None and downlink < DOWNLINK_HINT_CAP else float('inf')
+        tiers.append(classify(bandwidth, rtt if rtt is not None else 0)[0])
+
+    if not tiers:
+        return None, None
+    return min(tiers, key=TIERS.index), 'client-hints'
+
+
+def negotiate_tier(conditions, headers):
+    """
+    Calidad de red efectiva de una petición
+
+    Args:
+        conditions: estimación del servidor (NetworkEstimator.conditions)
+        headers: cabeceras de la petición
+
+    Returns:
+        (calidad, motivo) con motivo save-data, client-hints, estimate o default
+    """
+    tier = conditions['quality']
+    reason = 'estimate' if conditions.get('source') == 'estimate' else 'default'
+    capped, capped_reason = hint_tier(headers)
+    if capped and TIERS.index(capped) < TIERS.index(tier):
+        return capped, capped_reason
+    return tier, reason
+
+
+def choose_variant(tier, available):
+    """Variante para una calidad: la preferida o, si falta, la más cercana por debajo y luego por encima"""
+    preferred = VARIANTS.index(TIER_VARIANTS[tier])
+    for index in list(range(preferred, -1, -1)) + list(range(preferred + 1, len(VARIANTS))):
+        if VARIANTS[index] in available:
+            return VARIANTS[index]
+    return None
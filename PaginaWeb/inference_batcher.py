@@ -0,0 +1,163 @@
+"""
+Planificador de inferencia con micro-batching
+Agrupa peticiones concurrentes con la misma forma en un único session.run
+"""
+
+import queue
+import threading
+import time
+from collections import Counter, deque
+from concurrent.futures import Future
+
+import numpy as np
+
+
+class _Job:
+    """Petición pendiente de inferencia"""
+
+    def __init__(self, tensor):
+        self.tensor = tensor
+        self.future = Future()
+        self.enqueued_at = time.perf_counter()
+
+
+class InferenceBatcher:
+    """Hilo en segundo plano que agrupa tensores NCHW y los ejecuta en lote"""
+
+    def __init__(self, get_model, max_batch_size=4, max_wait_ms=5, name='modelo'):
+        self.get_model = get_model
+        self.max_batch_size = max(1, int(max_batch_size))
+        self.max_wait = max(0.0, max_wait_ms / 1000.0)
+        self.name = name
+
+        self._queue = queue.Queue()
+        self._thread = None
+        self._start_lock = threading.Lock()
+
+        # Estadísticas para ajustar rendimiento vs latencia
+        self._stats_lock = threading.Lock()
+        self._batch_sizes = Counter()
+        self._wait_times = deque(maxlen=1000)
+        self._run_times = deque(maxlen=1000)
+        self._jobs_done = 0
+        self._jobs_failed = 0
+
+    def start(self):
+        """Iniciar el hilo planificador si aún no está en marcha"""
+        with self._start_lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(
+                    target=self._loop, name=f'batcher-{self.name}', daemon=True)
+                self._thread.start()
+
+    def submit(self, tensor):
+        """Encolar un tensor (1, C, H, W) y devolver un Future con su salida"""
+        if tensor.ndim == 3:
+            tensor = np.expand_dims(tensor, 0)
+        if tensor.shape[0] != 1:
+            raise ValueError("Solo se encolan tensores con batch 1")
+
+        self.start()
+        job = _Job(tensor)
+        self._queue.put(job)
+        return job.future
+
+    def run(self, tensor, timeout=None):
+        """Encolar y esperar el resultado (bloqueante)"""
+        return self.submit(tensor).result(timeout=timeout)
+
+    def _collect(self):
+        """Tomar el primer trabajo y esperar como máximo max_wait por más"""
+        jobs = [self._queue.get()]
+        deadline = time.perf_counter() + self.max_wait
+
+        while len(jobs) < self.max_batch_size:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            try:
+                jobs.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return jobs
+
+    def _loop(self):
+        """Bucle principal del planificador"""
+        while True:
+            jobs = self._collect()
+
+            # Solo se pueden apilar tensores con la misma forma
+            groups = {}
+            for job in jobs:
+                groups.setdefault(job.tensor.shape, []).append(job)
+
+            for group in groups.values():
+                self._run_group(group)
+
+    def _run_group(self, group):
+        """Ejecutar un lote y repartir las salidas a cada petición"""
+        started = time.perf_counter()
+        try:
+            model = self.get_model()
+            if len(group) == 1:
+                batch = group[0].tensor
+            else:
+                batch = np.concatenate([job.tensor for job in group], axis=0)
+            output = model.run(batch)
+        except Exception as e:
+            for job in group:
+                job.future.set_exception(e)
+            with self._stats_lock:
+                self._jobs_failed += len(group)
+            return
+
+        finished = time.perf_counter()
+        for i, job in enumerate(group):
+            job.future.set_result(output[i:i + 1])
+
+        with self._stats_lock:
+            self._batch_sizes[len(group)] += 1
+            self._run_times.append(finished - started)
+            self._wait_times.extend(started - job.enqueued_at for job in group)
+            self._jobs_done += len(group)
+
+    def stats(self):
+        """Profundidad de cola, histograma de lotes y tiempos de espera"""
+        with self._stats_lock:
+            waits = sorted(self._wait_times)
+            runs = sorted(self._run_times)
+            histogram = dict(sorted(self._batch_sizes.items()))
+            jobs_done = self._jobs_done
+            jobs_failed = self._jobs_failed
+
+        return {
+            'model': self.name,
+            'running': self._thread is not None and self._thread.is_alive(),
+            'max_batch_size': self.max_batch_size,
+            'max_wait_ms': self.max_wait * 1000,
+            'queue_depth': self._queue.qsize(),
+            'jobs_done': jobs_done,
+            'jobs_failed': jobs_failed,
+            'batch_size_histogram': histogram,
+            'wait_ms': _summary_ms(waits),
+            'run_ms': _summary_ms(runs),
+        }
+
+
+def _summary_ms(sorted_values):
+    """Resumen de percentiles en milisegundos de una lista ordenada"""
+    if not sorted_values:
+        return {'count': 0}
+
+    def pct(p):
+        index = min(len(sorted_values) - 1, int(round(p / 100.0 * (len(sorted_values) - 1))))
+        return round(sorted_values[index] * 1000, 3)
+
+    return {
+        'count': len(sorted_values),
+        'avg': round(sum(sorted_values) / len(sorted_values) * 1000, 3),
+        'p50': pct(50),
+        'p95': pct(95),
+        'p99': pct(99),
+        'max': round(sorted_values[-1] * 1000, 3),
+    }
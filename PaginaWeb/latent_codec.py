@@ -0,0 +1,91 @@
+"""
+Formato de almacenamiento de latentes de autoencoder (.dzl)
+Guarda la salida del codificador cuantizada a uint8 por canal y comprimida
+con zlib, precedida de una cabecera con el modelo, la forma y la cuantización
+
+Estructura (little-endian):
+    b'DZL1' | versión u8 | len(modelo) u8 | modelo ascii | ndim u8 | forma u16*ndim
+    | mínimos f32*C | escalas f32*C | len(payload) u32 | payload zlib(uint8 CHW)
+"""
+
+import struct
+import zlib
+
+import numpy as np
+
+MAGIC = b'DZL1'
+VERSION = 1
+EXTENSION = '.dzl'
+MIMETYPE = 'application/x-dyzen-latent'
+
+
+def quantize(latent):
+    """Cuantización asimétrica uint8 por canal de un tensor CHW float32"""
+    channels = latent.shape[0]
+    flat = latent.reshape(channels, -1)
+    mins = flat.min(axis=1).astype(np.float32)
+    scales = ((flat.max(axis=1) - mins) / 255.0).astype(np.float32)
+    scales[scales == 0] = 1.0
+    quantized = np.rint((flat - mins[:, None]) / scales[:, None])
+    return np.clip(quantized, 0, 255).astype(np.uint8).reshape(latent.shape), mins, scales
+
+
+def dequantize(quantized, mins, scales):
+    """Reconstruir el tensor float32 a partir de los valores uint8"""
+    channels = quantized.shape[0]
+    flat = quantized.reshape(channels, -1).astype(np.float32)
+    return (flat * scales[:, None] + mins[:, None]).reshape(quantized.shape)
+
+
+def encode_latent(model_id, latent, level=9):
+    """Serializar un latente CHW (o 1xCxHxW) del modelo indicado"""
+    if latent.ndim == 4:
+        latent = latent[0]
+    quantized, mins, scales = quantize(np.asarray(latent, dtype=np.float32))
+    payload = zlib.compress(quantized.tobytes(), level)
+    model_bytes = model_id.encode('ascii')
+
+    header = MAGIC + struct.pack('<BB', VERSION, len(model_bytes)) + model_bytes
+    header += struct.pack(f'<B{quantized.ndim}H', quantized.ndim, *quantized.shape)
+    header += mins.astype('<f4').tobytes() + scales.astype('<f4').tobytes()
+    return header + struct.pack('<I', len(payload)) + payload
+
+
+def decode_latent(data):
+    """
+    Leer un archivo .dzl
+
+    Returns:
+        (model_id, latente float32 con forma 1xCxHxW)
+    """
+    if data[:4] != MAGIC:
+        raise ValueError("No es un archivo de latentes DZL")
+    offset = 4
+    version, model_length = struct.unpack_from('<BB', data, offset)
+    if version != VERSION:
+        raise ValueError(f"Versión de latentes no soportada: {version}")
+    offset += 2
+    model_id = data[offset:offset + model_length].decode('ascii')
+    offset += model_length
+
+    ndim = data[offset]
+    offset += 1
+    shape = struct.unpack_from(f'<{ndim}H', data, offset)
+    offset += 2 * ndim
+
+    channels = shape[0]
+    mins = np.frombuffer(data, dtype='<f4', count=channels, offset=offset)
+    offset += 4 * channels
+    scales = np.frombuffer(data, dtype='<f4', count=channels, offset=offset)
+    offset += 4 * channels
+
+    (payload_length,) = struct.unpack_from('<I', data, offset)
+    offset += 4
+    quantized = np.frombuffer(zlib.decompress(data[offset:offset + payload_length]), dtype=np.uint8)
+    latent = dequantize(quantized.reshape(shape), mins, scales)
+    return model_id, latent[np.newaxis]
+
+
+def is_latent_path(path):
+    """Indica si una ruta de imagen es en realidad un latente almacenado"""
+    return bool(path) and path.endswith(EXTENSION)
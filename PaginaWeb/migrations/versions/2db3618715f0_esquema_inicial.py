@@ -0,0 +1,85 @@
+"""Esquema inicial
+
+Tablas tal como las creaba db.create_all() antes de usar migraciones. Las
+bases de datos existentes ya las tienen: solo se crean las que falten, así
+que `flask db upgrade` funciona sin tener que marcar antes la revisión.
+
+Revision ID: 2db3618715f0
+Revises:
+Create Date: 2026-10-18 15:05:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '2db3618715f0'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    existing = set(sa.inspect(op.get_bind()).get_table_names())
+
+    if 'post' not in existing:
+        op.create_table('post',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('title', sa.String(length=100), nullable=False),
+        sa.Column('image_path', sa.String(length=255), nullable=False),
+        sa.Column('compressed_path', sa.String(length=255), nullable=True),
+        sa.Column('original_size', sa.Integer(), nullable=True),
+        sa.Column('compressed_size', sa.Integer(), nullable=True),
+        sa.Column('compression_level', sa.Integer(), nullable=True),
+        sa.Column('upvotes', sa.Integer(), nullable=True),
+        sa.Column('downvotes', sa.Integer(), nullable=True),
+        sa.Column('username', sa.String(length=50), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.Column('subreddit', sa.String(length=50), nullable=True),
+        sa.Column('post_metadata', sa.Text(), nullable=True),
+        sa.PrimaryKeyConstraint('id')
+        )
+    if 'network_metrics' not in existing:
+        op.create_table('network_metrics',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('user_ip', sa.String(length=50), nullable=True),
+        sa.Column('bandwidth', sa.Float(), nullable=True),
+        sa.Column('latency', sa.Float(), nullable=True),
+        sa.Column('quality', sa.String(length=20), nullable=True),
+        sa.Column('recommended_compression', sa.Integer(), nullable=True),
+        sa.Column('timestamp', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('id')
+        )
+    if 'comment' not in existing:
+        op.create_table('comment',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('post_id', sa.Integer(), nullable=False),
+        sa.Column('username', sa.String(length=50), nullable=True),
+        sa.Column('content', sa.Text(), nullable=False),
+        sa.Column('upvotes', sa.Integer(), nullable=True),
+        sa.Column('downvotes', sa.Integer(), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['post_id'], ['post.id'], ),
+        sa.PrimaryKeyConstraint('id')
+        )
+    if 'vote' not in existing:
+        op.create_table('vote',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('post_id', sa.Integer(), nullable=True),
+        sa.Column('comment_id', sa.Integer(), nullable=True),
+        sa.Column('user_ip', sa.String(length=50), nullable=True),
+        sa.Column('vote_type', sa.String(length=10), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['comment_id'], ['comment.id'], ),
+        sa.ForeignKeyConstraint(['post_id'], ['post.id'], ),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('post_id', 'user_ip', 'comment_id', name='unique_vote')
+        )
+
+
+def downgrade():
+    op.drop_table('vote')
+    op.drop_table('comment')
+    op.drop_table('network_metrics')
+    op.drop_table('post')
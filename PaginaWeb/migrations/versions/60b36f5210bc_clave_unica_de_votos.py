@@ -0,0 +1,63 @@
+"""Clave única de votos por objetivo
+
+unique_vote (post_id, user_ip, comment_id) no impide votos duplicados porque
+post_id o comment_id siempre es NULL y MySQL trata cada NULL como distinto.
+target_key ('post:<id>' / 'comment:<id>') nunca es NULL y la restricción
+(target_key, user_ip) sí lo garantiza. Los duplicados existentes se borran
+(se conserva el voto más antiguo); después conviene ejecutar
+`flask --app app reconcile-votes --fix` para corregir los contadores.
+
+Revision ID: 60b36f5210bc
+Revises: 86d502888621
+Create Date: 2026-10-18 15:30:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '60b36f5210bc'
+down_revision = '86d502888621'
+branch_labels = None
+depends_on = None
+
+vote = sa.table(
+    'vote',
+    sa.column('id', sa.Integer),
+    sa.column('post_id', sa.Integer),
+    sa.column('comment_id', sa.Integer),
+    sa.column('user_ip', sa.String),
+    sa.column('target_key', sa.String),
+)
+
+
+def upgrade():
+    with op.batch_alter_table('vote', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('target_key', sa.String(length=32), nullable=True))
+
+    conn = op.get_bind()
+    seen = set()
+    duplicates = []
+    rows = conn.execute(sa.select(vote.c.id, vote.c.post_id, vote.c.comment_id, vote.c.user_ip)
+                        .order_by(vote.c.id)).fetchall()
+    for row in rows:
+        target_key = f'post:{row.post_id}' if row.post_id is not None else f'comment:{row.comment_id}'
+        if (target_key, row.user_ip) in seen:
+            duplicates.append(row.id)
+            continue
+        seen.add((target_key, row.user_ip))
+        conn.execute(vote.update().where(vote.c.id == row.id).values(target_key=target_key))
+    if duplicates:
+        conn.execute(vote.delete().where(vote.c.id.in_(duplicates)))
+        print(f"⚠️  {len(duplicates)} votos duplicados borrados; ejecutar reconcile-votes --fix")
+
+    with op.batch_alter_table('vote', schema=None) as batch_op:
+        batch_op.alter_column('target_key', existing_type=sa.String(length=32), nullable=False)
+        batch_op.create_unique_constraint('unique_vote_target', ['target_key', 'user_ip'])
+
+
+def downgrade():
+    with op.batch_alter_table('vote', schema=None) as batch_op:
+        batch_op.drop_constraint('unique_vote_target', type_='unique')
+        batch_op.drop_column('target_key')
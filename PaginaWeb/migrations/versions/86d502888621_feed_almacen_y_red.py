@@ -0,0 +1,89 @@
+"""Feed desnormalizado, almacén por contenido y agregados de red
+
+Conteos y metadatos del post, puntuaciones del ranking e índices compuestos
+(orden, id) para la paginación por cursor, con y sin subreddit. Los valores de
+los posts existentes se rellenan después con
+`flask --app app backfill-post-columns`.
+
+Tablas nuevas: stored_image (objetos del almacén con su número de referencias)
+y network_metrics_minute (mediciones de red agregadas por minuto).
+
+Revision ID: 86d502888621
+Revises: 2db3618715f0
+Create Date: 2026-10-18 15:06:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '86d502888621'
+down_revision = '2db3618715f0'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('post', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('comment_count', sa.Integer(), server_default='0', nullable=False))
+        batch_op.add_column(sa.Column('thumbnail_path', sa.String(length=255), nullable=True))
+        batch_op.add_column(sa.Column('processing_method', sa.String(length=50), nullable=True))
+        batch_op.add_column(sa.Column('model_used', sa.String(length=100), nullable=True))
+        batch_op.add_column(sa.Column('espcn_applied', sa.Boolean(), server_default='0', nullable=False))
+        batch_op.add_column(sa.Column('score', sa.Integer(), server_default='0', nullable=False))
+        batch_op.add_column(sa.Column('hot_score', sa.Float(), server_default='0', nullable=False))
+        batch_op.create_index('ix_post_hot', ['hot_score', 'id'], unique=False)
+        batch_op.create_index('ix_post_top', ['score', 'id'], unique=False)
+        batch_op.create_index('ix_post_new', ['created_at', 'id'], unique=False)
+        batch_op.create_index('ix_post_subreddit_hot', ['subreddit', 'hot_score', 'id'], unique=False)
+        batch_op.create_index('ix_post_subreddit_top', ['subreddit', 'score', 'id'], unique=False)
+        batch_op.create_index('ix_post_subreddit_new', ['subreddit', 'created_at', 'id'], unique=False)
+
+    op.create_table('stored_image',
+    sa.Column('digest', sa.String(length=64), nullable=False),
+    sa.Column('path', sa.String(length=255), nullable=False),
+    sa.Column('size', sa.Integer(), nullable=True),
+    sa.Column('ref_count', sa.Integer(), server_default='0', nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('digest'),
+    sa.UniqueConstraint('path')
+    )
+    op.create_table('network_metrics_minute',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('minute', sa.DateTime(), nullable=False),
+    sa.Column('user_ip', sa.String(length=50), nullable=True),
+    sa.Column('samples', sa.Integer(), nullable=False),
+    sa.Column('bandwidth_sum', sa.Float(), nullable=False),
+    sa.Column('bandwidth_min', sa.Float(), nullable=True),
+    sa.Column('bandwidth_max', sa.Float(), nullable=True),
+    sa.Column('latency_sum', sa.Float(), nullable=False),
+    sa.Column('latency_min', sa.Float(), nullable=True),
+    sa.Column('latency_max', sa.Float(), nullable=True),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('minute', 'user_ip', name='unique_network_minute')
+    )
+    with op.batch_alter_table('network_metrics_minute', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_network_metrics_minute_minute'), ['minute'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('network_metrics_minute', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_network_metrics_minute_minute'))
+
+    op.drop_table('network_metrics_minute')
+    op.drop_table('stored_image')
+    with op.batch_alter_table('post', schema=None) as batch_op:
+        batch_op.drop_index('ix_post_subreddit_new')
+        batch_op.drop_index('ix_post_subreddit_top')
+        batch_op.drop_index('ix_post_subreddit_hot')
+        batch_op.drop_index('ix_post_new')
+        batch_op.drop_index('ix_post_top')
+        batch_op.drop_index('ix_post_hot')
+        batch_op.drop_column('hot_score')
+        batch_op.drop_column('score')
+        batch_op.drop_column('espcn_applied')
+        batch_op.drop_column('model_used')
+        batch_op.drop_column('processing_method')
+        batch_op.drop_column('thumbnail_path')
+        batch_op.drop_column('comment_count')
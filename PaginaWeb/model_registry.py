@@ -0,0 +1,311 @@
+"""
+Registro de modelos ONNX para inferencia en el servidor
+Carga cada modelo una sola vez por proceso y comparte la sesión entre hilos
+"""
+
+import json
+import os
+import threading
+import time
+
+import numpy as np
+import onnxruntime as ort
+
+from content_store import file_digest
+
+# Modelos disponibles en static/models
+MODEL_FILES = {
+    'espcn': 'espcn_model.onnx',
+    'autoencoder_b8': 'autoencoder_b8.onnx',
+    'autoencoder_b16': 'autoencoder_b16.onnx',
+    'autoencoder_b32': 'autoencoder_b32.onnx',
+    # Codificador y decodificador por separado (almacenamiento de latentes)
+    'autoencoder_b8_encoder': 'autoencoder_b8_encoder.onnx',
+    'autoencoder_b8_decoder': 'autoencoder_b8_decoder.onnx',
+    'autoencoder_b16_encoder': 'autoencoder_b16_encoder.onnx',
+    'autoencoder_b16_decoder': 'autoencoder_b16_decoder.onnx',
+    'autoencoder_b32_encoder': 'autoencoder_b32_encoder.onnx',
+    'autoencoder_b32_decoder': 'autoencoder_b32_decoder.onnx',
+}
+
+# Variantes generadas por scripts/convert_models_to_onnx.py --variants
+MODEL_VARIANTS = ('fp32', 'int8_dynamic', 'int8_static', 'fp16')
+
+
+def variant_filename(filename, variant):
+    """Archivo de una variante: espcn_model.onnx -> espcn_model.int8_static.onnx"""
+    if variant == 'fp32':
+        return filename
+    root, ext = os.path.splitext(filename)
+    return f"{root}.{variant}{ext}"
+
+
+# Índice de los artefactos precompilados (scripts/build_model_artifacts.py)
+ARTIFACT_MANIFEST = 'manifest.json'
+
+
+def artifact_key(name, variant, graph_optimization):
+    """Clave de un artefacto en el manifiesto: espcn.fp32.all"""
+    return f"{name}.{variant}.{graph_optimization}"
+
+
+GRAPH_OPTIMIZATION_LEVELS = {
+    'disable': ort.GraphOptimizationLevel.ORT_DISABLE_ALL,
+    'basic': ort.GraphOptimizationLevel.ORT_ENABLE_BASIC,
+    'extended': ort.GraphOptimizationLevel.ORT_ENABLE_EXTENDED,
+    'all': ort.GraphOptimizationLevel.ORT_ENABLE_ALL,
+}
+
+# Tamaño (alto, ancho) para los ejes espaciales dinámicos en benchmarks y calentamiento
+DEFAULT_SPATIAL_SIZE = (1024, 768)
+WARMUP_SPATIAL_SIZE = (256, 256)
+
+# Los decodificadores reciben el latente, con 1/8 de la resolución de la imagen
+LATENT_STRIDE = 8
+
+EXECUTION_MODES = {
+    'sequential': ort.ExecutionMode.ORT_SEQUENTIAL,
+    'parallel': ort.ExecutionMode.ORT_PARALLEL,
+}
+
+
+class LoadedModel:
+    """Sesión ONNX cargada junto con su información de estado"""
+
+    def __init__(self, name, path, session, load_time, from_cache=False, variant='fp32', run_observer=None):
+        self.name = name
+        self.path = path
+        self.variant = variant
+        self.session = session
+        self.input_name = session.get_inputs()[0].name
+        self.output_name = session.get_outputs()[0].name
+        self.input_shape = session.get_inputs()[0].shape
+        self.load_time = load_time
+        self.loaded_at = time.time()
+        self.from_cache = from_cache
+        self.warmed_up = False
+        self.warmup_time = None
+        self.run_observer = run_observer
+
+    def run(self, input_tensor):
+        """Ejecutar inferencia (InferenceSession.run es seguro entre hilos)"""
+        start = time.perf_counter()
+        output = self.session.run([self.output_name], {self.input_name: input_tensor})[0]
+        if self.run_observer:
+            self.run_observer(self.name, time.perf_counter() - start)
+        self.warmed_up = True
+        return output
+
+    def dummy_input(self, batch_size=1, spatial_size=DEFAULT_SPATIAL_SIZE):
+        """Tensor de ceros con la forma de entrada (alto y ancho dinámicos = spatial_size)"""
+        stride = LATENT_STRIDE if self.input_name == 'latent' else 1
+        defaults = [batch_size, 1, spatial_size[0] // stride, spatial_size[1] // stride]
+        shape = [dim if isinstance(dim, int) else default
+                 for dim, default in zip(self.input_shape, defaults)]
+        shape[0] = batch_size
+        return np.zeros(shape, dtype=np.float32)
+
+
+class ModelRegistry:
+    """Registro perezoso de sesiones ONNX, una por modelo y por proceso"""
+
+    def __init__(self, models_dir, intra_op_threads=0, inter_op_threads=0,
+                 graph_optimization='all', execution_mode='sequential',
+                 optimized_cache_dir=None, variants=None, artifacts_dir=None, run_observer=None):
+        self.models_dir = models_dir
+        self.intra_op_threads = intra_op_threads
+        self.inter_op_threads = inter_op_threads
+        self.graph_optimization = graph_optimization
+        self.execution_mode = execution_mode
+        self.optimized_cache_dir = optimized_cache_dir
+        self.variants = dict(variants or {})
+        self.artifacts_dir = artifacts_dir
+        self.run_observer = run_observer   # f(nombre, segundos) tras cada session.run
+        self._manifest = None
+
+        self._models = {}
+        self._errors = {}
+        self._locks = {name: threading.Lock() for name in MODEL_FILES}
+
+        # Disponibilidad calculada una vez; los archivos no cambian en caliente
+        self.models_dir_exists = os.path.isdir(models_dir)
+        self._available = {name: os.path.exists(self.model_path(name)) for name in MODEL_FILES}
+
+    def model_path(self, name):
+        """Ruta del archivo ONNX original de un modelo"""
+        if name not in MODEL_FILES:
+            raise KeyError(f"Modelo desconocido: {name}")
+        return os.path.join(self.models_dir, MODEL_FILES[name])
+
+    def variant(self, name):
+        """Variante configurada para un modelo (fp32 si no hay o falta su archivo)"""
+        variant = self.variants.get(name, 'fp32')
+        if variant not in MODEL_VARIANTS:
+            raise ValueError(f"Variante desconocida para {name}: {variant}")
+        if variant != 'fp32' and not os.path.exists(self.variant_path(name, variant)):
+            print(f"⚠️  Variante {variant} de {name} no encontrada, usando fp32")
+            return 'fp32'
+        return variant
+
+    def variant_path(self, name, variant):
+        """Ruta del archivo ONNX de una variante de un modelo"""
+        return os.path.join(self.models_dir, variant_filename(MODEL_FILES[name], variant))
+
+    def cached_model_path(self, name, variant='fp32'):
+        """Ruta del modelo optimizado serializado (si la caché está habilitada)"""
+        if not self.optimized_cache_dir:
+            return None
+        # El grafo optimizado depende de la variante, del nivel y de la versión de ONNX Runtime
+        stem = name if variant == 'fp32' else f"{name}.{variant}"
+        filename = f"{stem}.{self.graph_optimization}.ort{ort.__version__}.onnx"
+        return os.path.join(self.optimized_cache_dir, filename)
+
+    def manifest(self):
+        """Manifiesto de artefactos precompilados (vacío si no hay o es de otra versión de ORT)"""
+        if self._manifest is None:
+            manifest = {}
+            path = os.path.join(self.artifacts_dir, ARTIFACT_MANIFEST) if self.artifacts_dir else None
+            if path and os.path.exists(path):
+                with open(path) as f:
+                    manifest = json.load(f)
+                if manifest.get('onnxruntime') != ort.__version__:
+                    print(f"⚠️  Artefactos generados con ONNX Runtime {manifest.get('onnxruntime')}, se ignoran")
+                    manifest = {}
+            self._manifest = manifest
+        return self._manifest
+
+    def artifact_path(self, name, variant, source_path):
+        """
+        Artefacto precompilado válido para un modelo, o None
+
+        Solo se usa si el hash del ONNX original y el del propio artefacto
+        coinciden con los del manifiesto, así que un modelo actualizado nunca
+        se carga con un grafo optimizado antiguo.
+        """
+        entry = self.manifest().get('artifacts', {}).get(artifact_key(name, variant, self.graph_optimization))
+        if not entry or entry['source_sha256'] != file_digest(source_path):
+            return None
+        artifact = entry['files'][entry['preferred']]
+        path = os.path.join(self.artifacts_dir, artifact['file'])
+        if not os.path.exists(path) or file_digest(path) != artifact['sha256']:
+            return None
+        return path
+
+    def session_options(self, optimized_output=None, skip_optimization=False):
+        """Construir SessionOptions a partir de la configuración"""
+        options = ort.SessionOptions()
+        options.intra_op_num_threads = self.intra_op_threads
+        options.inter_op_num_threads = self.inter_op_threads
+        options.execution_mode = EXECUTION_MODES[self.execution_mode]
+
+        if skip_optimization:
+            # El archivo ya contiene el grafo optimizado
+            options.graph_optimization_level = GRAPH_OPTIMIZATION_LEVELS['disable']
+        else:
+            options.graph_optimization_level = GRAPH_OPTIMIZATION_LEVELS[self.graph_optimization]
+
+        if optimized_output:
+            options.optimized_model_filepath = optimized_output
+
+        return options
+
+    def _load(self, name):
+        """Crear la sesión, reutilizando el modelo optimizado en disco si existe"""
+        variant = self.variant(name)
+        source_path = self.variant_path(name, variant)
+        cached_path = self.cached_model_path(name, variant)
+        artifact_path = self.artifact_path(name, variant, source_path) if self.artifacts_dir else None
+
+        start = time.perf_counter()
+        if artifact_path:
+            session = ort.InferenceSession(
+                artifact_path, self.session_options(skip_optimization=True),
+                providers=['CPUExecutionProvider'])
+            from_cache = True
+        elif cached_path and os.path.exists(cached_path) \
+                and os.path.getmtime(cached_path) >= os.path.getmtime(source_path):
+            session = ort.InferenceSession(
+                cached_path, self.session_options(skip_optimization=True),
+                providers=['CPUExecutionProvider'])
+            from_cache = True
+        else:
+            if cached_path:
+                os.makedirs(self.optimized_cache_dir, exist_ok=True)
+            session = ort.InferenceSession(
+                source_path, self.session_options(optimized_output=cached_path),
+                providers=['CPUExecutionProvider'])
+            from_cache = False
+        load_time = time.perf_counter() - start
+
+        return LoadedModel(name, source_path, session, load_time, from_cache, variant, self.run_observer)
+
+    def get(self, name):
+        """Obtener el modelo cargado, creándolo la primera vez que se pide"""
+        model = self._models.get(name)
+        if model is not None:
+            return model
+
+        if name not in self._locks:
+            raise KeyError(f"Modelo desconocido: {name}")
+
+        with self._locks[name]:
+            # Otro hilo pudo haberlo cargado mientras esperábamos
+            model = self._models.get(name)
+            if model is None:
+                try:
+                    model = self._load(name)
+                except Exception as e:
+                    self._errors[name] = str(e)
+                    raise
+                self._errors.pop(name, None)
+                self._models[name] = model
+                print(f"Modelo {name} ({model.variant}) cargado en {model.load_time * 1000:.0f} ms")
+        return model
+
+    def warmup(self, name):
+        """Ejecutar una inferencia de prueba para reservar memoria y kernels"""
+        model = self.get(name)
+        start = time.perf_counter()
+        model.run(model.dummy_input(spatial_size=WARMUP_SPATIAL_SIZE))
+        model.warmup_time = time.perf_counter() - start
+        return model
+
+    def preload(self, names=None, warmup=True):
+        """Cargar (y opcionalmente calentar) modelos al iniciar el servidor"""
+        for name in names or MODEL_FILES:
+            try:
+                if warmup:
+                    self.warmup(name)
+                else:
+                    self.get(name)
+            except Exception as e:
+                print(f"Error precargando modelo {name}: {e}")
+
+    def is_available(self, name):
+        """Indicar si el archivo del modelo existía al crear el registro"""
+        return self._available.get(name, False)
+
+    def status(self):
+        """Estado de cada modelo del registro"""
+        models = {}
+        for name in MODEL_FILES:
+            model = self._models.get(name)
+            if model is not None:
+                models[name] = {
+                    'available': True,
+                    'loaded': True,
+                    'variant': model.variant,
+                    'load_time_ms': round(model.load_time * 1000, 2),
+                    'loaded_at': model.loaded_at,
+                    'from_optimized_cache': model.from_cache,
+                    'warmed_up': model.warmed_up,
+                    'warmup_time_ms': round(model.warmup_time * 1000, 2) if model.warmup_time else None,
+                    'input_shape': model.input_shape,
+                }
+            else:
+                models[name] = {
+                    'available': self.is_available(name),
+                    'loaded': False,
+                    'error': self._errors.get(name),
+                }
+        return models
@@ -0,0 +1,142 @@
+"""
+Estimación de las condiciones de red de cada cliente
+Mantiene en memoria una media móvil exponencial (EWMA) de ancho de banda y
+latencia por cliente a partir de las mediciones que envía el navegador, y
+resuelve con ella el nivel de compresión recomendado (8/16/32). Las consultas
+son O(1) y no tocan la base de datos; al arrancar se precalienta con las
+mediciones recientes guardadas.
+"""
+
+import math
+import threading
+import time
+from collections import OrderedDict
+
+# (calidad, compresión, ancho de banda mínimo en Mbps, latencia máxima en ms),
+# los mismos umbrales que analyzeConditions() en static/js/network_speed.js
+QUALITY_LEVELS = (
+    ('poor', 8, 20, 200),
+    ('medium', 16, 50, 100),
+)
+BEST_QUALITY = ('good', 32)
+
+DEFAULT_CONDITIONS = {'quality': 'medium', 'compression': 16, 'bandwidth': 50, 'latency': 100}
+
+
+def classify(bandwidth, latency):
+    """Calidad y nivel de compresión para un ancho de banda (Mbps) y una latencia (ms)"""
+    for quality, compression, min_bandwidth, max_latency in QUALITY_LEVELS:
+        if bandwidth < min_bandwidth or latency > max_latency:
+            return quality, compression
+    return BEST_QUALITY
+
+
+class NetworkEstimator:
+    """
+    EWMA de ancho de banda y latencia por cliente
+
+    Cada muestra pesa `alpha`; además el peso del valor anterior se reduce a la
+    mitad cada `half_life` segundos, para que tras una pausa larga mande la
+    medición nueva. Los clientes sin muestras en `max_age` segundos vuelven a
+    las condiciones por defecto. Se guardan como mucho `max_clients` (LRU).
+    """
+
+    def __init__(self, alpha=0.3, half_life=120, max_age=1800, max_clients=10000):
+        self.alpha = alpha
+        self.half_life = half_life
+        self.max_age = max_age
+        self.max_clients = max_clients
+        self._clients = OrderedDict()   # cliente -> [ancho de banda, latencia, muestras, última muestra]
+        self._lock = threading.Lock()
+        self._warm_lock = threading.Lock()
+        self._next_warm_attempt = 0.0
+        self.warmed = False
+        self.observed = 0
+        self.rejected = 0
+
+    def observe(self, client, bandwidth, latency, timestamp=None):
+        """Añadir una medición del cliente; devuelve False si no es válida"""
+        try:
+            bandwidth = float(bandwidth)
+            latency = float(latency)
+        except (TypeError, ValueError):
+            bandwidth = latency = float('nan')
+        if not (math.isfinite(bandwidth) and math.isfinite(latency)) or bandwidth < 0 or latency < 0:
+            self.rejected += 1
+            return False
+
+        now = time.time() if timestamp is None else timestamp
+        with self._lock:
+            state = self._clients.get(client)
+            if state is None:
+                self._clients[client] = [bandwidth, latency, 1, now]
+            else:
+                elapsed = max(0.0, now - state[3])
+                keep = (1 - self.alpha) * 0.5 ** (elapsed / self.half_life)
+                state[0] = keep * state[0] + (1 - keep) * bandwidth
+                state[1] = keep * state[1] + (1 - keep) * latency
+                state[2] += 1
+                state[3] = max(state[3], now)
+                self._clients.move_to_end(client)
+            while len(self._clients) > self.max_clients:
+                self._clients.popitem(last=False)
+            self.observed += 1
+        return True
+
+    def conditions(self, client):
+        """Condiciones estimadas del cliente (o las de por defecto si no hay muestras recientes)"""
+        with self._lock:
+            state = self._clients.get(client)
+            if state is not None and time.time() - state[3] > self.max_age:
+                del self._clients[client]
+                state = None
+            if state is None:
+                return dict(DEFAULT_CONDITIONS, samples=0, source='default')
+            bandwidth, latency, samples, _ = state
+
+        quality, compression = classify(bandwidth, latency)
+        return {
+            'quality': quality,
+            'compression': compression,
+            'bandwidth': round(bandwidth, 1),
+            'latency': round(latency),
+            'samples': samples,
+            'source': 'estimate',
+        }
+
+    def warm(self, load_samples, retry_after=30):
+        """
+        Precalentar una sola vez con mediciones guardadas
+
+        `load_samples(since)` devuelve tuplas (cliente, ancho de banda, latencia,
+        timestamp) posteriores a `since`, en orden cronológico. Si la lectura
+        falla se propaga la excepción y se reintenta pasados `retry_after` segundos.
+        """
+        with self._warm_lock:
+            if self.warmed or time.monotonic() < self._next_warm_attempt:
+                return 0
+            try:
+                # Leer todo antes de observar: un fallo a medias no deja muestras aplicadas
+                samples = list(load_samples(time.time() - self.max_age))
+            except Exception:
+                self._next_warm_attempt = time.monotonic() + retry_after
+                raise
+            self.warmed = True
+            count = 0
+            for client, bandwidth, latency, timestamp in samples:
+                count += self.observe(client, bandwidth, latency, timestamp)
+            return count
+
+    def stats(self):
+        """Estado del estimador"""
+        with self._lock:
+            clients = len(self._clients)
+        return {
+            'clients': clients,
+            'observed': self.observed,
+            'rejected': self.rejected,
+            'warmed': self.warmed,
+            'alpha': self.alpha,
+            'half_life': self.half_life,
+            'max_age': self.max_age,
+        }
@@ -0,0 +1,277 @@
+"""
+Perfilado de peticiones bajo demanda o por muestreo
+Envuelve una petición en cProfile, muestrea su pila cada pocos milisegundos
+(formato "collapsed" para flame graphs) y guarda junto a ambos las consultas
+SQL emitidas con su duración. Los perfiles se guardan en disco desde un hilo
+en segundo plano y se conservan los más recientes.
+"""
+
+import cProfile
+import io
+import json
+import os
+import pstats
+import sys
+import threading
+import time
+import uuid
+from collections import Counter, deque
+
+# cProfile admite un solo perfilador activo por proceso (desde Python 3.12 el
+# segundo enable() lanza ValueError): los perfiles concurrentes se omiten
+_active_lock = threading.Lock()
+
+
+class StackSampler:
+    """Hilo que muestrea la pila de otro hilo y cuenta las pilas colapsadas"""
+
+    def __init__(self, thread_id, interval=0.005):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='profile-sampler', daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                continue
+            names = []
+            while frame is not None:
+                code = frame.f_code
+                names.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})")
+                frame = frame.f_back
+            self.stacks[';'.join(reversed(names))] += 1
+            self.samples += 1
+
+    def collapsed(self):
+        """Líneas 'marco;marco;marco cuenta' (flamegraph.pl, speedscope, inferno)"""
+        return ''.join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+
+
+class RequestProfile:
+    """Perfil de una petición: cProfile, muestras de pila y consultas SQL"""
+
+    def __init__(self, trigger, sample_interval=0.005):
+        self.started_at = time.time()
+        # Empieza por la fecha con milisegundos: ordenar por id es ordenar por tiempo
+        stamp = time.strftime('%Y%m%d-%H%M%S', time.localtime(self.started_at))
+        self.id = f"{stamp}{int(self.started_at * 1000) % 1000:03d}-{uuid.uuid4().hex[:8]}"
+        self.trigger = trigger
+        self.queries = []
+        self._profiler = cProfile.Profile()
+        self._sampler = StackSampler(threading.get_ident(), sample_interval)
+        self._start = None
+        self._active = False
+        self.duration = None
+
+    def start(self):
+        """Empezar a perfilar; False si ya hay otro perfil activo en el proceso"""
+        if not _active_lock.acquire(blocking=False):
+            return False
+        try:
+            self._start = time.perf_counter()
+            self._profiler.enable()
+            self._sampler.start()
+        except Exception:
+            self._profiler.disable()
+            _active_lock.release()
+            raise
+        self._active = True
+        return True
+
+    def stop(self):
+        if not self._active:
+            return
+        try:
+            self._profiler.disable()
+            self._sampler.stop()
+            self.duration = time.perf_counter() - self._start
+        finally:
+            self._active = False
+            _active_lock.release()
+
+    def record_query(self, statement, duration):
+        self.queries.append({'sql': statement, 'duration_ms': round(duration * 1000, 3)})
+
+    def top_functions(self, limit=30):
+        """Resumen de pstats ordenado por tiempo acumulado"""
+        output = io.StringIO()
+        stats = pstats.Stats(self._profiler, stream=output)
+        stats.sort_stats('cumulative').print_stats(limit)
+        return output.getvalue()
+
+    def dump_stats(self, path):
+        self._profiler.dump_stats(path)
+
+    def collapsed(self):
+        return self._sampler.collapsed()
+
+    @property
+    def samples(self):
+        return self._sampler.samples
+
+
+class ProfileStore:
+    """Perfiles en disco (<id>.json, <id>.prof, <id>.collapsed); conserva los max_profiles más recientes"""
+
+    EXTENSIONS = ('.json', '.prof', '.collapsed')
+
+    def __init__(self, directory, max_profiles=50):
+        self.directory = directory
+        self.max_profiles = max_profiles
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    def path(self, profile_id, ext):
+        """Ruta de un archivo de perfil (el id se valida para no salir del directorio)"""
+        if not profile_id or os.path.basename(profile_id) != profile_id or ext not in self.EXTENSIONS:
+            return None
+        return os.path.join(self.directory, profile_id + ext)
+
+    def save(self, profile, request_info):
+        """Guardar un perfil terminado y podar los antiguos"""
+        summary = dict(request_info)
+        summary.update({
+            'id': profile.id,
+            'trigger': profile.trigger,
+            'started_at': profile.started_at,
+            'duration_ms': round(profile.duration * 1000, 3),
+            'stack_samples': profile.samples,
+            'sql_count': len(profile.queries),
+            'sql_ms': round(sum(query['duration_ms'] for query in profile.queries), 3),
+            'sql': profile.queries,
+            'top_functions': profile.top_functions(),
+        })
+        profile.dump_stats(self.path(profile.id, '.prof'))
+        with open(self.path(profile.id, '.collapsed'), 'w') as f:
+            f.write(profile.collapsed())
+        # El JSON se escribe el último: su presencia indica un perfil completo
+        with open(self.path(profile.id, '.json'), 'w') as f:
+            json.dump(summary, f, indent=2)
+        self._prune()
+        return summary
+
+    def _prune(self):
+        with self._lock:
+            summaries = sorted(name for name in os.listdir(self.directory) if name.endswith('.json'))
+            for name in summaries[:max(0, len(summaries) - self.max_profiles)]:
+                profile_id = name[:-len('.json')]
+                for ext in self.EXTENSIONS:
+                    try:
+                        os.remove(os.path.join(self.directory, profile_id + ext))
+                    except OSError:
+                        pass
+
+    def list(self):
+        """Resúmenes de los perfiles guardados, del más reciente al más antiguo"""
+        profiles = []
+        for name in sorted(os.listdir(self.directory), reverse=True):
+            if not name.endswith('.json'):
+                continue
+            try:
+                with open(os.path.join(self.directory, name)) as f:
+                    summary = json.load(f)
+            except (OSError, ValueError):
+                continue
+            summary.pop('sql', None)
+            summary.pop('top_functions', None)
+            profiles.append(summary)
+        return profiles
+
+    def get(self, profile_id):
+        path = self.path(profile_id, '.json')
+        if not path or not os.path.exists(path):
+            return None
+        with open(path) as f:
+            return json.load(f)
+
+
+class ProfileWriter:
+    """
+    Hilo que guarda los perfiles terminados fuera de la petición: pstats, las
+    pilas colapsadas y el JSON se serializan en segundo plano. La cola está
+    acotada; si se llena, el perfil se descarta
+    """
+
+    def __init__(self, store, max_pending=20, on_saved=None, on_error=None):
+        self.store = store
+        self.max_pending = max_pending
+        self.on_saved = on_saved
+        self.on_error = on_error
+
+        self._pending = deque()
+        self._lock = threading.Lock()
+        self._write_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._thread = None
+
+        self.saved = 0
+        self.dropped = 0
+        self.errors = 0
+
+    def start(self):
+        """Iniciar el hilo de escritura si aún no está en marcha"""
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._loop, name='profile-writer', daemon=True)
+                self._thread.start()
+
+    def submit(self, profile, request_info):
+        """Encolar un perfil detenido; False si la cola está llena y se descarta"""
+        self.start()
+        with self._lock:
+            if len(self._pending) >= self.max_pending:
+                self.dropped += 1
+                return False
+            self._pending.append((profile, request_info))
+        self._wakeup.set()
+        return True
+
+    def flush(self):
+        """Guardar todos los perfiles pendientes; devuelve cuántos se guardaron"""
+        total = 0
+        with self._write_lock:
+            while True:
+                with self._lock:
+                    if not self._pending:
+                        return total
+                    profile, request_info = self._pending.popleft()
+                try:
+                    summary = self.store.save(profile, request_info)
+                except Exception as e:
+                    self.errors += 1
+                    if self.on_error:
+                        self.on_error(profile, e)
+                    continue
+                self.saved += 1
+                total += 1
+                if self.on_saved:
+                    self.on_saved(summary)
+
+    def _loop(self):
+        while True:
+            self._wakeup.wait()
+            self._wakeup.clear()
+            self.flush()
+
+    def stats(self):
+        """Estado de la cola de escritura"""
+        with self._lock:
+            pending = len(self._pending)
+        return {
+            'pending': pending,
+            'max_pending': self.max_pending,
+            'saved': self.saved,
+            'dropped': self.dropped,
+            'errors': self.errors,
+        }
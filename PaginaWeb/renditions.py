@@ -0,0 +1,183 @@
+"""
+Versiones redimensionadas de las imágenes (renditions) para srcset
+Se generan bajo demanda desde la imagen almacenada, se guardan en una caché
+en disco con expulsión LRU por bytes y cada tamaño ausente se genera una sola vez
+"""
+
+import hashlib
+import io
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+
+from PIL import Image, features
+
+# Formatos de salida: extensión -> (formato Pillow, mimetype, opciones de guardado)
+RENDITION_FORMATS = {
+    'jpg': ('JPEG', 'image/jpeg', {'quality': 82, 'optimize': True, 'progressive': True}),
+    'webp': ('WEBP', 'image/webp', {'quality': 80, 'method': 4}),
+}
+if features.check('avif'):
+    RENDITION_FORMATS['avif'] = ('AVIF', 'image/avif', {'quality': 60})
+
+# Cambiar si cambia la forma de generar: invalida las claves de caché anteriores
+RENDITION_VERSION = 1
+
+
+def render_image(source_path, width, fmt):
+    """
+    Redimensionar una imagen al ancho pedido (sin ampliar) y codificarla
+
+    En JPEG, draft() decodifica directamente a 1/2, 1/4 u 1/8 de resolución
+    y reduce() divide por un factor entero antes del filtro LANCZOS final.
+    """
+    pil_format, _, save_options = RENDITION_FORMATS[fmt]
+
+    with Image.open(source_path) as img:
+        width = min(width, img.width)
+        height = max(1, round(img.height * width / img.width))
+
+        if img.format == 'JPEG':
+            img.draft('RGB', (width, height))
+        img = img.convert('RGB')
+
+        factor = min(img.width // width, img.height // height)
+        if factor >= 2:
+            img = img.reduce(factor)
+        if img.size != (width, height):
+            img = img.resize((width, height), Image.LANCZOS)
+
+        buffer = io.BytesIO()
+        img.save(buffer, pil_format, **save_options)
+        return buffer.getvalue()
+
+
+def rendition_key(source_path, width, fmt):
+    """Clave estable de una versión (la ruta de origen ya incluye su hash de contenido)"""
+    raw = f"{source_path}|{width}|{fmt}|{RENDITION_VERSION}"
+    return hashlib.sha256(raw.encode()).hexdigest()[:32]
+
+
+class SingleFlight:
+    """Agrupa llamadas concurrentes con la misma clave en una sola ejecución"""
+
+    def __init__(self):
+        self._calls = {}
+        self._lock = threading.Lock()
+        self.shared = 0
+
+    def do(self, key, fn):
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = {'event': threading.Event(), 'result': None, 'error': None}
+                self._calls[key] = call
+            else:
+                self.shared += 1
+
+        if not leader:
+            call['event'].wait()
+            if call['error'] is not None:
+                raise call['error']
+            return call['result']
+
+        try:
+            call['result'] = fn()
+            return call['result']
+        except Exception as e:
+            call['error'] = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call['event'].set()
+
+
+class RenditionCache:
+    """Caché en disco acotada por bytes totales; expulsa las menos usadas"""
+
+    def __init__(self, cache_dir, max_bytes=512 * 1024 * 1024):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()   # clave -> (ruta, etag, bytes)
+        self._total_bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        os.makedirs(cache_dir, exist_ok=True)
+        self._load()
+
+    def _load(self):
+        """Reconstruir el índice desde disco, de menos a más reciente"""
+        files = []
+        for name in os.listdir(self.cache_dir):
+            stem, _, ext = name.partition('.')
+            key, _, etag = stem.partition('-')
+            path = os.path.join(self.cache_dir, name)
+            if not etag or not ext:
+                continue
+            stat = os.stat(path)
+            files.append((stat.st_atime, key, path, etag, stat.st_size))
+        for _, key, path, etag, size in sorted(files):
+            self._entries[key] = (path, etag, size)
+            self._total_bytes += size
+
+    def get(self, key):
+        """(ruta, etag) de una versión en caché, o None"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0], entry[1]
+
+    def put(self, key, data, ext):
+        """Guardar una versión (temporal + rename) y expulsar hasta caber en max_bytes"""
+        etag = hashlib.sha256(data).hexdigest()[:32]
+        path = os.path.join(self.cache_dir, f"{key}-{etag}.{ext}")
+
+        fd, temp_path = tempfile.mkstemp(dir=self.cache_dir, prefix='.tmp_')
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+        os.replace(temp_path, path)
+
+        evicted = []
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous:
+                self._total_bytes -= previous[2]
+                if previous[0] != path:
+                    evicted.append(previous[0])
+            self._entries[key] = (path, etag, len(data))
+            self._total_bytes += len(data)
+
+            while self._total_bytes > self.max_bytes and len(self._entries) > 1:
+                _, (old_path, _, old_size) = self._entries.popitem(last=False)
+                self._total_bytes -= old_size
+                self.evictions += 1
+                evicted.append(old_path)
+
+        for old_path in evicted:
+            try:
+                os.remove(old_path)
+            except OSError:
+                pass
+        return path, etag
+
+    def stats(self):
+        """Ocupación y aciertos de la caché"""
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'bytes': self._total_bytes,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+            }
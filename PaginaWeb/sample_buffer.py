@@ -0,0 +1,113 @@
+"""
+Buffer de escritura diferida para muestras de telemetría
+Acumula filas en una cola acotada y las inserta en lote desde un hilo en
+segundo plano, cuando se llena un lote o pasa el intervalo de volcado. Si la
+base de datos no da abasto, primero se submuestrea y después se descarta.
+"""
+
+import threading
+from collections import deque
+
+
+class SampleBuffer:
+    """Cola acotada de filas que se vuelcan con inserciones de varias filas"""
+
+    def __init__(self, flush_fn, flush_interval=5.0, batch_size=500, max_pending=10000,
+                 downsample_at=0.75, downsample_every=4):
+        self.flush_fn = flush_fn
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self.max_pending = max_pending
+        # Por encima de downsample_at * max_pending solo se acepta 1 de cada downsample_every
+        self.downsample_threshold = int(max_pending * downsample_at)
+        self.downsample_every = downsample_every
+
+        self._pending = deque()
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._thread = None
+        self._skipped = 0
+
+        self.accepted = 0
+        self.downsampled = 0
+        self.dropped = 0
+        self.flushes = 0
+        self.flushed_rows = 0
+        self.errors = 0
+
+    def start(self):
+        """Iniciar el hilo de volcado si aún no está en marcha"""
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._loop, name='telemetry-flush', daemon=True)
+                self._thread.start()
+
+    def add(self, row):
+        """Encolar una fila; devuelve 'queued', 'downsampled' o 'dropped'"""
+        self.start()
+        with self._lock:
+            pending = len(self._pending)
+            if pending >= self.max_pending:
+                self.dropped += 1
+                return 'dropped'
+            if pending >= self.downsample_threshold:
+                self._skipped += 1
+                if self._skipped % self.downsample_every:
+                    self.downsampled += 1
+                    return 'downsampled'
+            self._pending.append(row)
+            self.accepted += 1
+            full = len(self._pending) >= self.batch_size
+        if full:
+            self._wakeup.set()
+        return 'queued'
+
+    def flush(self):
+        """Insertar todas las filas pendientes, por lotes de batch_size"""
+        total = 0
+        with self._flush_lock:
+            while True:
+                with self._lock:
+                    count = min(self.batch_size, len(self._pending))
+                    batch = [self._pending.popleft() for _ in range(count)]
+                if not batch:
+                    return total
+
+                try:
+                    self.flush_fn(batch)
+                except Exception as e:
+                    self.errors += 1
+                    print(f"Error volcando telemetría: {e}")
+                    # Devolver el lote al principio de la cola; lo que no quepa se descarta
+                    with self._lock:
+                        room = max(0, self.max_pending - len(self._pending))
+                        self.dropped += max(0, len(batch) - room)
+                        self._pending.extendleft(reversed(batch[:room]))
+                    return total
+
+                self.flushes += 1
+                self.flushed_rows += len(batch)
+                total += len(batch)
+
+    def _loop(self):
+        while True:
+            self._wakeup.wait(timeout=self.flush_interval)
+            self._wakeup.clear()
+            self.flush()
+
+    def stats(self):
+        """Estado del buffer"""
+        with self._lock:
+            pending = len(self._pending)
+        return {
+            'pending_rows': pending,
+            'max_pending': self.max_pending,
+            'accepted': self.accepted,
+            'downsampled': self.downsampled,
+            'dropped': self.dropped,
+            'flushes': self.flushes,
+            'flushed_rows': self.flushed_rows,
+            'errors': self.errors,
+            'flush_interval': self.flush_interval,
+        }
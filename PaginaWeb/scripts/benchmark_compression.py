@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""
+Benchmark de compresión con autoencoders en CPU
+Mide el rendimiento de autoencoder_b8/b16/b32 con lotes de distinto tamaño
+(session.run directo) y a través del planificador con clientes concurrentes
+"""
+
+import argparse
+import os
+import sys
+import threading
+import time
+
+import numpy as np
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BASE_DIR)
+from model_registry import ModelRegistry
+from inference_batcher import InferenceBatcher
+
+LEVELS = (8, 16, 32)
+
+
+def bench_direct(model, batch_size, iterations):
+    """Imágenes por segundo ejecutando lotes fijos en la sesión"""
+    tensor = model.dummy_input(batch_size)
+    model.run(tensor)  # calentamiento
+    start = time.perf_counter()
+    for _ in range(iterations):
+        model.run(tensor)
+    elapsed = time.perf_counter() - start
+    return batch_size * iterations / elapsed, elapsed / iterations * 1000
+
+
+def bench_batcher(model, clients, requests_per_client, max_batch_size):
+    """Imágenes por segundo con `clients` hilos enviando peticiones de una imagen"""
+    batcher = InferenceBatcher(lambda: model, max_batch_size=max_batch_size, max_wait_ms=10, name=model.name)
+    tensor = model.dummy_input(1)
+    batcher.run(tensor)  # calentamiento
+
+    def client():
+        for _ in range(requests_per_client):
+            batcher.run(tensor)
+
+    threads = [threading.Thread(target=client) for _ in range(clients)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+    stats = batcher.stats()
+    return clients * requests_per_client / elapsed, stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark de autoencoders ONNX en CPU')
+    parser.add_argument('--models-dir', default=os.path.join(BASE_DIR, 'static', 'models'))
+    parser.add_argument('--batch-sizes', default='1,2,4')
+    parser.add_argument('--iterations', type=int, default=5)
+    parser.add_argument('--clients', type=int, default=4)
+    parser.add_argument('--requests', type=int, default=3, help='Peticiones por cliente')
+    parser.add_argument('--threads', type=int, default=0, help='Hilos intra-op de ONNX Runtime (0 = auto)')
+    args = parser.parse_args()
+
+    registry = ModelRegistry(args.models_dir, intra_op_threads=args.threads)
+    batch_sizes = [int(size) for size in args.batch_sizes.split(',')]
+
+    print("📊 Benchmark de compresión con autoencoders (CPU)")
+    print("=" * 60)
+
+    for level in LEVELS:
+        name = f'autoencoder_b{level}'
+        if not registry.is_available(name):
+            print(f"⚠️  {name} no disponible")
+            continue
+        model = registry.get(name)
+        print(f"\n{name}  entrada {model.input_shape}")
+        print(f"   {'Lote':<8}{'img/s':>10}{'ms/lote':>12}")
+        for batch_size in batch_sizes:
+            images_per_second, ms_per_batch = bench_direct(model, batch_size, args.iterations)
+            print(f"   {batch_size:<8}{images_per_second:>10.2f}{ms_per_batch:>12.1f}")
+
+        images_per_second, stats = bench_batcher(model, args.clients, args.requests, max(batch_sizes))
+        print(f"   Planificador ({args.clients} clientes): {images_per_second:.2f} img/s, "
+              f"lotes {stats['batch_size_histogram']}, espera p50 {stats['wait_ms']['p50']} ms")
+
+
+if __name__ == "__main__":
+    main()
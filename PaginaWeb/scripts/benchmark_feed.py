@@ -0,0 +1,181 @@
+#!/usr/bin/env python3
+"""
+Benchmark de la página principal
+Compara el feed anterior (una consulta COUNT por post) con la consulta agregada
+sobre una base SQLite sembrada con miles de posts y comentarios. La caché del
+feed se vacía antes de cada petición para medir la consulta en cada orden
+(hot, top, new); la fila "caché" mide los aciertos por separado.
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+# La base de datos se define antes de importar la aplicación
+DB_PATH = os.path.join(tempfile.gettempdir(), 'dyzen_benchmark_feed.db')
+os.environ.setdefault('DATABASE_URL', f'sqlite:///{DB_PATH}')
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from sqlalchemy import event
+from flask import render_template
+from app import (app, db, Post, Comment, compute_hot_score, feed_image_sources, get_feed_cache,
+                 get_network_conditions)
+
+
+def legacy_index():
+    """Implementación anterior de index(): N+1 consultas y JSON por post"""
+    posts = Post.query.order_by(Post.upvotes.desc(), Post.created_at.desc()).limit(20).all()
+
+    posts_data = []
+    for post in posts:
+        post_data = {
+            'id': post.id,
+            'title': post.title,
+            'image_path': post.image_path,
+            'compressed_path': post.compressed_path,
+            'upvotes': post.upvotes,
+            'downvotes': post.downvotes,
+            'username': post.username,
+            'created_at': post.created_at,
+            'subreddit': post.subreddit,
+            'compression_level': post.compression_level,
+            'score': post.upvotes - post.downvotes,
+            'metadata': post.post_metadata
+        }
+        if post.post_metadata:
+            metadata = json.loads(post.post_metadata)
+            post_data['thumbnail_path'] = metadata.get('thumbnail_path')
+            post_data['processing_method'] = metadata.get('processingMethod', 'onnx_client')
+            post_data['model_used'] = metadata.get('modelUsed', 'unknown')
+            post_data['espcn_applied'] = metadata.get('espcnApplied', False)
+        post_data['display_path'] = post_data.get('thumbnail_path') or post_data['compressed_path']
+        post_data['comment_count'] = Comment.query.filter_by(post_id=post.id).count()
+        posts_data.append(post_data)
+
+    # El feed anterior no paginaba
+    page = {'posts': posts_data, 'sort': 'top', 'subreddit': None, 'next_cursor': None}
+    return render_template('index.html', posts=posts_data, page=page, network=get_network_conditions(),
+                           image_sources=feed_image_sources(posts_data))
+
+
+def seed(num_posts, comments_per_post):
+    """Crear posts y comentarios con inserciones masivas"""
+    db.drop_all()
+    db.create_all()
+
+    rng = random.Random(42)
+    now = datetime.utcnow()
+    posts = []
+    for i in range(num_posts):
+        metadata = {
+            'thumbnail_path': f'static/uploads/{i}_client_thumbnail.jpg',
+            'processingMethod': 'onnx_client',
+            'modelUsed': 'autoencoder_b16',
+            'espcnApplied': False,
+            'originalSize': 2048000,
+        }
+        comment_count = rng.randint(0, comments_per_post * 2)
+        # Votos con cola larga: la mayoría de posts tienen pocos y unos pocos muchos
+        upvotes = min(int(rng.paretovariate(1.2) * 5) - 5, 50000)
+        downvotes = int(upvotes * rng.uniform(0, 0.3)) + rng.randint(0, 5)
+        created_at = now - timedelta(minutes=rng.randint(0, 60 * 24 * 30))
+        posts.append({
+            'id': i + 1,
+            'title': f'Post de prueba {i}',
+            'image_path': f'static/uploads/{i}_client_processed.jpg',
+            'compressed_path': f'static/uploads/{i}_client_processed.jpg',
+            'upvotes': upvotes,
+            'downvotes': downvotes,
+            'score': upvotes - downvotes,
+            'hot_score': compute_hot_score(upvotes, downvotes, created_at),
+            'created_at': created_at,
+            'post_metadata': json.dumps(metadata),
+            'comment_count': comment_count,
+            'thumbnail_path': metadata['thumbnail_path'],
+            'processing_method': metadata['processingMethod'],
+            'model_used': metadata['modelUsed'],
+            'espcn_applied': False,
+        })
+    db.session.execute(Post.__table__.insert(), posts)
+
+    comments = [
+        {'post_id': post['id'], 'content': 'Comentario de prueba'}
+        for post in posts
+        for _ in range(post['comment_count'])
+    ]
+    db.session.execute(Comment.__table__.insert(), comments)
+    db.session.commit()
+    return len(posts), len(comments)
+
+
+def percentile(values, p):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(p / 100.0 * (len(values) - 1))))]
+
+
+def measure(client, url, requests, query_counter, use_cache=False):
+    """Latencias y número de consultas por petición (sin caché del feed salvo use_cache)"""
+    client.get(url)  # calentamiento
+    latencies = []
+    queries = []
+    for _ in range(requests):
+        if not use_cache:
+            get_feed_cache().invalidate()
+        query_counter['count'] = 0
+        start = time.perf_counter()
+        response = client.get(url)
+        latencies.append((time.perf_counter() - start) * 1000)
+        queries.append(query_counter['count'])
+        assert response.status_code == 200, response.status_code
+    return {
+        'queries_per_request': sum(queries) / len(queries),
+        'p50_ms': round(percentile(latencies, 50), 2),
+        'p99_ms': round(percentile(latencies, 99), 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark del feed de la página principal')
+    parser.add_argument('--posts', type=int, default=5000)
+    parser.add_argument('--comments-per-post', type=int, default=10)
+    parser.add_argument('--requests', type=int, default=200)
+    args = parser.parse_args()
+
+    print("📊 Benchmark del feed principal")
+    print("=" * 60)
+
+    app.add_url_rule('/_legacy_index', 'legacy_index', legacy_index)
+    client = app.test_client()
+
+    with app.app_context():
+        num_posts, num_comments = seed(args.posts, args.comments_per_post)
+        print(f"   Base de datos: {app.config['SQLALCHEMY_DATABASE_URI']}")
+        print(f"   Posts: {num_posts}  Comentarios: {num_comments}")
+
+        query_counter = {'count': 0}
+
+        @event.listens_for(db.engine, 'before_cursor_execute')
+        def count_queries(conn, cursor, statement, parameters, context, executemany):
+            query_counter['count'] += 1
+
+        results = {
+            'antes (N+1)': measure(client, '/_legacy_index', args.requests, query_counter),
+            'después hot': measure(client, '/?sort=hot', args.requests, query_counter),
+            'después top': measure(client, '/?sort=top', args.requests, query_counter),
+            'después new': measure(client, '/?sort=new', args.requests, query_counter),
+            'después hot (caché)': measure(client, '/?sort=hot', args.requests, query_counter, use_cache=True),
+        }
+
+    print()
+    print(f"{'Variante':<22}{'Consultas/pet.':>16}{'p50 (ms)':>12}{'p99 (ms)':>12}")
+    for name, result in results.items():
+        print(f"{name:<22}{result['queries_per_request']:>16.1f}{result['p50_ms']:>12.2f}{result['p99_ms']:>12.2f}")
+
+
+if __name__ == "__main__":
+    main()
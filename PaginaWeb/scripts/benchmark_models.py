@@ -0,0 +1,243 @@
+#!/usr/bin/env python3
+"""
+Benchmark de los modelos ONNX con distintas opciones de ONNX Runtime
+Mide percentiles de latencia y rendimiento por modelo, tamaño de lote,
+resolución, hilos intra/inter-op, nivel de optimización del grafo y modo de
+ejecución, con calentamiento y varias repeticiones. Guarda los resultados en
+JSON y compara dos ejecuciones para detectar regresiones.
+
+    python scripts/benchmark_models.py --output base.json
+    python scripts/benchmark_models.py --output nuevo.json
+    python scripts/benchmark_models.py --compare base.json nuevo.json
+"""
+
+import argparse
+import itertools
+import json
+import os
+import platform
+import sys
+import time
+from datetime import datetime, timezone
+
+import numpy as np
+import onnxruntime as ort
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BASE_DIR)
+from model_registry import ModelRegistry, MODEL_FILES, MODEL_VARIANTS
+
+# Campos que identifican una configuración al comparar dos ejecuciones
+CONFIG_KEYS = ('model', 'variant', 'batch_size', 'input_shape', 'intra_op_threads',
+               'inter_op_threads', 'graph_optimization', 'execution_mode')
+
+
+def parse_list(value, cast=str):
+    return [cast(item) for item in value.split(',') if item]
+
+
+def parse_resolution(value):
+    height, width = (int(part) for part in value.lower().split('x'))
+    return height, width
+
+
+def percentiles_ms(times):
+    """Percentiles en milisegundos de una lista de duraciones en segundos"""
+    values = np.asarray(times) * 1000
+    return {
+        'mean': round(float(values.mean()), 3),
+        'min': round(float(values.min()), 3),
+        'p50': round(float(np.percentile(values, 50)), 3),
+        'p90': round(float(np.percentile(values, 90)), 3),
+        'p99': round(float(np.percentile(values, 99)), 3),
+        'max': round(float(values.max()), 3),
+    }
+
+
+def machine_info():
+    """Datos del equipo para interpretar los resultados"""
+    return {
+        'platform': platform.platform(),
+        'processor': platform.processor() or platform.machine(),
+        'cpu_count': os.cpu_count(),
+        'python': platform.python_version(),
+        'onnxruntime': ort.__version__,
+        'numpy': np.__version__,
+    }
+
+
+def bench_config(models_dir, name, variant, intra, inter, optimization, mode,
+                 batch_sizes, resolutions, warmup, trials):
+    """Resultados de un modelo con unas opciones de sesión, para cada lote y resolución"""
+    registry = ModelRegistry(models_dir, intra_op_threads=intra, inter_op_threads=inter,
+                             graph_optimization=optimization, execution_mode=mode,
+                             variants={name: variant})
+    model = registry.get(name)
+    if model.variant != variant:
+        return []
+
+    results = []
+    seen_shapes = set()
+    for batch_size, resolution in itertools.product(batch_sizes, resolutions):
+        tensor = model.dummy_input(batch_size, spatial_size=resolution)
+        # Los modelos de tamaño fijo ignoran la resolución pedida
+        if tensor.shape in seen_shapes:
+            continue
+        seen_shapes.add(tensor.shape)
+
+        for _ in range(warmup):
+            model.run(tensor)
+        times = []
+        for _ in range(trials):
+            start = time.perf_counter()
+            model.run(tensor)
+            times.append(time.perf_counter() - start)
+
+        latency = percentiles_ms(times)
+        results.append({
+            'model': name,
+            'variant': variant,
+            'batch_size': batch_size,
+            'input_shape': list(tensor.shape),
+            'intra_op_threads': intra,
+            'inter_op_threads': inter,
+            'graph_optimization': optimization,
+            'execution_mode': mode,
+            'load_ms': round(model.load_time * 1000, 3),
+            'trials': trials,
+            'latency_ms': latency,
+            'throughput_items_s': round(batch_size * 1000 / latency['p50'], 3),
+        })
+        print(f"   {name:<24}{variant:<13}b{batch_size:<3}{'x'.join(map(str, tensor.shape[2:])):>10}"
+              f"  intra={intra} inter={inter} {optimization:<9}{mode:<11}"
+              f"p50 {latency['p50']:>9.2f} ms  p99 {latency['p99']:>9.2f} ms"
+              f"  {results[-1]['throughput_items_s']:>8.2f} img/s")
+    return results
+
+
+def run_benchmark(args):
+    registry = ModelRegistry(args.models_dir)
+    models = args.models or [name for name in MODEL_FILES if registry.is_available(name)]
+
+    print("📊 Benchmark de modelos ONNX (CPU)")
+    print("=" * 60)
+    results = []
+    grid = itertools.product(models, args.variants, args.intra_threads, args.inter_threads,
+                             args.optimization, args.execution_modes)
+    for name, variant, intra, inter, optimization, mode in grid:
+        if not registry.is_available(name):
+            print(f"⚠️  {name} no disponible")
+            continue
+        try:
+            results += bench_config(args.models_dir, name, variant, intra, inter, optimization, mode,
+                                    args.batch_sizes, args.resolutions, args.warmup, args.trials)
+        except Exception as e:
+            print(f"❌ {name} ({variant}, intra={intra}, {optimization}, {mode}): {e}")
+
+    report = {
+        'created_at': datetime.now(timezone.utc).isoformat(),
+        'machine': machine_info(),
+        'settings': {
+            'warmup': args.warmup,
+            'trials': args.trials,
+            'batch_sizes': args.batch_sizes,
+            'resolutions': [list(resolution) for resolution in args.resolutions],
+        },
+        'results': results,
+    }
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"\n📄 Resultados guardados en {args.output} ({len(results)} configuraciones)")
+    else:
+        print(json.dumps(report, indent=2))
+    return report
+
+
+def config_key(result):
+    return tuple(json.dumps(result[key]) for key in CONFIG_KEYS)
+
+
+def compare(base_path, new_path, threshold, metric='p50'):
+    """
+    Comparar dos ejecuciones configuración a configuración
+
+    Returns:
+        Número de regresiones (latencia `metric` más de `threshold` por encima de la base)
+    """
+    with open(base_path) as f:
+        base = json.load(f)
+    with open(new_path) as f:
+        new = json.load(f)
+
+    base_results = {config_key(result): result for result in base['results']}
+    print(f"📊 Comparación {base_path} -> {new_path} (latencia {metric}, umbral {threshold:.0%})")
+    if base['machine'] != new['machine']:
+        print("⚠️  Las ejecuciones son de equipos o versiones distintas")
+    print("=" * 60)
+
+    regressions = 0
+    improvements = 0
+    for result in new['results']:
+        previous = base_results.pop(config_key(result), None)
+        if previous is None:
+            continue
+        before = previous['latency_ms'][metric]
+        after = result['latency_ms'][metric]
+        change = (after - before) / before if before else 0.0
+
+        if change > threshold:
+            regressions += 1
+            label = '❌ REGRESIÓN'
+        elif change < -threshold:
+            improvements += 1
+            label = '✅ mejora'
+        else:
+            continue
+        print(f"{label:<14}{result['model']:<24}{result['variant']:<13}b{result['batch_size']:<3}"
+              f"{'x'.join(map(str, result['input_shape'][2:])):>10}  intra={result['intra_op_threads']} "
+              f"{result['graph_optimization']:<9}{result['execution_mode']:<11}"
+              f"{before:>9.2f} -> {after:>9.2f} ms ({change:+.0%})")
+
+    if base_results:
+        print(f"⚠️  {len(base_results)} configuraciones de la base no están en la nueva ejecución")
+    print(f"\nRegresiones: {regressions}  Mejoras: {improvements}  "
+          f"Sin cambios: {len(new['results']) - regressions - improvements}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark de modelos ONNX con distintas opciones de sesión')
+    parser.add_argument('--models-dir', default=os.path.join(BASE_DIR, 'static', 'models'))
+    parser.add_argument('--models', type=parse_list, help='Modelos del registro (por defecto, todos los disponibles)')
+    parser.add_argument('--variants', type=parse_list, default=['fp32'],
+                        help=f"Variantes: {','.join(MODEL_VARIANTS)}")
+    parser.add_argument('--batch-sizes', type=lambda value: parse_list(value, int), default=[1, 4])
+    parser.add_argument('--resolutions', type=lambda value: parse_list(value, parse_resolution),
+                        default=[(256, 256), (1024, 768)],
+                        help='Alto x ancho para los modelos con ejes dinámicos')
+    parser.add_argument('--intra-threads', type=lambda value: parse_list(value, int), default=[0],
+                        help='Hilos intra-op (0 = automático), p. ej. 1,2,4,0')
+    parser.add_argument('--inter-threads', type=lambda value: parse_list(value, int), default=[0])
+    parser.add_argument('--optimization', type=parse_list, default=['all'],
+                        help='Niveles: disable,basic,extended,all')
+    parser.add_argument('--execution-modes', type=parse_list, default=['sequential'],
+                        help='Modos: sequential,parallel')
+    parser.add_argument('--warmup', type=int, default=2, help='Ejecuciones de calentamiento por configuración')
+    parser.add_argument('--trials', type=int, default=10, help='Ejecuciones medidas por configuración')
+    parser.add_argument('--output', help='Archivo JSON de resultados (por defecto, salida estándar)')
+    parser.add_argument('--compare', nargs=2, metavar=('BASE', 'NUEVO'),
+                        help='Comparar dos archivos de resultados en lugar de medir')
+    parser.add_argument('--threshold', type=float, default=0.10,
+                        help='Cambio relativo de latencia que se considera regresión')
+    parser.add_argument('--metric', default='p50', choices=['mean', 'min', 'p50', 'p90', 'p99', 'max'])
+    args = parser.parse_args()
+
+    if args.compare:
+        regressions = compare(args.compare[0], args.compare[1], args.threshold, args.metric)
+        sys.exit(1 if regressions else 0)
+    run_benchmark(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,170 @@
+#!/usr/bin/env python3
+"""
+Benchmark del servicio de archivos estáticos
+Compara el manejador estático por defecto de Flask con el de Dyzen (ETag
+fuerte, Cache-Control inmutable para el almacén y copias gzip/brotli) en una
+primera visita y en visitas repetidas, simulando la caché de un navegador:
+las respuestas frescas no generan petición y las demás se revalidan con
+If-None-Match / If-Modified-Since. Mide peticiones por segundo y bytes
+transferidos (cabeceras incluidas). Genera antes las copias con
+`flask compress-assets` para medir la compresión.
+
+    python scripts/benchmark_static.py
+    python scripts/benchmark_static.py --images 50 --rounds 20 --output static.json
+"""
+
+import argparse
+import io
+import json
+import os
+import sys
+import tempfile
+import time
+
+# La base de datos se define antes de importar la aplicación
+DB_PATH = os.path.join(tempfile.gettempdir(), 'dyzen_benchmark_static.db')
+os.environ.setdefault('DATABASE_URL', f'sqlite:///{DB_PATH}')
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BASE_DIR)
+os.chdir(BASE_DIR)
+import numpy as np
+from flask import Flask
+from PIL import Image
+from app import app, content_store
+
+# Lo que descarga un navegador que procesa imágenes en el cliente
+MODEL_ASSETS = ['models/models_info.json', 'models/autoencoder_b8.onnx', 'models/autoencoder_b16.onnx',
+                'models/autoencoder_b32.onnx', 'models/espcn_model.onnx']
+ACCEPT_ENCODING = 'gzip, deflate, br'
+
+
+class BrowserCache:
+    """Caché HTTP privada mínima: frescura por max-age/immutable y revalidación condicional"""
+
+    def __init__(self):
+        self.entries = {}
+
+    def fetch(self, client, url, now):
+        """(petición realizada, bytes transferidos)"""
+        entry = self.entries.get(url)
+        if entry and entry['fresh_until'] > now:
+            return False, 0
+
+        headers = {'Accept-Encoding': ACCEPT_ENCODING}
+        if entry and entry['etag']:
+            headers['If-None-Match'] = entry['etag']
+        if entry and entry['last_modified']:
+            headers['If-Modified-Since'] = entry['last_modified']
+        response = client.get(url, headers=headers)
+        body = response.get_data()
+        transferred = len(body) + sum(len(name) + len(value) + 4 for name, value in response.headers.items())
+
+        if response.status_code == 200 or entry is None:
+            entry = self.entries[url] = {
+                'etag': response.headers.get('ETag'),
+                'last_modified': response.headers.get('Last-Modified'),
+            }
+        cache_control = response.cache_control
+        # Sin max-age (o con no-cache) se revalida siempre; no se usa la frescura heurística
+        max_age = cache_control.max_age if cache_control.max_age and not cache_control.no_cache else 0
+        entry['fresh_until'] = now + max_age
+        return True, transferred
+
+
+def create_images(count, size=(1024, 768)):
+    """Imágenes JPEG en el almacén por contenido; devuelve (urls, rutas creadas)"""
+    rng = np.random.default_rng(0)
+    urls, created = [], []
+    for _ in range(count):
+        pixels = rng.integers(0, 256, (size[1] // 8, size[0] // 8, 3), dtype=np.uint8)
+        buffer = io.BytesIO()
+        Image.fromarray(pixels).resize(size, Image.BILINEAR).save(buffer, 'JPEG', quality=90)
+        stored = content_store.put_bytes(buffer.getvalue(), '.jpg')
+        urls.append('/' + stored.path)
+        if stored.created:
+            created.append(stored.path)
+    return urls, created
+
+
+def visit(client, cache, urls, now):
+    requests = transferred = 0
+    for url in urls:
+        made, size = cache.fetch(client, url, now)
+        requests += made
+        transferred += size
+    return requests, transferred
+
+
+def bench_handler(name, flask_app, urls, rounds, revisit_after):
+    """Primera visita y visitas repetidas con la caché ya llena"""
+    client = flask_app.test_client()
+    results = []
+
+    start = time.perf_counter()
+    for _ in range(rounds):
+        cache = BrowserCache()
+        requests, transferred = visit(client, cache, urls, now=0)
+    elapsed = time.perf_counter() - start
+    results.append(('primera', requests, transferred, elapsed, rounds))
+
+    start = time.perf_counter()
+    for round_index in range(rounds):
+        repeat_requests, repeat_transferred = visit(client, cache, urls, now=revisit_after * (round_index + 1))
+    elapsed = time.perf_counter() - start
+    results.append(('repetida', repeat_requests, repeat_transferred, elapsed, rounds))
+
+    rows = []
+    for label, requests, transferred, elapsed, count in results:
+        rows.append({
+            'handler': name,
+            'visit': label,
+            'requests_per_visit': requests,
+            'bytes_per_visit': transferred,
+            'requests_per_s': round(requests * count / elapsed, 1) if requests else None,
+            'visits_per_s': round(count / elapsed, 1),
+        })
+        print(f"{name:<10}{label:<10}{requests:>10}{transferred / 1024:>14.1f}"
+              f"{rows[-1]['requests_per_s'] or 0:>12.1f}{rows[-1]['visits_per_s']:>12.1f}")
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark de archivos estáticos con caché de navegador simulada')
+    parser.add_argument('--images', type=int, default=20, help='Imágenes del almacén por visita')
+    parser.add_argument('--rounds', type=int, default=10, help='Visitas medidas por escenario')
+    parser.add_argument('--revisit-after', type=int, default=3600, help='Segundos entre visitas repetidas')
+    parser.add_argument('--output', help='Archivo JSON de resultados')
+    args = parser.parse_args()
+
+    image_urls, created = create_images(args.images)
+    urls = ['/static/' + asset for asset in MODEL_ASSETS] + image_urls
+    # Manejador por defecto de Flask sobre la misma carpeta
+    baseline = Flask('baseline', static_folder=app.static_folder, root_path=app.root_path)
+
+    precompressed = [asset for asset in MODEL_ASSETS
+                     if os.path.exists(os.path.join(app.static_folder, asset + '.gz'))]
+    print("📊 Benchmark de archivos estáticos (caché de navegador simulada)")
+    print("=" * 60)
+    print(f"   {len(MODEL_ASSETS)} modelos ({len(precompressed)} con copia precomprimida) "
+          f"+ {len(image_urls)} imágenes del almacén por visita")
+    print()
+    print(f"{'Manejador':<10}{'Visita':<10}{'Peticiones':>10}{'KB/visita':>14}{'Pet./s':>12}{'Visitas/s':>12}")
+
+    try:
+        rows = bench_handler('flask', baseline, urls, args.rounds, args.revisit_after)
+        rows += bench_handler('dyzen', app, urls, args.rounds, args.revisit_after)
+    finally:
+        for path in created:
+            os.remove(path)
+
+    print()
+    print("El envío sin copia (sendfile) depende del servidor WSGI y no se mide con el cliente de pruebas")
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({'settings': vars(args), 'results': rows}, f, indent=2)
+        print(f"📄 Resultados guardados en {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,158 @@
+#!/usr/bin/env python3
+"""
+Benchmark de subida de imágenes procesadas
+Compara /submit_processed (base64 en campos de formulario) con
+/submit_processed/binary (multipart binario escrito a disco por bloques).
+Cada caso se ejecuta en un proceso nuevo para medir su pico de memoria (RSS).
+"""
+
+import argparse
+import base64
+import http.client
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import uuid
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DB_PATH = os.path.join(tempfile.gettempdir(), 'dyzen_benchmark_uploads.db')
+JPEG_HEADER = b'\xff\xd8\xff\xe0' + b'\x00\x10JFIF\x00'
+
+
+def fake_jpeg(path, size):
+    """Archivo con cabecera JPEG y contenido aleatorio del tamaño pedido"""
+    with open(path, 'wb') as f:
+        f.write(JPEG_HEADER)
+        remaining = size - len(JPEG_HEADER)
+        while remaining > 0:
+            chunk = min(remaining, 1024 * 1024)
+            f.write(os.urandom(chunk))
+            remaining -= chunk
+
+
+def peak_rss_kb():
+    """Pico de memoria residente del proceso (VmHWM; no se hereda del padre)"""
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def build_body(mode, image_path, body_path):
+    """Escribir el cuerpo multipart completo en disco; devuelve el Content-Type"""
+    boundary = uuid.uuid4().hex
+    metadata = json.dumps({'compressionLevel': 16, 'processingMethod': 'onnx_client',
+                           'originalSize': os.path.getsize(image_path)})
+    with open(image_path, 'rb') as f:
+        image = f.read()
+
+    def field(name, value):
+        return (f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"\r\n\r\n'
+                f'{value}\r\n').encode()
+
+    def file_field(name, filename, data):
+        return (f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"; '
+                f'filename="{filename}"\r\nContent-Type: image/jpeg\r\n\r\n').encode() + data + b'\r\n'
+
+    with open(body_path, 'wb') as out:
+        out.write(field('title', 'Benchmark'))
+        out.write(field('processing_metadata', metadata))
+        if mode == 'base64':
+            out.write(field('processed_image_data', 'data:image/jpeg;base64,' + base64.b64encode(image).decode()))
+            out.write(field('thumbnail_data', 'data:image/jpeg;base64,' + base64.b64encode(image[:4096]).decode()))
+        else:
+            out.write(file_field('processed_image', 'processed.jpg', image))
+            out.write(file_field('thumbnail', 'thumbnail.jpg', image[:4096]))
+        out.write(f'--{boundary}--\r\n'.encode())
+    return f'multipart/form-data; boundary={boundary}'
+
+
+def run_case(mode, body_path, content_type):
+    """Proceso hijo: servidor local + envío del cuerpo en streaming"""
+    os.environ['DATABASE_URL'] = f'sqlite:///{DB_PATH}'
+    os.chdir(BASE_DIR)
+    sys.path.insert(0, BASE_DIR)
+    from werkzeug.serving import make_server
+    from app import app, db
+
+    app.config['MAX_FORM_MEMORY_SIZE'] = None
+    with app.app_context():
+        db.create_all()
+
+    server = make_server('127.0.0.1', 0, app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    baseline_kb = peak_rss_kb()
+
+    url = '/submit_processed' if mode == 'base64' else '/submit_processed/binary'
+    start = time.perf_counter()
+    conn = http.client.HTTPConnection('127.0.0.1', server.server_port, timeout=600)
+    with open(body_path, 'rb') as body:
+        conn.request('POST', url, body=body, headers={
+            'Content-Type': content_type,
+            'Content-Length': str(os.path.getsize(body_path)),
+        })
+        response = conn.getresponse()
+        payload = json.loads(response.read())
+    elapsed_ms = (time.perf_counter() - start) * 1000
+    server.shutdown()
+
+    peak_kb = peak_rss_kb()
+    with app.app_context():
+        from app import Post
+        post = db.session.get(Post, payload.get('post_id'))
+        if post:
+            for path in {post.compressed_path, post.post_metadata and json.loads(post.post_metadata).get('thumbnail_path')}:
+                if path and os.path.exists(path):
+                    os.remove(path)
+            db.session.delete(post)
+            db.session.commit()
+
+    print(json.dumps({
+        'status': response.status,
+        'latency_ms': round(elapsed_ms, 1),
+        'peak_rss_mb': round(peak_kb / 1024, 1),
+        'rss_growth_mb': round((peak_kb - baseline_kb) / 1024, 1),
+    }))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark de subida base64 vs binaria')
+    parser.add_argument('--sizes', default='1,10,50', help='Tamaños de imagen en MB')
+    parser.add_argument('--_case', nargs=3, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args._case:
+        run_case(*args._case)
+        return
+
+    print("📊 Benchmark de subida de imágenes procesadas")
+    print("=" * 60)
+    print(f"{'Tamaño':<10}{'Modo':<10}{'HTTP':>6}{'Latencia (ms)':>16}{'Pico RSS (MB)':>16}{'Δ RSS (MB)':>12}")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for size_mb in [int(s) for s in args.sizes.split(',')]:
+            image_path = os.path.join(tmp, f'{size_mb}mb.jpg')
+            fake_jpeg(image_path, size_mb * 1024 * 1024)
+            for mode in ('base64', 'binary'):
+                body_path = os.path.join(tmp, f'{size_mb}mb_{mode}.body')
+                content_type = build_body(mode, image_path, body_path)
+                output = subprocess.run(
+                    [sys.executable, os.path.abspath(__file__), '--_case', mode, body_path, content_type],
+                    capture_output=True, text=True, check=True).stdout
+                result = json.loads(output.strip().splitlines()[-1])
+                print(f"{str(size_mb) + ' MB':<10}{mode:<10}{result['status']:>6}{result['latency_ms']:>16.1f}"
+                      f"{result['peak_rss_mb']:>16.1f}{result['rss_growth_mb']:>12.1f}")
+                os.remove(body_path)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,197 @@
+#!/usr/bin/env python3
+"""
+Precompilar los modelos ONNX para el servidor
+Escribe el grafo ya optimizado por ONNX Runtime (en ONNX y en formato ORT)
+junto a los originales, con un manifiesto de hashes de contenido, y mide el
+arranque en frío de cada modelo con y sin artefactos. No usa PyTorch.
+
+    python scripts/build_model_artifacts.py
+    python scripts/build_model_artifacts.py --optimization all,extended --cold-start
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+
+import numpy as np
+import onnxruntime as ort
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BASE_DIR)
+from content_store import file_digest
+from model_registry import (ModelRegistry, MODEL_FILES, MODEL_VARIANTS, ARTIFACT_MANIFEST,
+                            WARMUP_SPATIAL_SIZE, artifact_key)
+
+# Proceso nuevo que carga un modelo como lo haría un worker y mide el arranque
+COLD_START_SNIPPET = """
+import json, sys, time
+start = time.perf_counter()
+sys.path.insert(0, {base_dir!r})
+from model_registry import ModelRegistry, WARMUP_SPATIAL_SIZE
+imported = time.perf_counter()
+registry = ModelRegistry({models_dir!r}, graph_optimization={optimization!r},
+                         variants={{{name!r}: {variant!r}}}, artifacts_dir={artifacts_dir!r})
+model = registry.get({name!r})
+loaded = time.perf_counter()
+model.run(model.dummy_input(spatial_size=WARMUP_SPATIAL_SIZE))
+ready = time.perf_counter()
+print(json.dumps({{
+    'import_ms': (imported - start) * 1000,
+    'load_ms': (loaded - imported) * 1000,
+    'first_run_ms': (ready - loaded) * 1000,
+    'total_ms': (ready - start) * 1000,
+    'from_artifact': model.from_cache,
+    'torch_imported': 'torch' in sys.modules,
+}}))
+"""
+
+
+def median_load_ms(path, options, repeat):
+    """Mediana del tiempo de creación de la sesión (análisis + optimización del grafo)"""
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        ort.InferenceSession(path, options, providers=['CPUExecutionProvider'])
+        times.append((time.perf_counter() - start) * 1000)
+    return float(np.median(times))
+
+
+def write_artifact(registry, source_path, output_path, fmt):
+    """Guardar el grafo optimizado por la sesión en ONNX o en formato ORT"""
+    options = registry.session_options(optimized_output=output_path)
+    if fmt == 'ort':
+        options.add_session_config_entry('session.save_model_format', 'ORT')
+    ort.InferenceSession(source_path, options, providers=['CPUExecutionProvider'])
+
+
+def outputs_match(registry, source_path, artifact_path, atol=1e-4):
+    """El artefacto debe dar la misma salida que el original"""
+    source = ort.InferenceSession(source_path, registry.session_options(),
+                                  providers=['CPUExecutionProvider'])
+    artifact = ort.InferenceSession(artifact_path, registry.session_options(skip_optimization=True),
+                                    providers=['CPUExecutionProvider'])
+    model_input = source.get_inputs()[0]
+    stride = 8 if model_input.name == 'latent' else 1
+    sizes = [1, 1, WARMUP_SPATIAL_SIZE[0] // stride, WARMUP_SPATIAL_SIZE[1] // stride]
+    shape = [dim if isinstance(dim, int) else size for dim, size in zip(model_input.shape, sizes)]
+    test_input = np.random.rand(*shape).astype(np.float32)
+
+    expected = source.run(None, {model_input.name: test_input})[0]
+    actual = artifact.run(None, {model_input.name: test_input})[0]
+    return float(np.abs(expected - actual).max()) <= atol
+
+
+def build_artifacts(models_dir, output_dir, optimizations, formats, repeat):
+    """Generar los artefactos de todos los modelos y variantes presentes y escribir el manifiesto"""
+    os.makedirs(output_dir, exist_ok=True)
+    artifacts = {}
+
+    print(f"{'Modelo':<40}{'Original':>10}{'ONNX opt.':>11}{'ORT':>9}  Preferido")
+    for optimization in optimizations:
+        registry = ModelRegistry(models_dir, graph_optimization=optimization)
+        for name in MODEL_FILES:
+            for variant in MODEL_VARIANTS:
+                source_path = registry.variant_path(name, variant)
+                if not os.path.exists(source_path):
+                    continue
+                key = artifact_key(name, variant, optimization)
+                entry = {
+                    'model': name,
+                    'variant': variant,
+                    'graph_optimization': optimization,
+                    'source': os.path.basename(source_path),
+                    'source_sha256': file_digest(source_path),
+                    'source_load_ms': round(median_load_ms(source_path, registry.session_options(), repeat), 3),
+                    'files': {},
+                }
+
+                for fmt in formats:
+                    artifact_path = os.path.join(output_dir, f"{key}.{fmt}")
+                    try:
+                        write_artifact(registry, source_path, artifact_path, fmt)
+                        if not outputs_match(registry, source_path, artifact_path):
+                            raise ValueError("la salida no coincide con el modelo original")
+                    except Exception as e:
+                        print(f"❌ {key} ({fmt}): {e}")
+                        if os.path.exists(artifact_path):
+                            os.remove(artifact_path)
+                        continue
+                    load_ms = median_load_ms(artifact_path, registry.session_options(skip_optimization=True), repeat)
+                    entry['files'][fmt] = {
+                        'file': os.path.basename(artifact_path),
+                        'sha256': file_digest(artifact_path),
+                        'size_bytes': os.path.getsize(artifact_path),
+                        'load_ms': round(load_ms, 3),
+                    }
+
+                if not entry['files']:
+                    continue
+                # Se carga el formato que arranca antes en esta máquina
+                entry['preferred'] = min(entry['files'], key=lambda fmt: entry['files'][fmt]['load_ms'])
+                artifacts[key] = entry
+
+                loads = {fmt: f"{entry['files'][fmt]['load_ms']:.1f}" if fmt in entry['files'] else '-'
+                         for fmt in ('onnx', 'ort')}
+                print(f"{key:<40}{entry['source_load_ms']:>8.1f}ms{loads['onnx']:>9}ms{loads['ort']:>7}ms"
+                      f"  {entry['preferred']}")
+
+    manifest = {
+        'created_at': datetime.now(timezone.utc).isoformat(),
+        'onnxruntime': ort.__version__,
+        'artifacts': artifacts,
+    }
+    manifest_path = os.path.join(output_dir, ARTIFACT_MANIFEST)
+    temp_path = manifest_path + '.tmp'
+    with open(temp_path, 'w') as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(temp_path, manifest_path)
+    print(f"\n📄 Manifiesto: {manifest_path} ({len(artifacts)} artefactos)")
+    return manifest
+
+
+def cold_start(models_dir, artifacts_dir, manifest):
+    """Arranque en frío por modelo en un proceso nuevo, con y sin artefactos"""
+    print("\n⏱️  Arranque en frío (proceso nuevo: importar, cargar y primera inferencia)")
+    print(f"{'Modelo':<40}{'Sin artefacto':>15}{'Con artefacto':>15}{'Carga':>16}  torch")
+    for key, entry in manifest['artifacts'].items():
+        results = []
+        for directory in (None, artifacts_dir):
+            snippet = COLD_START_SNIPPET.format(
+                base_dir=BASE_DIR, models_dir=models_dir, optimization=entry['graph_optimization'],
+                name=entry['model'], variant=entry['variant'], artifacts_dir=directory)
+            output = subprocess.run([sys.executable, '-c', snippet], capture_output=True, text=True, check=True)
+            results.append(json.loads(output.stdout.strip().splitlines()[-1]))
+        plain, precompiled = results
+        torch_imported = plain['torch_imported'] or precompiled['torch_imported']
+        print(f"{key:<40}{plain['total_ms']:>13.0f}ms{precompiled['total_ms']:>13.0f}ms"
+              f"{plain['load_ms']:>7.1f}->{precompiled['load_ms']:.1f}ms  {'sí' if torch_imported else 'no'}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Precompilar modelos ONNX con manifiesto de hashes')
+    parser.add_argument('--models-dir', default=os.path.join(BASE_DIR, 'static', 'models'))
+    parser.add_argument('--output-dir', help='Directorio de artefactos (por defecto, <models-dir>/optimized)')
+    parser.add_argument('--optimization', default='all', help='Niveles de optimización: basic,extended,all')
+    parser.add_argument('--formats', default='onnx,ort', help='Formatos de artefacto: onnx,ort')
+    parser.add_argument('--repeat', type=int, default=3, help='Repeticiones al medir la carga')
+    parser.add_argument('--cold-start', action='store_true',
+                        help='Medir el arranque en frío de cada modelo en un proceso nuevo')
+    args = parser.parse_args()
+
+    output_dir = args.output_dir or os.path.join(args.models_dir, 'optimized')
+    # El aviso de NchwcTransformer se repite por modelo: los artefactos son de esta máquina
+    ort.set_default_logger_severity(3)
+    print(f"🛠️  Precompilando modelos ONNX (ONNX Runtime {ort.__version__})")
+    print("=" * 60)
+    manifest = build_artifacts(args.models_dir, output_dir, args.optimization.split(','),
+                               args.formats.split(','), args.repeat)
+    if args.cold_start:
+        cold_start(args.models_dir, output_dir, manifest)
+
+
+if __name__ == "__main__":
+    main()
@@ -4,38 +4,108 @@ Script para convertir modelos PyTorch a formato ONNX
 Para ejecución en el navegador del cliente
 """
 
-import torch
-import torch.onnx
+import argparse
+import json
 import os
+import sys
 import numpy as np
 
-def convert_autoencoder_to_onnx(model_path, output_path, bottleneck_size):
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BASE_DIR)
+from model_registry import MODEL_VARIANTS, variant_filename
+
+# Tensor de salida del cuello de botella en los autoencoders exportados
+BOTTLENECK_PREFIX = '/bottleneck/'
+
+# Tamaño (alto, ancho) con el que se traza el modelo y que usa el cliente
+DEFAULT_INPUT_SIZE = (1024, 768)
+
+# Resoluciones que se verifican (y se exportan como variantes fijas si hace falta)
+EXPORT_RESOLUTIONS = [(1024, 768), (512, 384), (2048, 1536)]
+
+# Múltiplo que deben cumplir alto y ancho (tres reducciones x2 en los autoencoders)
+SPATIAL_MULTIPLE = {'autoencoder': 8, 'espcn': 1}
+
+# Modelos publicados a los que se pueden marcar ejes espaciales dinámicos
+DYNAMIC_MODELS = {
+    'espcn_model.onnx': 'espcn',
+    **{f'autoencoder_b{b}{part}.onnx': 'autoencoder'
+       for b in (8, 16, 32) for part in ('', '_encoder', '_decoder')},
+}
+
+def export_torchscript(model_path, output_path, dynamic_spatial=True, input_size=DEFAULT_INPUT_SIZE):
+    """
+    Exportar un modelo TorchScript a ONNX
+    
+    Con dynamic_spatial=True el alto y el ancho de entrada y salida quedan como
+    ejes dinámicos; con False el modelo solo acepta input_size (alto, ancho).
+    """
+    import torch
+    
+    # Cargar modelo PyTorch
+    model = torch.jit.load(model_path, map_location='cpu')
+    model.eval()
+    
+    # Tensor de ejemplo (1, 3, alto, ancho); con ejes dinámicos solo fija el trazado
+    height, width = input_size
+    dummy_input = torch.randn(1, 3, height, width)
+    
+    axes = {0: 'batch_size'}
+    if dynamic_spatial:
+        axes.update({2: 'height', 3: 'width'})
+    output_axes = {0: 'batch_size'}
+    if dynamic_spatial:
+        output_axes.update({2: 'out_height', 3: 'out_width'})
+    
+    # Convertir a ONNX
+    torch.onnx.export(
+        model,
+        dummy_input,
+        output_path,
+        export_params=True,
+        opset_version=11,
+        do_constant_folding=True,
+        input_names=['input'],
+        output_names=['output'],
+        dynamic_axes={
+            'input': axes,
+            'output': output_axes
+        }
+    )
+
+def fixed_variant_path(onnx_path, input_size):
+    """Ruta de la variante de tamaño fijo: modelo_1024x768.onnx"""
+    root, ext = os.path.splitext(onnx_path)
+    return f"{root}_{input_size[0]}x{input_size[1]}{ext}"
+
+def export_with_fallback(model_path, output_path, architecture, resolutions):
+    """
+    Exportar con ejes espaciales dinámicos y verificar varias formas
+    
+    Si el grafo dinámico no reproduce al original en alguna resolución
+    (arquitecturas con formas fijas en el grafo), se exporta además una
+    variante de tamaño fijo por cada resolución configurada.
+    """
+    export_torchscript(model_path, output_path, dynamic_spatial=True)
+    shapes = verification_shapes(architecture, resolutions)
+    if verify_onnx_model(output_path, model_path, shapes):
+        return True
+    
+    print(f"⚠️  {output_path} no admite ejes dinámicos; exportando variantes de tamaño fijo")
+    export_torchscript(model_path, output_path, dynamic_spatial=False)
+    exported = verify_onnx_model(output_path, model_path, [(1, 3) + DEFAULT_INPUT_SIZE])
+    for size in resolutions:
+        variant_path = fixed_variant_path(output_path, size)
+        export_torchscript(model_path, variant_path, dynamic_spatial=False, input_size=size)
+        exported = verify_onnx_model(variant_path, model_path, [(1, 3) + size]) and exported
+    return exported
+
+def convert_autoencoder_to_onnx(model_path, output_path, bottleneck_size, resolutions=EXPORT_RESOLUTIONS):
     """Convertir autoencoder PyTorch a ONNX"""
     try:
         print(f"Convirtiendo {model_path} a ONNX")
-        
-        # Cargar modelo PyTorch
-        model = torch.jit.load(model_path, map_location='cpu')
-        model.eval()
-        
-        # Crear tensor de ejemplo (1, 3, 1024, 768)
-        dummy_input = torch.randn(1, 3, 1024, 768)
-        
-        # Convertir a ONNX
-        torch.onnx.export(
-            model,
-            dummy_input,
-            output_path,
-            export_params=True,
-            opset_version=11,
-            do_constant_folding=True,
-            input_names=['input'],
-            output_names=['output'],
-            dynamic_axes={
-                'input': {0: 'batch_size'},
-                'output': {0: 'batch_size'}
-            }
-        )
+        if not export_with_fallback(model_path, output_path, 'autoencoder', resolutions):
+            return False
         
         print(f"✅ Autoencoder {bottleneck_size}b convertido: {output_path}")
         return True
@@ -44,33 +114,12 @@ def convert_autoencoder_to_onnx(model_path, output_path, bottleneck_size):
         print(f"❌ Error convirtiendo autoencoder {bottleneck_size}b: {e}")
         return False
 
-def convert_espcn_to_onnx(model_path, output_path):
+def convert_espcn_to_onnx(model_path, output_path, resolutions=EXPORT_RESOLUTIONS):
     """Convertir modelo ESPCN a ONNX"""
     try:
         print(f"Convirtiendo ESPCN {model_path} a ONNX...")
-        
-        # Cargar modelo PyTorch
-        model = torch.jit.load(model_path, map_location='cpu')
-        model.eval()
-        
-        # Crear tensor de ejemplo (1, 3, 1024, 768)
-        dummy_input = torch.randn(1, 3, 1024, 768)
-        
-        # Convertir a ONNX
-        torch.onnx.export(
-            model,
-            dummy_input,
-            output_path,
-            export_params=True,
-            opset_version=11,
-            do_constant_folding=True,
-            input_names=['input'],
-            output_names=['output'],
-            dynamic_axes={
-                'input': {0: 'batch_size'},
-                'output': {0: 'batch_size'}
-            }
-        )
+        if not export_with_fallback(model_path, output_path, 'espcn', resolutions):
+            return False
         
         print(f"✅ ESPCN convertido: {output_path}")
         return True
@@ -79,8 +128,179 @@ def convert_espcn_to_onnx(model_path, output_path):
         print(f"❌ Error convirtiendo ESPCN: {e}")
         return False
 
-def verify_onnx_model(onnx_path):
-    """Verificar que el modelo ONNX funcione"""
+def verification_shapes(architecture, resolutions):
+    """Formas NCHW de prueba: las resoluciones configuradas más una pequeña y con lote 2"""
+    multiple = SPATIAL_MULTIPLE[architecture]
+    small = (multiple * 9, multiple * 7)   # no cuadrada y no potencia de 2
+    shapes = [(1, 3) + tuple(size) for size in resolutions]
+    shapes.append((1, 3) + small)
+    shapes.append((2, 3) + small)
+    return shapes
+
+def make_spatial_axes_dynamic(onnx_path, output_path=None):
+    """
+    Marcar como dinámicos el alto y el ancho de un modelo ONNX ya exportado
+    
+    Sirve para los modelos totalmente convolucionales exportados con tamaño
+    fijo sin necesidad de PyTorch: se reescriben las dimensiones de entradas
+    y salidas y se vuelven a inferir las formas intermedias.
+    """
+    import onnx
+    
+    model = onnx.load(onnx_path)
+    graph = model.graph
+    for prefix, values in (('', graph.input), ('out_', graph.output)):
+        for value in values:
+            dims = value.type.tensor_type.shape.dim
+            if len(dims) != 4:
+                continue
+            for index, name in ((2, 'height'), (3, 'width')):
+                dims[index].Clear()
+                dims[index].dim_param = prefix + name
+    del graph.value_info[:]
+    model = onnx.shape_inference.infer_shapes(model)
+    onnx.checker.check_model(model)
+    onnx.save(model, output_path or onnx_path)
+    return output_path or onnx_path
+
+def make_models_dynamic(onnx_dir, resolutions=EXPORT_RESOLUTIONS):
+    """Aplicar ejes dinámicos a los modelos de onnx_dir y verificar varias formas"""
+    converted = 0
+    for filename, architecture in DYNAMIC_MODELS.items():
+        onnx_path = f'{onnx_dir}/{filename}'
+        if not os.path.exists(onnx_path):
+            print(f"⚠️  Modelo no encontrado: {onnx_path}")
+            continue
+        
+        # Se escribe a un temporal y solo se reemplaza si verifica en todas las formas
+        temp_path = onnx_path + '.tmp'
+        try:
+            make_spatial_axes_dynamic(onnx_path, temp_path)
+            reference = onnx_path if fixed_input_shape(onnx_path) else None
+            if verify_onnx_model(temp_path, shapes=verification_shapes(architecture, resolutions),
+                                 reference_onnx=reference):
+                os.replace(temp_path, onnx_path)
+                converted += 1
+        except Exception as e:
+            print(f"❌ Error marcando ejes dinámicos en {onnx_path}: {e}")
+        finally:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+    return converted
+
+def fixed_input_shape(onnx_path):
+    """Forma de entrada (C, H, W) si es fija, None si tiene ejes espaciales dinámicos"""
+    import onnx
+    
+    dims = onnx.load(onnx_path, load_external_data=False).graph.input[0].type.tensor_type.shape.dim
+    shape = [dim.dim_value if dim.HasField('dim_value') else None for dim in dims]
+    return tuple(shape[1:]) if None not in shape[1:] else None
+
+def find_bottleneck_output(onnx_model):
+    """Nombre del último tensor del bloque bottleneck (la representación latente)"""
+    outputs = [
+        output for node in onnx_model.graph.node for output in node.output
+        if output.startswith(BOTTLENECK_PREFIX)
+    ]
+    if not outputs:
+        raise ValueError("No se encontró el bloque bottleneck en el grafo")
+    return outputs[-1]
+
+def rename_tensor(onnx_model, old_name, new_name):
+    """Renombrar un tensor en nodos, entradas y salidas del grafo"""
+    graph = onnx_model.graph
+    for node in graph.node:
+        node.input[:] = [new_name if name == old_name else name for name in node.input]
+        node.output[:] = [new_name if name == old_name else name for name in node.output]
+    for value in list(graph.input) + list(graph.output) + list(graph.value_info):
+        if value.name == old_name:
+            value.name = new_name
+
+def split_autoencoder(onnx_path, encoder_path, decoder_path):
+    """
+    Separar un autoencoder ONNX en codificador (input -> latent) y decodificador (latent -> output)
+    
+    Trabaja sobre el grafo ya exportado, así que no necesita PyTorch.
+    """
+    try:
+        import onnx
+        from onnx.utils import Extractor
+        
+        print(f"Separando {onnx_path} en codificador y decodificador...")
+        model = onnx.shape_inference.infer_shapes(onnx.load(onnx_path))
+        latent_name = find_bottleneck_output(model)
+        extractor = Extractor(model)
+        
+        for path, inputs, outputs in ((encoder_path, ['input'], [latent_name]),
+                                      (decoder_path, [latent_name], ['output'])):
+            part = extractor.extract_model(inputs, outputs)
+            rename_tensor(part, latent_name, 'latent')
+            part.ir_version = model.ir_version
+            del part.opset_import[:]
+            part.opset_import.extend(model.opset_import)
+            onnx.checker.check_model(part)
+            onnx.save(part, path)
+        
+        # La composición debe reproducir el modelo completo
+        import onnxruntime as ort
+        test_input = np.random.rand(1, 3, 1024, 768).astype(np.float32)
+        full = ort.InferenceSession(onnx_path).run(None, {'input': test_input})[0]
+        latent = ort.InferenceSession(encoder_path).run(None, {'input': test_input})[0]
+        recomposed = ort.InferenceSession(decoder_path).run(None, {'latent': latent})[0]
+        max_diff = float(np.abs(full - recomposed).max())
+        
+        print(f"✅ Separado: {encoder_path} + {decoder_path}")
+        print(f"   Latente: {list(latent.shape)}  Diferencia máx. con el modelo completo: {max_diff:.2e}")
+        return max_diff < 1e-4
+        
+    except Exception as e:
+        print(f"❌ Error separando {onnx_path}: {e}")
+        return False
+
+def split_autoencoders(onnx_dir):
+    """Separar los tres autoencoders exportados en onnx_dir"""
+    split = 0
+    for bottleneck in [8, 16, 32]:
+        onnx_path = f'{onnx_dir}/autoencoder_b{bottleneck}.onnx'
+        if not os.path.exists(onnx_path):
+            print(f"⚠️  Modelo no encontrado: {onnx_path}")
+            continue
+        if split_autoencoder(onnx_path,
+                             f'{onnx_dir}/autoencoder_b{bottleneck}_encoder.onnx',
+                             f'{onnx_dir}/autoencoder_b{bottleneck}_decoder.onnx'):
+            split += 1
+    return split
+
+def model_input(session, shape):
+    """Tensor aleatorio para la entrada del modelo a partir de una forma de imagen NCHW"""
+    model_input = session.get_inputs()[0]
+    batch, _, height, width = shape
+    if model_input.name == 'latent':
+        # Decodificadores: el latente tiene 1/8 de la resolución de la imagen
+        channels = model_input.shape[1]
+        return np.random.rand(batch, channels, height // 8, width // 8).astype(np.float32)
+    return np.random.rand(batch, 3, height, width).astype(np.float32)
+
+def run_torchscript(torchscript_path, test_input):
+    """Salida del modelo TorchScript original, o None si PyTorch no está instalado"""
+    try:
+        import torch
+    except ImportError:
+        return None
+    model = torch.jit.load(torchscript_path, map_location='cpu')
+    model.eval()
+    with torch.no_grad():
+        return model(torch.from_numpy(test_input)).numpy()
+
+def verify_onnx_model(onnx_path, torchscript_path=None, shapes=None, reference_onnx=None, atol=1e-4):
+    """
+    Verificar que el modelo ONNX funcione en varias formas de entrada
+    
+    Para cada forma compara numéricamente con el TorchScript original (si
+    PyTorch está disponible) o con un ONNX de referencia de tamaño fijo cuando
+    la forma coincide. Además exige que la escala salida/entrada sea la misma
+    en todas las formas.
+    """
     try:
         import onnx
         import onnxruntime as ort
@@ -89,34 +309,251 @@ def verify_onnx_model(onnx_path):
         onnx_model = onnx.load(onnx_path)
         onnx.checker.check_model(onnx_model)
         
-        # Probar inferencia
-        session = ort.InferenceSession(onnx_path)
+        session = ort.InferenceSession(onnx_path, providers=['CPUExecutionProvider'])
         input_name = session.get_inputs()[0].name
+        reference = ort.InferenceSession(reference_onnx, providers=['CPUExecutionProvider']) if reference_onnx else None
+        if torchscript_path and run_torchscript(torchscript_path, np.zeros((1, 3, 8, 8), np.float32)) is None:
+            print("   ⚠️  PyTorch no disponible: se omite la comparación con TorchScript")
+            torchscript_path = None
         
-        # Crear datos de prueba
-        test_input = np.random.randn(1, 3, 1024, 768).astype(np.float32)
+        print(f"🔍 Verificando {onnx_path}")
+        scales = set()
+        ok = True
+        for shape in shapes or [(1, 3) + DEFAULT_INPUT_SIZE]:
+            test_input = model_input(session, shape)
+            output = session.run(None, {input_name: test_input})[0]
+            scales.add((output.shape[2] / test_input.shape[2], output.shape[3] / test_input.shape[3]))
+            
+            expected = None
+            if torchscript_path:
+                expected = run_torchscript(torchscript_path, test_input)
+            elif reference and list(reference.get_inputs()[0].shape[1:]) == list(test_input.shape[1:]):
+                expected = reference.run(None, {input_name: test_input[:1]})[0]
+                output = output[:1]
+            
+            if expected is None:
+                print(f"   {list(test_input.shape)} -> {list(output.shape)}")
+            else:
+                max_diff = float(np.abs(output - expected).max())
+                ok = ok and output.shape == expected.shape and max_diff <= atol
+                print(f"   {list(test_input.shape)} -> {list(output.shape)}  diferencia máx.: {max_diff:.2e}")
         
-        # Ejecutar inferencia
-        result = session.run(None, {input_name: test_input})
+        if len(scales) > 1:
+            print(f"❌ La escala salida/entrada cambia con la forma: {sorted(scales)}")
+            return False
+        if not ok:
+            print(f"❌ {onnx_path} no reproduce al modelo original (tolerancia {atol:.0e})")
+            return False
         
         print(f"✅ Modelo ONNX verificado: {onnx_path}")
-        print(f"   Entrada: {test_input.shape}")
-        print(f"   Salida: {result[0].shape}")
         return True
         
     except Exception as e:
         print(f"❌ Error verificando modelo ONNX: {e}")
         return False
 
+# Modelos completos para los que se generan variantes cuantizadas
+VARIANT_MODELS = ['espcn_model.onnx', 'autoencoder_b8.onnx', 'autoencoder_b16.onnx', 'autoencoder_b32.onnx']
+
+# Los QDQ por canal (escala del bias incluida) requieren opset 13
+QUANTIZATION_OPSET = 13
+
+def quantize_dynamic_variant(onnx_path, output_path):
+    """INT8 dinámico: pesos en uint8, activaciones cuantizadas en tiempo de ejecución"""
+    from onnxruntime.quantization import quantize_dynamic, QuantType
+    
+    quantize_dynamic(onnx_path, output_path, weight_type=QuantType.QUInt8)
+
+def calibration_tensors(images_dir, count, size):
+    """Tensores NCHW de calibración: imágenes de un directorio o sintéticas, al tamaño dado"""
+    from PIL import Image
+    from report_latent_storage import load_images, synthetic_images
+    
+    images = load_images(images_dir)[:count] if images_dir else synthetic_images(count, seed=1)
+    height, width = size
+    return [
+        np.expand_dims(np.asarray(img.resize((width, height), Image.LANCZOS), dtype=np.float32)
+                       .transpose(2, 0, 1) / 255.0, 0)
+        for img in images
+    ]
+
+def quantize_static_variant(onnx_path, output_path, tensors):
+    """INT8 estático (QDQ por canal) con rangos de activación calibrados con `tensors`"""
+    import onnx
+    from onnx import version_converter
+    from onnxruntime.quantization import quantize_static, CalibrationDataReader, QuantFormat
+    from onnxruntime.quantization.shape_inference import quant_pre_process
+    
+    class TensorReader(CalibrationDataReader):
+        def __init__(self):
+            self._inputs = iter({'input': tensor} for tensor in tensors)
+        
+        def get_next(self):
+            return next(self._inputs, None)
+    
+    upgraded_path = output_path + '.opset.onnx'
+    prepared_path = output_path + '.pre.onnx'
+    try:
+        onnx.save(version_converter.convert_version(onnx.load(onnx_path), QUANTIZATION_OPSET), upgraded_path)
+        quant_pre_process(upgraded_path, prepared_path, skip_symbolic_shape=True)
+        quantize_static(prepared_path, output_path, TensorReader(),
+                        quant_format=QuantFormat.QDQ, per_channel=True)
+    finally:
+        for path in (upgraded_path, prepared_path):
+            if os.path.exists(path):
+                os.remove(path)
+
+def convert_fp16_variant(onnx_path, output_path):
+    """
+    FP16: pesos y cálculo en float16, entrada y salida en float32
+    
+    Se insertan Cast al principio y al final para que los llamadores sigan
+    usando tensores float32.
+    """
+    import onnx
+    from onnx import helper, numpy_helper, TensorProto
+    
+    model = onnx.load(onnx_path)
+    graph = model.graph
+    for initializer in graph.initializer:
+        if initializer.data_type == TensorProto.FLOAT:
+            weights = numpy_helper.to_array(initializer).astype(np.float16)
+            initializer.CopyFrom(numpy_helper.from_array(weights, initializer.name))
+    
+    renamed = {value.name: value.name + '_fp16' for value in list(graph.input) + list(graph.output)}
+    for node in graph.node:
+        node.input[:] = [renamed.get(name, name) for name in node.input]
+        node.output[:] = [renamed.get(name, name) for name in node.output]
+    
+    nodes = [helper.make_node('Cast', [value.name], [renamed[value.name]], to=TensorProto.FLOAT16)
+             for value in graph.input]
+    nodes += list(graph.node)
+    nodes += [helper.make_node('Cast', [renamed[value.name]], [value.name], to=TensorProto.FLOAT)
+              for value in graph.output]
+    del graph.node[:]
+    graph.node.extend(nodes)
+    del graph.value_info[:]
+    
+    onnx.checker.check_model(model)
+    onnx.save(model, output_path)
+
+def create_variants(onnx_dir, variants, calibration_dir=None, calibration_count=8, calibration_size=(256, 256)):
+    """Generar las variantes pedidas de los cuatro modelos y registrarlas en models_info.json"""
+    tensors = None
+    created = {}
+    for filename in VARIANT_MODELS:
+        onnx_path = f'{onnx_dir}/{filename}'
+        if not os.path.exists(onnx_path):
+            print(f"⚠️  Modelo no encontrado: {onnx_path}")
+            continue
+        
+        for variant in variants:
+            output_path = f'{onnx_dir}/{variant_filename(filename, variant)}'
+            try:
+                if variant == 'int8_dynamic':
+                    quantize_dynamic_variant(onnx_path, output_path)
+                elif variant == 'int8_static':
+                    if tensors is None:
+                        print(f"📷 Calibrando con {calibration_count} imágenes de {calibration_size[0]}x{calibration_size[1]}")
+                        tensors = calibration_tensors(calibration_dir, calibration_count, calibration_size)
+                    quantize_static_variant(onnx_path, output_path, tensors)
+                elif variant == 'fp16':
+                    convert_fp16_variant(onnx_path, output_path)
+                
+                created.setdefault(filename, {})[variant] = {
+                    'file': os.path.basename(output_path),
+                    'size_bytes': os.path.getsize(output_path),
+                }
+                print(f"✅ {variant}: {output_path} ({os.path.getsize(output_path) / 1024:.0f} KB)")
+            except Exception as e:
+                print(f"❌ Error generando {variant} de {onnx_path}: {e}")
+    
+    record_variants(onnx_dir, created)
+    return sum(len(files) for files in created.values())
+
+def record_variants(onnx_dir, created):
+    """Añadir las variantes generadas a la entrada de cada modelo en models_info.json"""
+    info_path = f'{onnx_dir}/models_info.json'
+    if not created or not os.path.exists(info_path):
+        return
+    with open(info_path) as f:
+        model_info = json.load(f)
+    
+    entries = list(model_info['models']['autoencoders'].values())
+    entries += list(model_info['models']['enhancement'].values())
+    for entry in entries:
+        if entry['file'] in created:
+            entry.setdefault('variants', {}).update(created[entry['file']])
+    
+    with open(info_path, 'w', newline='\r\n') as f:
+        json.dump(model_info, f, indent=2)
+    print(f"📄 Variantes registradas en {info_path}")
+
+def parse_variants(value):
+    """'int8_dynamic,fp16' -> ['int8_dynamic', 'fp16']"""
+    variants = [variant for variant in value.split(',') if variant]
+    for variant in variants:
+        if variant not in MODEL_VARIANTS or variant == 'fp32':
+            raise argparse.ArgumentTypeError(f"Variante desconocida: {variant}")
+    return variants
+
+def parse_resolutions(value):
+    """'1024x768,512x384' -> [(1024, 768), (512, 384)] (alto x ancho)"""
+    resolutions = []
+    for item in value.split(','):
+        height, width = (int(part) for part in item.lower().split('x'))
+        if height % SPATIAL_MULTIPLE['autoencoder'] or width % SPATIAL_MULTIPLE['autoencoder']:
+            raise argparse.ArgumentTypeError(f"{item}: alto y ancho deben ser múltiplos de 8")
+        resolutions.append((height, width))
+    return resolutions
+
 def main():
     """Función principal de conversión"""
-    print("🔄 Iniciando conversión de modelos PyTorch a ONNX")
-    print("=" * 60)
+    parser = argparse.ArgumentParser(description='Convertir modelos PyTorch a ONNX')
+    parser.add_argument('--split-only', action='store_true',
+                        help='Solo separar en codificador/decodificador los autoencoders ONNX existentes')
+    parser.add_argument('--dynamic-only', action='store_true',
+                        help='Solo marcar alto y ancho como dinámicos en los modelos ONNX existentes (sin PyTorch)')
+    parser.add_argument('--resolutions', type=parse_resolutions, default=EXPORT_RESOLUTIONS,
+                        help='Resoluciones a verificar/exportar, p. ej. 1024x768,512x384')
+    parser.add_argument('--variants', type=parse_variants, default=[],
+                        help='Variantes a generar: int8_dynamic,int8_static,fp16')
+    parser.add_argument('--variants-only', action='store_true',
+                        help='Solo generar las variantes de los modelos ONNX existentes')
+    parser.add_argument('--calibration-images', help='Directorio de imágenes de calibración (por defecto, sintéticas)')
+    parser.add_argument('--calibration-count', type=int, default=8)
+    parser.add_argument('--calibration-size', type=lambda value: parse_resolutions(value)[0], default=(256, 256),
+                        help='Tamaño de calibración (alto x ancho); 256x256 coincide con los mosaicos de ESPCN')
+    args = parser.parse_args()
     
     # Crear directorio para modelos ONNX
     onnx_dir = 'static/models'
     os.makedirs(onnx_dir, exist_ok=True)
     
+    if args.split_only:
+        print("✂️  Separando autoencoders ONNX en codificador y decodificador")
+        print("=" * 60)
+        print(f"📊 Autoencoders separados: {split_autoencoders(onnx_dir)}/3")
+        return
+    
+    if args.variants_only:
+        variants = args.variants or [variant for variant in MODEL_VARIANTS if variant != 'fp32']
+        print("🗜️  Generando variantes cuantizadas")
+        print("=" * 60)
+        created = create_variants(onnx_dir, variants, args.calibration_images,
+                                  args.calibration_count, args.calibration_size)
+        print(f"📊 Variantes generadas: {created}/{len(variants) * len(VARIANT_MODELS)}")
+        return
+    
+    if args.dynamic_only:
+        print("📐 Marcando ejes espaciales dinámicos en los modelos ONNX")
+        print("=" * 60)
+        print(f"📊 Modelos dinámicos: {make_models_dynamic(onnx_dir, args.resolutions)}/{len(DYNAMIC_MODELS)}")
+        return
+    
+    print("🔄 Iniciando conversión de modelos PyTorch a ONNX")
+    print("=" * 60)
+    
     models_converted = 0
     total_models = 4
     
@@ -126,9 +563,8 @@ def main():
         onnx_path = f'{onnx_dir}/autoencoder_b{bottleneck}.onnx'
         
         if os.path.exists(pytorch_path):
-            if convert_autoencoder_to_onnx(pytorch_path, onnx_path, bottleneck):
-                if verify_onnx_model(onnx_path):
-                    models_converted += 1
+            if convert_autoencoder_to_onnx(pytorch_path, onnx_path, bottleneck, args.resolutions):
+                models_converted += 1
         else:
             print(f"⚠️  Modelo no encontrado: {pytorch_path}")
     
@@ -137,15 +573,18 @@ def main():
     espcn_onnx_path = f'{onnx_dir}/espcn_model.onnx'
     
     if os.path.exists(espcn_pytorch_path):
-        if convert_espcn_to_onnx(espcn_pytorch_path, espcn_onnx_path):
-            if verify_onnx_model(espcn_onnx_path):
-                models_converted += 1
+        if convert_espcn_to_onnx(espcn_pytorch_path, espcn_onnx_path, args.resolutions):
+            models_converted += 1
     else:
         print(f"⚠️  Modelo ESPCN no encontrado: {espcn_pytorch_path}")
     
+    # Codificador y decodificador por separado para almacenar latentes
+    models_split = split_autoencoders(onnx_dir)
+    
     print("\n" + "=" * 60)
     print(f"📊 Resumen de conversión:")
     print(f"   Modelos convertidos: {models_converted}/{total_models}")
+    print(f"   Autoencoders separados: {models_split}/3")
     print(f"   Directorio ONNX: {onnx_dir}")
     
     if models_converted == total_models:
@@ -157,6 +596,11 @@ def main():
     
     # Crear archivo de información
     create_model_info_file(onnx_dir, models_converted)
+    
+    # Variantes cuantizadas (después, para registrarlas en models_info.json)
+    if args.variants:
+        create_variants(onnx_dir, args.variants, args.calibration_images,
+                        args.calibration_count, args.calibration_size)
 
 def create_model_info_file(onnx_dir, models_converted):
     """Crear archivo JSON con información de los modelos"""
@@ -170,19 +614,28 @@ def create_model_info_file(onnx_dir, models_converted):
                     "file": "autoencoder_b8.onnx",
                     "compression": "high",
                     "quality": "low",
-                    "use_case": "slow_networks"
+                    "use_case": "slow_networks",
+                    "encoder": "autoencoder_b8_encoder.onnx",
+                    "decoder": "autoencoder_b8_decoder.onnx",
+                    "latent_shape": [1, 8, 128, 96]
                 },
                 "16": {
                     "file": "autoencoder_b16.onnx", 
                     "compression": "medium",
                     "quality": "medium",
-                    "use_case": "normal_networks"
+                    "use_case": "normal_networks",
+                    "encoder": "autoencoder_b16_encoder.onnx",
+                    "decoder": "autoencoder_b16_decoder.onnx",
+                    "latent_shape": [1, 16, 128, 96]
                 },
                 "32": {
                     "file": "autoencoder_b32.onnx",
                     "compression": "low", 
                     "quality": "high",
-                    "use_case": "fast_networks"
+                    "use_case": "fast_networks",
+                    "encoder": "autoencoder_b32_encoder.onnx",
+                    "decoder": "autoencoder_b32_decoder.onnx",
+                    "latent_shape": [1, 32, 128, 96]
                 }
             },
             "enhancement": {
@@ -195,13 +648,14 @@ def create_model_info_file(onnx_dir, models_converted):
         },
         "input_shape": [1, 3, 1024, 768],
         "output_shape": [1, 3, 1024, 768],
+        "dynamic_axes": {"batch_size": 0, "height": 2, "width": 3},
+        "spatial_multiple": SPATIAL_MULTIPLE,
         "format": "ONNX",
         "opset_version": 11
     }
     
     info_path = f'{onnx_dir}/models_info.json'
-    import json
-    with open(info_path, 'w') as f:
+    with open(info_path, 'w', newline='\r\n') as f:
         json.dump(model_info, f, indent=2)
     
     print(f"📄 Información de modelos guardada: {info_path}")
@@ -7,6 +7,11 @@ Funciones para recortar, comprimir y mejorar imágenes
 from PIL import Image, ImageOps
 import os
 import math
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+# Extensiones que procesa el modo por lotes
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.webp', '.bmp')
 
 def crop_center_square(image_path, output_path=None):
     """
@@ -89,6 +94,80 @@ def create_thumbnail(image_path, size=(400, 400), output_path=None):
         print(f"Error creando miniatura: {e}")
         return image_path
 
+def validate_outputs(thumbnail_sizes, save_square):
+    """Tamaños de miniatura como tuplas (ancho, alto); ValueError si no hay salidas o alguno no es válido"""
+    sizes = [tuple(size) for size in thumbnail_sizes]
+    for size in sizes:
+        if len(size) != 2 or not all(isinstance(n, int) and n > 0 for n in size):
+            raise ValueError(f"Tamaño de miniatura no válido: {size}")
+    if not sizes and not save_square:
+        raise ValueError("Nada que generar: sin miniaturas y sin recorte cuadrado")
+    return sizes
+
+def process_image(image_path, output_dir=None, thumbnail_sizes=((400, 400),), save_square=True,
+                  square_quality=95, thumbnail_quality=85):
+    """
+    Recorte cuadrado y miniaturas en una sola pasada
+    
+    La imagen se decodifica una vez (en JPEG con draft() a la menor escala
+    1/2, 1/4 u 1/8 que aún cubre la salida más grande) y todas las salidas
+    se derivan del mismo recorte en memoria, sin recodificar intermedios.
+    
+    Args:
+        image_path: Ruta a la imagen original
+        output_dir: Directorio de salida (por defecto, el de la imagen)
+        thumbnail_sizes: Tamaños (ancho, alto) de las miniaturas
+        save_square: Si se guarda el recorte cuadrado a resolución completa
+        
+    Returns:
+        Dict con la ruta del recorte y de cada miniatura por tamaño
+    
+    Raises:
+        ValueError: si no hay ninguna salida que generar o un tamaño no es válido
+    """
+    thumbnail_sizes = validate_outputs(thumbnail_sizes, save_square)
+    base_name = os.path.splitext(os.path.basename(image_path))[0]
+    output_dir = output_dir or os.path.dirname(image_path)
+    
+    result = {
+        'original': image_path,
+        'square': None,
+        'thumbnails': {}
+    }
+    
+    with Image.open(image_path) as img:
+        width, height = img.size
+        side = min(width, height)
+        
+        # Lado mínimo del recorte decodificado que necesitan las salidas
+        target_side = side if save_square else max(max(size) for size in thumbnail_sizes)
+        if img.format == 'JPEG' and target_side < side:
+            scale = target_side / side
+            img.draft('RGB', (math.ceil(width * scale), math.ceil(height * scale)))
+        
+        if img.mode != 'RGB':
+            img = img.convert('RGB')
+        
+        # Recortar al centro en las coordenadas de la imagen decodificada
+        width, height = img.size
+        side = min(width, height)
+        left = (width - side) // 2
+        top = (height - side) // 2
+        square = img.crop((left, top, left + side, top + side))
+    
+    if save_square:
+        result['square'] = os.path.join(output_dir, f"{base_name}_square.jpg")
+        square.save(result['square'], 'JPEG', quality=square_quality)
+    
+    for size in thumbnail_sizes:
+        suffix = '_thumb' if len(thumbnail_sizes) == 1 else f"_thumb_{size[0]}x{size[1]}"
+        thumb_path = os.path.join(output_dir, f"{base_name}{suffix}.jpg")
+        thumb = ImageOps.fit(square, size, Image.LANCZOS, centering=(0.5, 0.5))
+        thumb.save(thumb_path, 'JPEG', quality=thumbnail_quality)
+        result['thumbnails'][size] = thumb_path
+    
+    return result
+
 def process_upload_image(image_path, create_thumb=True):
     """
     Procesa una imagen recién subida: recorta al centro y crea miniatura
@@ -107,35 +186,123 @@ def process_upload_image(image_path, create_thumb=True):
     }
     
     try:
-        # Recortar al centro
-        base_name = os.path.splitext(os.path.basename(image_path))[0]
-        dir_name = os.path.dirname(image_path)
-        square_path = os.path.join(dir_name, f"{base_name}_square.jpg")
-        
-        result['square'] = crop_center_square(image_path, square_path)
-        
-        # Crear miniatura si se solicita
-        if create_thumb:
-            thumb_path = os.path.join(dir_name, f"{base_name}_thumb.jpg")
-            result['thumbnail'] = create_thumbnail(result['square'], (400, 400), thumb_path)
-            
+        processed = process_image(image_path, thumbnail_sizes=[(400, 400)] if create_thumb else [])
+        result['square'] = processed['square']
+        result['thumbnail'] = processed['thumbnails'].get((400, 400))
         return result
         
     except Exception as e:
         print(f"Error procesando imagen: {e}")
         return result
 
+def _process_for_batch(image_path, output_dir, thumbnail_sizes, save_square):
+    """Tarea de un worker del modo por lotes: (ruta, bytes leídos, error)"""
+    try:
+        process_image(image_path, output_dir, thumbnail_sizes, save_square)
+        return image_path, os.path.getsize(image_path), None
+    except Exception as e:
+        return image_path, 0, str(e)
+
+def _is_output_name(stem):
+    """Archivos generados por este script (no se vuelven a procesar)"""
+    return stem.endswith(('_square', '_thumb')) or '_thumb_' in stem
+
+def process_directory(input_dir, output_dir=None, thumbnail_sizes=((400, 400),), save_square=True, workers=None):
+    """
+    Procesar todas las imágenes de un directorio en un pool de procesos
+    
+    Returns:
+        Dict con procesadas, errores, segundos e imágenes por segundo
+    """
+    thumbnail_sizes = validate_outputs(thumbnail_sizes, save_square)
+    output_dir = output_dir or input_dir
+    os.makedirs(output_dir, exist_ok=True)
+    
+    paths = sorted(
+        os.path.join(input_dir, name) for name in os.listdir(input_dir)
+        if name.lower().endswith(IMAGE_EXTENSIONS)
+        and not _is_output_name(os.path.splitext(name)[0])
+    )
+    
+    # Las salidas se nombran por el nombre sin extensión: a.png y a.jpg se
+    # sobrescribirían (sin distinguir mayúsculas, como en Windows y macOS)
+    by_stem = {}
+    for path in paths:
+        by_stem.setdefault(os.path.splitext(os.path.basename(path))[0].lower(), []).append(path)
+    errors = []
+    for group in by_stem.values():
+        if len(group) > 1:
+            for path in group:
+                error = f"mismo nombre de salida que {', '.join(os.path.basename(p) for p in group if p != path)}"
+                errors.append((path, error))
+                print(f"❌ {path}: {error}")
+    paths = [path for path in paths if len(by_stem[os.path.splitext(os.path.basename(path))[0].lower()]) == 1]
+    
+    total = len(paths)
+    workers = workers or os.cpu_count() or 1
+    print(f"🖼️  Procesando {total} imágenes con {workers} procesos")
+    
+    processed = 0
+    total_bytes = 0
+    start = time.perf_counter()
+    
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = [
+            executor.submit(_process_for_batch, path, output_dir, thumbnail_sizes, save_square)
+            for path in paths
+        ]
+        for done, future in enumerate(as_completed(futures), 1):
+            path, size, error = future.result()
+            if error:
+                errors.append((path, error))
+                print(f"❌ {path}: {error}")
+            else:
+                processed += 1
+                total_bytes += size
+            
+            if done % 10 == 0 or done == total:
+                elapsed = time.perf_counter() - start
+                print(f"   {done}/{total}  {done / elapsed:.1f} img/s  "
+                      f"{total_bytes / elapsed / 1024 / 1024:.1f} MB/s")
+    
+    elapsed = time.perf_counter() - start
+    return {
+        'processed': processed,
+        'errors': errors,
+        'seconds': elapsed,
+        'images_per_second': processed / elapsed if elapsed else 0.0
+    }
+
+def parse_sizes(value):
+    """'400x400,200x200' -> [(400, 400), (200, 200)]"""
+    return [tuple(int(n) for n in size.split('x')) for size in value.split(',') if size]
+
 if __name__ == "__main__":
-    # Prueba simple
-    import sys
+    import argparse
+    
+    parser = argparse.ArgumentParser(description='Recorte cuadrado y miniaturas de imágenes')
+    parser.add_argument('path', help='Imagen o, con --batch, directorio de imágenes')
+    parser.add_argument('--batch', action='store_true', help='Procesar todo el directorio')
+    parser.add_argument('--output', help='Directorio de salida')
+    parser.add_argument('--sizes', type=parse_sizes, default=[(400, 400)], help='Miniaturas, p. ej. 400x400,200x200')
+    parser.add_argument('--no-square', action='store_true', help='No guardar el recorte a resolución completa')
+    parser.add_argument('--workers', type=int, help='Procesos del pool (por defecto, CPUs)')
+    args = parser.parse_args()
+    try:
+        validate_outputs(args.sizes, not args.no_square)
+    except ValueError as e:
+        parser.error(str(e))
     
-    if len(sys.argv) > 1:
-        input_path = sys.argv[1]
-        print(f"Procesando imagen: {input_path}")
+    if args.batch:
+        stats = process_directory(args.path, args.output, args.sizes, not args.no_square, args.workers)
+        print(f"✅ {stats['processed']} imágenes en {stats['seconds']:.1f} s "
+              f"({stats['images_per_second']:.1f} img/s), {len(stats['errors'])} errores")
+    else:
+        print(f"Procesando imagen: {args.path}")
         
-        result = process_upload_image(input_path)
+        result = process_image(args.path, args.output, args.sizes, not args.no_square)
         print("Resultado:")
-        for key, path in result.items():
-            print(f"  {key}: {path}")
-    else:
-        print("Uso: python image_processor.py ruta/a/imagen.jpg")
+        print(f"  original: {result['original']}")
+        print(f"  square: {result['square']}")
+        for size, path in result['thumbnails'].items():
+            print(f"  thumbnail {size[0]}x{size[1]}: {path}")
@@ -7,6 +7,8 @@ DROP TABLE IF EXISTS votes;
 DROP TABLE IF EXISTS comments;
 DROP TABLE IF EXISTS posts;
 DROP TABLE IF EXISTS network_metrics;
+DROP TABLE IF EXISTS network_metrics_minute;
+DROP TABLE IF EXISTS stored_images;
 DROP TABLE IF EXISTS users;
 
 -- Tabla de usuarios (básica)
@@ -36,7 +38,16 @@ CREATE TABLE posts (
     updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
     is_enhanced BOOLEAN DEFAULT 0,
     view_count INTEGER DEFAULT 0,
-    metadata TEXT -- JSON con información adicional
+    metadata TEXT, -- JSON con información adicional
+    -- Campos desnormalizados para el feed (se rellenan al publicar)
+    comment_count INTEGER NOT NULL DEFAULT 0,
+    thumbnail_path TEXT,
+    processing_method TEXT,
+    model_used TEXT,
+    espcn_applied BOOLEAN NOT NULL DEFAULT 0,
+    -- Ordenaciones del feed: puntuación neta y ranking "hot"
+    score INTEGER NOT NULL DEFAULT 0,
+    hot_score REAL NOT NULL DEFAULT 0
 );
 
 -- Tabla de comentarios
@@ -63,7 +74,9 @@ CREATE TABLE votes (
     user_ip TEXT NOT NULL, -- En producción usar user_id
     vote_type TEXT NOT NULL CHECK (vote_type IN ('up', 'down')),
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-    UNIQUE(post_id, user_ip, comment_id), -- Prevenir votos duplicados
+    target_key TEXT NOT NULL, -- 'post:<id>' o 'comment:<id>'
+    UNIQUE(post_id, user_ip, comment_id),
+    UNIQUE(target_key, user_ip), -- Prevenir votos duplicados (post_id o comment_id siempre es NULL)
     FOREIGN KEY (post_id) REFERENCES posts (id) ON DELETE CASCADE,
     FOREIGN KEY (comment_id) REFERENCES comments (id) ON DELETE CASCADE
 );
@@ -79,6 +92,30 @@ CREATE TABLE network_metrics (
     timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP
 );
 
+-- Mediciones de red agregadas por cliente y minuto (retención larga)
+CREATE TABLE network_metrics_minute (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    minute TIMESTAMP NOT NULL,
+    user_ip TEXT,
+    samples INTEGER NOT NULL DEFAULT 0,
+    bandwidth_sum REAL NOT NULL DEFAULT 0,
+    bandwidth_min REAL,
+    bandwidth_max REAL,
+    latency_sum REAL NOT NULL DEFAULT 0,
+    latency_min REAL,
+    latency_max REAL,
+    UNIQUE(minute, user_ip)
+);
+
+-- Objetos del almacén por contenido y número de posts que los referencian
+CREATE TABLE stored_images (
+    digest TEXT PRIMARY KEY, -- SHA-256 del contenido
+    path TEXT UNIQUE NOT NULL,
+    size INTEGER,
+    ref_count INTEGER NOT NULL DEFAULT 0,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
 -- Tabla de estadísticas de uso
 CREATE TABLE usage_stats (
     id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -95,12 +132,20 @@ CREATE INDEX idx_posts_created_at ON posts(created_at DESC);
 CREATE INDEX idx_posts_score ON posts((upvotes - downvotes) DESC);
 CREATE INDEX idx_posts_subreddit ON posts(subreddit);
 CREATE INDEX idx_posts_username ON posts(username);
+-- Paginación por cursor (orden, id) con y sin subreddit
+CREATE INDEX ix_post_hot ON posts(hot_score, id);
+CREATE INDEX ix_post_top ON posts(score, id);
+CREATE INDEX ix_post_new ON posts(created_at, id);
+CREATE INDEX ix_post_subreddit_hot ON posts(subreddit, hot_score, id);
+CREATE INDEX ix_post_subreddit_top ON posts(subreddit, score, id);
+CREATE INDEX ix_post_subreddit_new ON posts(subreddit, created_at, id);
 CREATE INDEX idx_comments_post_id ON comments(post_id);
 CREATE INDEX idx_comments_created_at ON comments(created_at);
 CREATE INDEX idx_votes_post_id ON votes(post_id);
 CREATE INDEX idx_votes_comment_id ON votes(comment_id);
 CREATE INDEX idx_votes_user_ip ON votes(user_ip);
 CREATE INDEX idx_network_metrics_timestamp ON network_metrics(timestamp);
+CREATE INDEX ix_network_metrics_minute_minute ON network_metrics_minute(minute);
 
 -- Triggers para mantener contadores actualizados
 CREATE TRIGGER update_post_votes_after_vote_insert
@@ -188,6 +233,10 @@ INSERT INTO comments (post_id, username, content, upvotes, downvotes) VALUES
 (4, 'tech_enthusiast', 'El contraste nocturno quedó perfecto', 9, 1),
 (5, 'admin', 'Excelente técnica macro, se ven todos los detalles', 6, 0);
 
+UPDATE posts SET comment_count = (SELECT COUNT(*) FROM comments WHERE comments.post_id = posts.id);
+-- hot_score lo calcula `flask --app app backfill-post-columns`
+UPDATE posts SET score = upvotes - downvotes;
+
 INSERT INTO network_metrics (user_ip, bandwidth, latency, quality, recommended_compression) VALUES
 ('192.168.1.100', 85.5, 45, 'good', 32),
 ('192.168.1.101', 32.1, 120, 'medium', 16),
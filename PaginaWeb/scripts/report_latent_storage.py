@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+"""
+Informe de almacenamiento en latentes (.dzl) frente a JPEG
+Para cada autoencoder compara bytes en disco, latencia de decodificación y
+PSNR respecto a la salida float del modelo sobre un conjunto de imágenes
+"""
+
+import argparse
+import io
+import os
+import sys
+import time
+
+import numpy as np
+from PIL import Image, ImageDraw, ImageFilter
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BASE_DIR)
+import latent_codec
+from model_registry import ModelRegistry
+from image_inference import image_to_tensor, tensor_to_array
+
+LEVELS = (8, 16, 32)
+JPEG_QUALITY = 95  # misma calidad que el cliente y /submit_raw
+
+
+def synthetic_images(count, seed=0):
+    """Imágenes de muestra con degradados, formas y algo de ruido (768x1024)"""
+    rng = np.random.default_rng(seed)
+    images = []
+    for _ in range(count):
+        y, x = np.mgrid[0:1024, 0:768].astype(np.float32)
+        base = np.stack([
+            128 + 100 * np.sin(x / rng.uniform(60, 200) + rng.uniform(0, 6)),
+            128 + 100 * np.cos(y / rng.uniform(60, 200) + rng.uniform(0, 6)),
+            128 + 100 * np.sin((x + y) / rng.uniform(80, 300)),
+        ], axis=-1)
+        img = Image.fromarray(np.clip(base, 0, 255).astype(np.uint8))
+        draw = ImageDraw.Draw(img)
+        for _ in range(12):
+            x0, y0 = rng.integers(0, 700), rng.integers(0, 950)
+            size = rng.integers(30, 250)
+            draw.ellipse([x0, y0, x0 + size, y0 + size], fill=tuple(int(c) for c in rng.integers(0, 255, 3)))
+        img = img.filter(ImageFilter.GaussianBlur(1.5))
+        noisy = np.asarray(img, dtype=np.float32) + rng.normal(0, 4, (1024, 768, 3))
+        images.append(Image.fromarray(np.clip(noisy, 0, 255).astype(np.uint8)))
+    return images
+
+
+def load_images(directory):
+    """Imágenes de un directorio, redimensionadas a la entrada de los autoencoders"""
+    images = []
+    for name in sorted(os.listdir(directory)):
+        if name.lower().endswith(('.jpg', '.jpeg', '.png', '.webp')):
+            with Image.open(os.path.join(directory, name)) as img:
+                images.append(img.convert('RGB').resize((768, 1024), Image.LANCZOS))
+    return images
+
+
+def psnr(reference, candidate):
+    mse = np.mean((reference.astype(np.float32) - candidate.astype(np.float32)) ** 2)
+    return float('inf') if mse == 0 else 10 * np.log10(255.0 ** 2 / mse)
+
+
+def timed(fn, repeat):
+    """Mediana en milisegundos de `repeat` ejecuciones"""
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        times.append((time.perf_counter() - start) * 1000)
+    return float(np.median(times))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Latentes .dzl frente a JPEG')
+    parser.add_argument('--images', help='Directorio de imágenes (por defecto, muestras sintéticas)')
+    parser.add_argument('--count', type=int, default=6, help='Número de imágenes sintéticas')
+    parser.add_argument('--repeat', type=int, default=3, help='Repeticiones para medir latencia')
+    parser.add_argument('--models-dir', default=os.path.join(BASE_DIR, 'static', 'models'))
+    args = parser.parse_args()
+
+    images = load_images(args.images) if args.images else synthetic_images(args.count)
+    registry = ModelRegistry(args.models_dir)
+
+    print("📊 Almacenamiento en latentes frente a JPEG")
+    print("=" * 60)
+    print(f"   Imágenes: {len(images)} ({'directorio ' + args.images if args.images else 'sintéticas'})")
+    print()
+    print(f"{'Modelo':<18}{'JPEG (KB)':>11}{'DZL (KB)':>10}{'Ratio':>8}"
+          f"{'Dec. JPEG':>11}{'Dec. DZL':>10}{'PSNR JPEG':>11}{'PSNR DZL':>10}")
+
+    for level in LEVELS:
+        model_id = f'autoencoder_b{level}'
+        encoder = registry.get(f'{model_id}_encoder')
+        decoder = registry.get(f'{model_id}_decoder')
+
+        jpeg_sizes, latent_sizes = [], []
+        jpeg_ms, latent_ms = [], []
+        jpeg_psnr, latent_psnr = [], []
+        for img in images:
+            latent = encoder.run(image_to_tensor(img))
+            reference = tensor_to_array(decoder.run(latent))
+
+            # Camino actual: salida del autoencoder codificada como JPEG
+            buffer = io.BytesIO()
+            Image.fromarray(reference).save(buffer, 'JPEG', quality=JPEG_QUALITY)
+            jpeg_bytes = buffer.getvalue()
+            jpeg_sizes.append(len(jpeg_bytes))
+            jpeg_ms.append(timed(lambda: Image.open(io.BytesIO(jpeg_bytes)).load(), args.repeat))
+            jpeg_psnr.append(psnr(reference, np.asarray(Image.open(io.BytesIO(jpeg_bytes)))))
+
+            # Latente cuantizado: se decodifica con el decodificador del modelo
+            latent_bytes = latent_codec.encode_latent(model_id, latent)
+            latent_sizes.append(len(latent_bytes))
+
+            def decode():
+                _, restored = latent_codec.decode_latent(latent_bytes)
+                return tensor_to_array(decoder.run(restored))
+
+            latent_ms.append(timed(decode, args.repeat))
+            latent_psnr.append(psnr(reference, decode()))
+
+        jpeg_kb = np.mean(jpeg_sizes) / 1024
+        latent_kb = np.mean(latent_sizes) / 1024
+        print(f"{model_id:<18}{jpeg_kb:>11.1f}{latent_kb:>10.1f}{latent_kb / jpeg_kb:>8.2f}"
+              f"{np.median(jpeg_ms):>9.1f}ms{np.median(latent_ms):>8.1f}ms"
+              f"{np.mean(jpeg_psnr):>9.1f}dB{np.mean(latent_psnr):>8.1f}dB")
+
+    print()
+    print("PSNR respecto a la salida float del autoencoder (pérdida añadida por el almacenamiento)")
+
+
+if __name__ == "__main__":
+    main()
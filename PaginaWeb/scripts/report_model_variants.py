@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+"""
+Informe de variantes cuantizadas (INT8 dinámico, INT8 estático, FP16)
+Para cada uno de los cuatro modelos compara tamaño en disco, latencia en CPU
+y PSNR/SSIM de la salida respecto a la variante FP32
+"""
+
+import argparse
+import os
+import sys
+
+import numpy as np
+import onnxruntime as ort
+from PIL import Image
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BASE_DIR)
+from model_registry import MODEL_VARIANTS, variant_filename
+from image_inference import image_to_tensor, tensor_to_array
+from report_latent_storage import load_images, synthetic_images, psnr, timed
+
+MODELS = ['espcn_model.onnx', 'autoencoder_b8.onnx', 'autoencoder_b16.onnx', 'autoencoder_b32.onnx']
+
+
+def ssim(reference, candidate, window=7):
+    """SSIM medio por canal con ventana uniforme (como skimage por defecto)"""
+    c1, c2 = (0.01 * 255) ** 2, (0.03 * 255) ** 2
+
+    def local_mean(x):
+        # Suma en ventanas window x window con una imagen integral
+        integral = np.pad(x, ((1, 0), (1, 0))).cumsum(0).cumsum(1)
+        sums = (integral[window:, window:] - integral[:-window, window:]
+                - integral[window:, :-window] + integral[:-window, :-window])
+        return sums / window ** 2
+
+    scores = []
+    for channel in range(reference.shape[2]):
+        x = reference[..., channel].astype(np.float64)
+        y = candidate[..., channel].astype(np.float64)
+        mu_x, mu_y = local_mean(x), local_mean(y)
+        var_x = local_mean(x * x) - mu_x ** 2
+        var_y = local_mean(y * y) - mu_y ** 2
+        covariance = local_mean(x * y) - mu_x * mu_y
+        score = ((2 * mu_x * mu_y + c1) * (2 * covariance + c2)) / \
+                ((mu_x ** 2 + mu_y ** 2 + c1) * (var_x + var_y + c2))
+        scores.append(score.mean())
+    return float(np.mean(scores))
+
+
+def session(path, threads):
+    options = ort.SessionOptions()
+    options.intra_op_num_threads = threads
+    return ort.InferenceSession(path, options, providers=['CPUExecutionProvider'])
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Variantes INT8/FP16 frente a FP32')
+    parser.add_argument('--images', help='Directorio de imágenes (por defecto, muestras sintéticas)')
+    parser.add_argument('--count', type=int, default=4, help='Número de imágenes sintéticas')
+    parser.add_argument('--repeat', type=int, default=3, help='Repeticiones para medir latencia')
+    parser.add_argument('--threads', type=int, default=0, help='Hilos intra-op de ONNX Runtime (0 = auto)')
+    parser.add_argument('--espcn-size', default='256x192',
+                        help='Entrada de ESPCN (alto x ancho); la salida es x4')
+    parser.add_argument('--models-dir', default=os.path.join(BASE_DIR, 'static', 'models'))
+    args = parser.parse_args()
+
+    images = load_images(args.images) if args.images else synthetic_images(args.count)
+    espcn_height, espcn_width = (int(part) for part in args.espcn_size.split('x'))
+
+    print("📊 Variantes cuantizadas frente a FP32 (CPU)")
+    print("=" * 72)
+    print(f"   Imágenes: {len(images)} ({'directorio ' + args.images if args.images else 'sintéticas'})")
+    print()
+    print(f"{'Modelo':<18}{'Variante':<14}{'KB':>8}{'ms/img':>9}{'Speedup':>9}{'PSNR':>9}{'SSIM':>8}")
+
+    for filename in MODELS:
+        fp32_path = os.path.join(args.models_dir, filename)
+        if not os.path.exists(fp32_path):
+            print(f"⚠️  {filename} no disponible")
+            continue
+
+        if filename.startswith('espcn'):
+            tensors = [image_to_tensor(img.resize((espcn_width, espcn_height), Image.LANCZOS)) for img in images]
+        else:
+            tensors = [image_to_tensor(img) for img in images]
+
+        fp32 = session(fp32_path, args.threads)
+        references = [tensor_to_array(fp32.run(None, {'input': tensor})[0]) for tensor in tensors]
+        fp32_ms = None
+
+        for variant in MODEL_VARIANTS:
+            path = os.path.join(args.models_dir, variant_filename(filename, variant))
+            if not os.path.exists(path):
+                continue
+            model = fp32 if variant == 'fp32' else session(path, args.threads)
+
+            outputs = [tensor_to_array(model.run(None, {'input': tensor})[0]) for tensor in tensors]
+            ms = np.median([timed(lambda: model.run(None, {'input': tensor}), args.repeat) for tensor in tensors])
+            fp32_ms = fp32_ms or ms
+
+            if variant == 'fp32':
+                quality = f"{'-':>9}{'-':>8}"
+            else:
+                psnr_db = np.mean([psnr(ref, out) for ref, out in zip(references, outputs)])
+                ssim_score = np.mean([ssim(ref, out) for ref, out in zip(references, outputs)])
+                quality = f"{psnr_db:>7.1f}dB{ssim_score:>8.4f}"
+
+            print(f"{filename[:-5]:<18}{variant:<14}{os.path.getsize(path) / 1024:>8.0f}"
+                  f"{ms:>9.1f}{fp32_ms / ms:>8.2f}x{quality}")
+
+    print()
+    print(f"PSNR/SSIM de la salida (uint8) respecto a FP32; ESPCN con entrada {args.espcn_size}, "
+          f"autoencoders con 1024x768")
+
+
+if __name__ == "__main__":
+    main()
@@ -4,12 +4,15 @@ Script para configurar los modelos de Dyzen
 Desarrollado por Grupo 1 - SCM
 """
 
+import argparse
 import os
 import shutil
-import torch
+import sys
 
-def setup_model_directory():
-    """Crear directorio de modelos y verificar archivos"""
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def setup_model_directory(check_torchscript=False):
+    """Crear directorio de modelos y verificar archivos (cargarlos con PyTorch solo si se pide)"""
     
     # Crear directorio models si no existe
     models_dir = 'models'
@@ -36,7 +39,9 @@ def setup_model_directory():
         if os.path.exists(model_path):
             # Verificar que el archivo sea válido
             try:
-                model = torch.jit.load(model_path, map_location='cpu')
+                if check_torchscript:
+                    import torch
+                    model = torch.jit.load(model_path, map_location='cpu')
                 file_size = os.path.getsize(model_path) / (1024 * 1024)  # MB
                 print(f"  {model_name} - {file_size:.1f}MB - Válido")
                 found_models.append(model_name)
@@ -65,6 +70,7 @@ def setup_model_directory():
 def test_model_compatibility():
     """Probar que los modelos funcionen correctamente"""
     print("\nProbando compatibilidad de modelos:")
+    import torch
     
     device = torch.device('cuda' if torch.cuda.is_available() else 'cpu')
     print(f"  Dispositivo: {device}")
@@ -122,6 +128,33 @@ def test_model_compatibility():
     print(f"\nResultado: {success_count}/4 modelos funcionando")
     return success_count
 
+def check_onnx_models():
+    """Cargar y calentar los modelos ONNX como un worker del servidor (sin PyTorch)"""
+    sys.path.insert(0, BASE_DIR)
+    from model_registry import ModelRegistry, MODEL_FILES
+    
+    models_dir = os.path.join(BASE_DIR, 'static', 'models')
+    registry = ModelRegistry(models_dir, artifacts_dir=os.path.join(models_dir, 'optimized'))
+    print("\nProbando modelos ONNX del servidor:")
+    
+    working = 0
+    for name in MODEL_FILES:
+        if not registry.is_available(name):
+            print(f"  {name} - No encontrado")
+            continue
+        try:
+            model = registry.warmup(name)
+            source = 'precompilado' if model.from_cache else 'original'
+            print(f"  {name} - carga {model.load_time * 1000:.1f} ms ({source}), "
+                  f"primera inferencia {model.warmup_time * 1000:.1f} ms")
+            working += 1
+        except Exception as e:
+            print(f"  {name} - Error: {e}")
+    
+    print(f"\nResultado: {working}/{len(MODEL_FILES)} modelos ONNX funcionando")
+    print(f"  PyTorch importado: {'sí' if 'torch' in sys.modules else 'no'}")
+    return working
+
 def create_readme():
     """Crear README para el directorio de modelos"""
     readme_content = """# Modelos de Dyzen
@@ -172,13 +205,21 @@ Grupo 1 - SCM
 
 def main():
     """Función principal del setup"""
+    parser = argparse.ArgumentParser(description='Configurar los modelos de Dyzen')
+    parser.add_argument('--torchscript', action='store_true',
+                        help='Validar también los modelos .pt con PyTorch (lento; no hace falta para servir)')
+    args = parser.parse_args()
+    
     print("Configuración de Modelos para Dyzen")
     print("=" * 50)
     
     # Configurar directorio
-    models_ready = setup_model_directory()
+    models_ready = setup_model_directory(check_torchscript=args.torchscript)
+    
+    # Los modelos que usa el servidor son los ONNX: se prueban sin PyTorch
+    check_onnx_models()
     
-    if models_ready:
+    if models_ready and args.torchscript:
         # Probar modelos si están todos presentes
         working_models = test_model_compatibility()
         
@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+"""
+Script para verificar la inferencia ESPCN por mosaicos
+Compara la salida por mosaicos con la de imagen completa
+"""
+
+import os
+import sys
+
+import numpy as np
+import onnxruntime as ort
+from PIL import Image
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from image_inference import image_to_tensor, tensor_to_array, fixed_spatial_shape, run_tiled
+
+# Diferencia máxima admitida por píxel (truncado a uint8 tras operaciones float32)
+TOLERANCE = 1
+
+
+def build_dynamic_espcn(scale=2, seed=0):
+    """Construir un ESPCN sintético con ejes espaciales dinámicos"""
+    from onnx import helper, TensorProto, numpy_helper
+
+    rng = np.random.default_rng(seed)
+
+    def weights(name, shape):
+        return numpy_helper.from_array((rng.standard_normal(shape) * 0.1).astype(np.float32), name)
+
+    # Misma estructura que el ESPCN entrenado: conv5 -> conv3 -> conv3 -> PixelShuffle
+    initializers = [
+        weights('w1', (16, 3, 5, 5)), weights('b1', (16,)),
+        weights('w2', (8, 16, 3, 3)), weights('b2', (8,)),
+        weights('w3', (3 * scale * scale, 8, 3, 3)), weights('b3', (3 * scale * scale,)),
+    ]
+    nodes = [
+        helper.make_node('Conv', ['input', 'w1', 'b1'], ['c1'], pads=[2, 2, 2, 2]),
+        helper.make_node('Tanh', ['c1'], ['t1']),
+        helper.make_node('Conv', ['t1', 'w2', 'b2'], ['c2'], pads=[1, 1, 1, 1]),
+        helper.make_node('Tanh', ['c2'], ['t2']),
+        helper.make_node('Conv', ['t2', 'w3', 'b3'], ['c3'], pads=[1, 1, 1, 1]),
+        helper.make_node('DepthToSpace', ['c3'], ['d'], blocksize=scale, mode='CRD'),
+        helper.make_node('Sigmoid', ['d'], ['output']),
+    ]
+    graph = helper.make_graph(
+        nodes, 'espcn_sintetico',
+        [helper.make_tensor_value_info('input', TensorProto.FLOAT, ['batch_size', 3, 'height', 'width'])],
+        [helper.make_tensor_value_info('output', TensorProto.FLOAT, ['batch_size', 3, 'out_height', 'out_width'])],
+        initializers
+    )
+    model = helper.make_model(graph, opset_imports=[helper.make_opsetid('', 11)])
+    model.ir_version = 7  # IR compatible con opset 11 y ONNX Runtime 1.16
+    return model.SerializeToString()
+
+
+def random_image(width, height, seed=0):
+    """Imagen de prueba con ruido suave"""
+    rng = np.random.default_rng(seed)
+    base = rng.integers(0, 256, (height // 8 + 1, width // 8 + 1, 3), dtype=np.uint8)
+    img = Image.fromarray(base).resize((width, height), Image.BILINEAR)
+    return img
+
+
+def compare(session, img, **tile_args):
+    """Diferencia máxima entre la salida completa y la salida por mosaicos"""
+    input_name = session.get_inputs()[0].name
+
+    def run(batch):
+        return session.run(None, {input_name: batch})[0]
+
+    whole = tensor_to_array(run(image_to_tensor(img)))
+    tiled = np.asarray(run_tiled(img, run, **tile_args))
+
+    if whole.shape != tiled.shape:
+        raise AssertionError(f"Formas distintas: {whole.shape} vs {tiled.shape}")
+    return int(np.abs(whole.astype(np.int16) - tiled.astype(np.int16)).max())
+
+
+def main():
+    """Verificar el modelo sintético dinámico y el modelo ESPCN real"""
+    print("🔍 Verificando inferencia por mosaicos")
+    print("=" * 60)
+    failures = 0
+
+    session = ort.InferenceSession(build_dynamic_espcn(), providers=['CPUExecutionProvider'])
+    cases = [
+        ((300, 200), dict(tile_size=64, halo=8, batch_size=1)),
+        ((257, 129), dict(tile_size=64, halo=8, batch_size=4)),
+        ((100, 75), dict(tile_size=32, halo=4, batch_size=3)),
+        ((64, 64), dict(tile_size=256, halo=8, batch_size=2)),
+    ]
+    for (width, height), tile_args in cases:
+        diff = compare(session, random_image(width, height), **tile_args)
+        ok = diff <= TOLERANCE
+        failures += not ok
+        print(f"  {'✅' if ok else '❌'} Sintético {width}x{height} {tile_args}: diferencia máxima {diff}")
+
+    # Modelo real: con ejes fijos, la imagen de tamaño exacto es un único mosaico
+    espcn_path = 'static/models/espcn_model.onnx'
+    if os.path.exists(espcn_path):
+        session = ort.InferenceSession(espcn_path, providers=['CPUExecutionProvider'])
+        fixed_shape = fixed_spatial_shape(session.get_inputs()[0].shape)
+        if fixed_shape:
+            img = random_image(fixed_shape[1], fixed_shape[0])
+            diff = compare(session, img, halo=8, batch_size=1, fixed_shape=fixed_shape)
+        else:
+            diff = compare(session, random_image(800, 600), tile_size=256, halo=8, batch_size=2)
+        ok = diff <= TOLERANCE
+        failures += not ok
+        print(f"  {'✅' if ok else '❌'} ESPCN real: diferencia máxima {diff}")
+    else:
+        print(f"⚠️  Modelo no encontrado: {espcn_path}")
+
+    print("=" * 60)
+    if failures:
+        print(f"❌ {failures} casos fuera de tolerancia")
+        sys.exit(1)
+    print("🎉 Salida por mosaicos equivalente a la imagen completa")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+"""
+Cargas útiles para medir el ancho de banda del cliente
+Los bytes de descarga se sirven desde un bloque aleatorio generado una sola
+vez en memoria (sin disco ni os.urandom por petición), con soporte de
+peticiones Range. La subida se consume por bloques sin guardarla.
+"""
+
+import os
+import threading
+
+from werkzeug.exceptions import RequestEntityTooLarge
+
+MIN_PAYLOAD_BYTES = 64 * 1024
+MAX_PAYLOAD_BYTES = 50 * 1024 * 1024
+CHUNK_SIZE = 64 * 1024
+
+# Bloque aleatorio que se repite; 4 MB es mayor que la ventana de gzip/zstd
+# habituales, así que la carga no se puede comprimir en tránsito
+BLOCK_SIZE = 4 * 1024 * 1024
+
+_block = None
+_block_lock = threading.Lock()
+
+
+def payload_block():
+    """Bloque aleatorio compartido (se genera en la primera petición)"""
+    global _block
+    if _block is None:
+        with _block_lock:
+            if _block is None:
+                _block = os.urandom(BLOCK_SIZE)
+    return _block
+
+
+def iter_payload(start, end, chunk_size=CHUNK_SIZE):
+    """Bytes [start, end) de la carga: el byte i es block[i % BLOCK_SIZE]"""
+    block = payload_block()
+    position = start
+    while position < end:
+        offset = position % BLOCK_SIZE
+        length = min(chunk_size, end - position, BLOCK_SIZE - offset)
+        yield block[offset:offset + length]
+        position += length
+
+
+def resolve_range(range_header, size):
+    """
+    Intervalo [start, end) pedido por la cabecera Range
+
+    Returns:
+        (start, end) si hay un único rango satisfacible, None para servir la
+        carga completa (sin Range o con varios rangos) y ValueError si el rango
+        no se puede satisfacer
+    """
+    if range_header is None or len(range_header.ranges) != 1:
+        return None
+    if range_header.units != 'bytes':
+        return None
+    bounds = range_header.range_for_length(size)
+    if bounds is None:
+        raise ValueError("Rango no satisfacible")
+    return bounds
+
+
+def consume_stream(stream, max_bytes, chunk_size=CHUNK_SIZE):
+    """Leer y descartar un cuerpo por bloques; devuelve los bytes recibidos"""
+    received = 0
+    while True:
+        chunk = stream.read(chunk_size)
+        if not chunk:
+            return received
+        received += len(chunk)
+        if received > max_bytes:
+            raise RequestEntityTooLarge(f"La carga de prueba supera el límite de {max_bytes} bytes")
@@ -3,6 +3,14 @@
  * Dyzen - Sistema de compartición de imágenes adaptativo
  */
 
+// Límites de /api/speedtest (64 KB a 50 MB) y duración buscada de cada prueba
+const SPEEDTEST_MIN_BYTES = 64 * 1024
+const SPEEDTEST_MAX_BYTES = 50 * 1024 * 1024
+const SPEEDTEST_MAX_UPLOAD_BYTES = 8 * 1024 * 1024 // la subida se repite cada 30 s
+const SPEEDTEST_UPLOAD_BLOCK_BYTES = 1024 * 1024
+const SPEEDTEST_TARGET_SECONDS = 1
+const SPEEDTEST_MIN_TRANSFER_MS = 50 // por debajo, la transferencia se mide con la petición completa
+
 class NetworkSpeedTest {
   constructor() {
     this.testInProgress = false
@@ -26,36 +34,35 @@ class NetworkSpeedTest {
     this.callbacks.forEach((callback) => callback(this.lastResult))
   }
 
-  // Medir ancho de banda descargando un archivo de prueba
+  // Tamaño de prueba para que la transferencia dure unos targetSeconds con el ancho de banda estimado
+  payloadSize(bandwidthMbps, targetSeconds, maxBytes = SPEEDTEST_MAX_BYTES) {
+    const bytes = Math.round(((bandwidthMbps * 1024 * 1024) / 8) * targetSeconds)
+    return Math.min(maxBytes, Math.max(SPEEDTEST_MIN_BYTES, bytes))
+  }
+
+  // Medir ancho de banda descargando una carga generada por el servidor (/api/speedtest)
   async measureBandwidth() {
     if (this.testInProgress) return this.lastResult.bandwidth
 
     this.testInProgress = true
-    const startTime = performance.now()
-
-    // Usar un tamaño aleatorio entre 500KB y 2MB para evitar cacheo
-    const testFileSize = Math.floor(Math.random() * (2 - 0.5) + 0.5) * 1024 * 1024
+    const size = this.payloadSize(this.lastResult.bandwidth, SPEEDTEST_TARGET_SECONDS)
 
     // Añadir un parámetro aleatorio para evitar cacheo
-    const testUrl = `/static/test/speedtest.jpg?cache=${Date.now()}-${Math.random()}`
+    const testUrl = `/api/speedtest?size=${size}&t=${Date.now()}-${Math.random()}`
 
     try {
       console.log("Iniciando prueba de velocidad...")
-      const response = await fetch(testUrl, {
-        method: "GET",
-        cache: "no-store", // Importante: evitar cacheo
-        headers: {
-          "Cache-Control": "no-cache, no-store, must-revalidate",
-          Pragma: "no-cache",
-          Expires: "0",
-        },
-      })
+      const startTime = performance.now()
+      const response = await fetch(testUrl, { method: "GET", cache: "no-store" })
 
       if (!response.ok) throw new Error("Error en la prueba de velocidad")
 
+      // Medir desde la llegada de las cabeceras: la latencia de la petición no cuenta como transferencia
+      const headersTime = performance.now()
       const data = await response.blob()
       const endTime = performance.now()
-      const durationSeconds = (endTime - startTime) / 1000
+      const transferMs = endTime - headersTime
+      const durationSeconds = (transferMs >= SPEEDTEST_MIN_TRANSFER_MS ? transferMs : endTime - startTime) / 1000
 
       // Calcular velocidad en Mbps
       const fileSizeInBits = data.size * 8
@@ -69,10 +76,44 @@ class NetworkSpeedTest {
     } catch (error) {
       console.error("Error en prueba de velocidad:", error)
       this.testInProgress = false
+      return this.lastResult.bandwidth
+    }
+  }
 
-      // Generar un valor aleatorio para simular variación cuando hay error
-      // const randomBandwidth = Math.random() * 80 + 20 // Entre 20 y 100 Mbps
-      // return randomBandwidth
+  // Bloque aleatorio reutilizado en las subidas (getRandomValues admite 64 KB por llamada)
+  uploadBlock() {
+    if (!this.randomBlock) {
+      this.randomBlock = new Uint8Array(SPEEDTEST_UPLOAD_BLOCK_BYTES)
+      for (let offset = 0; offset < this.randomBlock.length; offset += 65536) {
+        crypto.getRandomValues(this.randomBlock.subarray(offset, offset + 65536))
+      }
+    }
+    return this.randomBlock
+  }
+
+  // Medir la subida enviando una carga aleatoria que el servidor descarta
+  async measureUplink() {
+    const size = this.payloadSize(this.lastResult.uplink || 10, SPEEDTEST_TARGET_SECONDS, SPEEDTEST_MAX_UPLOAD_BYTES)
+    const block = this.uploadBlock()
+    const parts = []
+    for (let remaining = size; remaining > 0; remaining -= block.length) {
+      parts.push(remaining >= block.length ? block : block.subarray(0, remaining))
+    }
+
+    try {
+      const startTime = performance.now()
+      const response = await fetch(`/api/speedtest/upload?t=${Date.now()}`, {
+        method: "POST",
+        headers: { "Content-Type": "application/octet-stream" },
+        body: new Blob(parts),
+      })
+      if (!response.ok) throw new Error("Error en la prueba de subida")
+      const result = await response.json()
+      const durationSeconds = (performance.now() - startTime) / 1000
+      return Math.max(0.1, (result.bytes * 8) / durationSeconds / (1024 * 1024))
+    } catch (error) {
+      console.error("Error en prueba de subida:", error)
+      return this.lastResult.uplink
     }
   }
 
@@ -123,8 +164,9 @@ class NetworkSpeedTest {
   // Realizar una prueba completa
   async runTest() {
     try {
-      // Medir ancho de banda y latencia
+      // Medir ancho de banda y latencia; la subida después, para no competir con la descarga
       const [bandwidth, latency] = await Promise.all([this.measureBandwidth(), this.measureLatency()])
+      const uplink = await this.measureUplink()
 
       // Analizar condiciones
       const { quality, compression } = this.analyzeConditions(bandwidth, latency)
@@ -133,6 +175,7 @@ class NetworkSpeedTest {
       this.lastResult = {
         bandwidth: Math.round(bandwidth * 10) / 10, // Redondear a 1 decimal
         latency: Math.round(latency),
+        uplink: uplink ? Math.round(uplink * 10) / 10 : undefined,
         quality,
         compression,
       }
@@ -16,7 +16,7 @@ class ONNXImageProcessor {
     this.ctx = this.canvas.getContext("2d")
 
     // Inicializar ONNX.js
-    this.initONNX()
+    this.modelInfoReady = this.initONNX()
   }
 
   async initONNX() {
@@ -309,23 +309,13 @@ class ONNXImageProcessor {
       return availability
     }
 
-    // Verificar autoencoders
+    // models_info.json se genera junto con los modelos: basta con él, sin una petición HEAD por modelo
+    await this.modelInfoReady
+    const models = (this.modelInfo && this.modelInfo.models) || {}
     for (const level of [8, 16, 32]) {
-      try {
-        const response = await fetch(`/static/models/autoencoder_b${level}.onnx`, { method: "HEAD" })
-        availability.autoencoders[level] = response.ok
-      } catch {
-        availability.autoencoders[level] = false
-      }
-    }
-
-    // Verificar ESPCN
-    try {
-      const response = await fetch("/static/models/espcn_model.onnx", { method: "HEAD" })
-      availability.espcn = response.ok
-    } catch {
-      availability.espcn = false
+      availability.autoencoders[level] = Boolean(models.autoencoders && models.autoencoders[level])
     }
+    availability.espcn = Boolean(models.enhancement && models.enhancement.espcn)
 
     console.log("📊 Disponibilidad de modelos:", availability)
     return availability
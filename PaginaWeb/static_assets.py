@@ -0,0 +1,107 @@
+"""
+Servicio de archivos estáticos
+ETags fuertes por contenido (SHA-256, cacheado por tamaño y fecha de
+modificación), copias precomprimidas en gzip/brotli junto al original y
+elección de la codificación según Accept-Encoding. El envío en sí lo hace
+send_file, que usa wsgi.file_wrapper (sendfile en gunicorn) o X-Sendfile.
+"""
+
+import gzip
+import os
+import threading
+
+from content_store import file_digest
+
+try:
+    import brotli
+except ImportError:  # brotli es opcional: sin él solo se generan copias gzip
+    brotli = None
+
+# Extensión de la copia precomprimida por codificación, en orden de preferencia
+ENCODINGS = (('br', '.br'), ('gzip', '.gz'))
+
+# Solo se guarda la copia si ahorra al menos un 5 %
+MIN_SAVINGS = 0.05
+
+
+class ETagCache:
+    """SHA-256 de archivos, recalculado solo si cambian tamaño o fecha de modificación"""
+
+    def __init__(self):
+        self._digests = {}
+        self._lock = threading.Lock()
+
+    def get(self, path):
+        stat = os.stat(path)
+        key = (stat.st_size, stat.st_mtime_ns)
+        with self._lock:
+            cached = self._digests.get(path)
+        if cached and cached[0] == key:
+            return cached[1]
+        digest = file_digest(path)
+        with self._lock:
+            self._digests[path] = (key, digest)
+        return digest
+
+
+def precompressed_variant(path, accept_encodings):
+    """
+    (codificación, ruta) de la mejor copia precomprimida aceptada por el cliente
+
+    `accept_encodings` es request.accept_encodings. Las copias más antiguas que
+    el original se ignoran. Devuelve (None, path) si no hay ninguna utilizable.
+    """
+    source_mtime = None
+    for encoding, ext in ENCODINGS:
+        if not accept_encodings[encoding]:
+            continue
+        candidate = path + ext
+        try:
+            candidate_mtime = os.stat(candidate).st_mtime_ns
+        except OSError:
+            continue
+        if source_mtime is None:
+            source_mtime = os.stat(path).st_mtime_ns
+        if candidate_mtime >= source_mtime:
+            return encoding, candidate
+    return None, path
+
+
+def _compress(data, encoding):
+    if encoding == 'br':
+        return brotli.compress(data, quality=11)
+    return gzip.compress(data, compresslevel=9, mtime=0)
+
+
+def precompress(directory, extensions):
+    """
+    Escribir copias .gz (y .br si brotli está instalado) de los archivos con
+    esas extensiones directamente en `directory`
+
+    Returns:
+        Lista de (archivo, codificación, bytes originales, bytes comprimidos o None si no compensa)
+    """
+    encodings = [(encoding, ext) for encoding, ext in ENCODINGS if encoding != 'br' or brotli]
+    results = []
+    for name in sorted(os.listdir(directory)):
+        path = os.path.join(directory, name)
+        if not name.endswith(tuple(extensions)) or not os.path.isfile(path):
+            continue
+        with open(path, 'rb') as f:
+            data = f.read()
+
+        for encoding, ext in encodings:
+            target = path + ext
+            compressed = _compress(data, encoding)
+            if len(compressed) > len(data) * (1 - MIN_SAVINGS):
+                # No compensa: quitar una copia anterior para no servirla
+                if os.path.exists(target):
+                    os.remove(target)
+                results.append((name, encoding, len(data), None))
+                continue
+            temp_path = target + '.tmp'
+            with open(temp_path, 'wb') as f:
+                f.write(compressed)
+            os.replace(temp_path, target)
+            results.append((name, encoding, len(data), len(compressed)))
+    return results
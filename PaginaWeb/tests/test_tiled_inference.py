@@ -0,0 +1,77 @@
+"""
+La inferencia por mosaicos debe dar la misma imagen que la inferencia de una
+sola pasada (salvo redondeo) para modelos convolucionales cuyo campo receptivo
+cabe en el halo
+"""
+
+import os
+import sys
+
+import numpy as np
+import pytest
+from PIL import Image
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from image_inference import image_to_tensor, run_tiled, tensor_to_array  # noqa: E402
+
+SCALE = 2
+
+
+def fake_super_resolution(batch):
+    """Modelo de prueba: desenfoque 3x3 (campo receptivo de 1 píxel) y escalado x2 por vecino más próximo"""
+    padded = np.pad(batch, ((0, 0), (0, 0), (1, 1), (1, 1)), mode='edge')
+    height, width = batch.shape[2:]
+    blurred = sum(padded[:, :, dy:dy + height, dx:dx + width] for dy in range(3) for dx in range(3)) / 9.0
+    return blurred.repeat(SCALE, axis=2).repeat(SCALE, axis=3)
+
+
+@pytest.fixture
+def image():
+    rng = np.random.default_rng(0)
+    return Image.fromarray(rng.integers(0, 256, (45, 61, 3), dtype=np.uint8), 'RGB')
+
+
+def assert_close(tiled, image):
+    untiled = tensor_to_array(fake_super_resolution(image_to_tensor(image)))
+    tiled = np.asarray(tiled)
+    assert tiled.shape == untiled.shape == (image.height * SCALE, image.width * SCALE, 3)
+    assert np.abs(tiled.astype(np.int16) - untiled.astype(np.int16)).max() <= 1
+
+
+@pytest.mark.parametrize('tile_size, halo, batch_size', [
+    (16, 2, 1),
+    (16, 4, 3),
+    (20, 1, 4),
+    (64, 2, 1),   # una sola ventana: la imagen entera
+])
+def test_tiled_matches_untiled(image, tile_size, halo, batch_size):
+    calls = []
+
+    def run(batch):
+        calls.append(batch.shape)
+        return fake_super_resolution(batch)
+
+    tiled = run_tiled(image, run, tile_size=tile_size, halo=halo, batch_size=batch_size)
+
+    assert_close(tiled, image)
+    assert all(len(shape) == 4 and shape[0] <= batch_size for shape in calls)
+
+
+def test_tiled_matches_untiled_with_fixed_shape(image):
+    calls = []
+
+    def run(batch):
+        calls.append(batch.shape[2:])
+        return fake_super_resolution(batch)
+
+    tiled = run_tiled(image, run, halo=2, batch_size=2, fixed_shape=(24, 32))
+
+    assert_close(tiled, image)
+    assert set(calls) == {(24, 32)}
+    assert len(calls) > 1
+
+
+def test_halo_larger_than_tile_is_rejected(image):
+    with pytest.raises(ValueError):
+        run_tiled(image, fake_super_resolution, halo=2, fixed_shape=(4, 4))
@@ -0,0 +1,142 @@
+"""
+Subida de imágenes en binario por streaming
+El cuerpo multipart se escribe por bloques directamente en el directorio de
+destino, con límite de tamaño y validación del tipo de contenido
+"""
+
+import hashlib
+import os
+import tempfile
+
+from werkzeug.exceptions import RequestEntityTooLarge
+from werkzeug.formparser import parse_form_data
+
+# Tipos de imagen aceptados y su extensión
+ALLOWED_IMAGE_TYPES = {
+    'image/jpeg': '.jpg',
+    'image/png': '.png',
+    'image/webp': '.webp',
+}
+
+
+def sniff_image_type(header):
+    """Detectar el tipo real de imagen a partir de los primeros bytes"""
+    if header.startswith(b'\xff\xd8\xff'):
+        return 'image/jpeg'
+    if header.startswith(b'\x89PNG\r\n\x1a\n'):
+        return 'image/png'
+    if header[:4] == b'RIFF' and header[8:12] == b'WEBP':
+        return 'image/webp'
+    return None
+
+
+class CappedFile:
+    """Archivo temporal que deja de aceptar datos al superar max_bytes (calcula su SHA-256)"""
+
+    def __init__(self, fileobj, max_bytes):
+        self._file = fileobj
+        self.max_bytes = max_bytes
+        self.written = 0
+        self.sha256 = hashlib.sha256()
+
+    def write(self, data):
+        self.written += len(data)
+        if self.max_bytes and self.written > self.max_bytes:
+            raise RequestEntityTooLarge(f"La imagen supera el límite de {self.max_bytes} bytes")
+        self.sha256.update(data)
+        return self._file.write(data)
+
+    def __getattr__(self, name):
+        return getattr(self._file, name)
+
+
+class StreamedUpload:
+    """Resultado de parsear una petición multipart con archivos ya en disco"""
+
+    def __init__(self, form, files, temp_paths):
+        self.form = form
+        self.files = files
+        self._temp_paths = temp_paths
+
+    def validated_path(self, field):
+        """
+        Comprobar que el archivo de un campo es una imagen del tipo declarado
+
+        Returns:
+            (ruta_temporal, extensión)
+        """
+        storage = self.files.get(field)
+        if storage is None:
+            raise ValueError(f"Falta el archivo '{field}'")
+
+        fileobj = storage.stream
+        fileobj.flush()
+        temp_path = fileobj.name
+
+        with open(temp_path, 'rb') as f:
+            detected = sniff_image_type(f.read(16))
+        declared = (storage.mimetype or '').lower()
+        if detected is None or declared not in ALLOWED_IMAGE_TYPES or declared != detected:
+            raise ValueError(f"Tipo de contenido no permitido en '{field}': {declared or 'desconocido'}")
+        return temp_path, ALLOWED_IMAGE_TYPES[detected]
+
+    def store(self, field, content_store):
+        """
+        Validar el archivo de un campo y moverlo al almacén por contenido
+
+        Returns:
+            StoredFile con la ruta final, el hash y el tamaño
+        """
+        temp_path, ext = self.validated_path(field)
+        fileobj = self.files[field].stream
+        fileobj.close()
+        stored = content_store.put_file(temp_path, ext, digest=fileobj.sha256.hexdigest())
+        self._temp_paths.discard(temp_path)
+        return stored
+
+    def cleanup(self):
+        """Borrar los temporales que no se llegaron a finalizar"""
+        for storage in self.files.values():
+            try:
+                storage.stream.close()
+            except Exception:
+                pass
+        for temp_path in list(self._temp_paths):
+            try:
+                os.remove(temp_path)
+            except OSError:
+                pass
+        self._temp_paths.clear()
+
+
+def parse_streamed_upload(environ, upload_dir, max_file_bytes, max_request_bytes=None):
+    """
+    Parsear multipart escribiendo cada archivo por bloques en upload_dir
+
+    Los campos de texto quedan en memoria (son pequeños); las imágenes nunca
+    se cargan completas: Werkzeug pasa cada bloque a un temporal en el mismo
+    sistema de archivos que el destino, de modo que finalizar es un rename.
+    """
+    temp_paths = set()
+
+    def stream_factory(total_content_length, content_type, filename, content_length=None):
+        fileobj = tempfile.NamedTemporaryFile(dir=upload_dir, prefix='.upload_', delete=False)
+        temp_paths.add(fileobj.name)
+        return CappedFile(fileobj, max_file_bytes)
+
+    try:
+        _, form, files = parse_form_data(
+            environ,
+            stream_factory=stream_factory,
+            max_content_length=max_request_bytes,
+            silent=False
+        )
+    except Exception:
+        for temp_path in temp_paths:
+            try:
+                os.remove(temp_path)
+            except OSError:
+                pass
+        raise
+
+    return StreamedUpload(form, files, temp_paths)
@@ -0,0 +1,108 @@
+"""
+Buffer de escritura diferida para contadores de votos
+Acumula deltas en memoria y los aplica en lote desde un hilo en segundo plano
+"""
+
+import threading
+import time
+
+
+class CounterBuffer:
+    """Agrupa deltas (Δup, Δdown) por objetivo y los vuelca periódicamente"""
+
+    def __init__(self, flush_fn, flush_interval=1.0, max_pending=500):
+        self.flush_fn = flush_fn
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._thread = None
+
+        self.flushes = 0
+        self.flushed_deltas = 0
+        self.coalesced = 0
+        self.errors = 0
+
+    def start(self):
+        """Iniciar el hilo de volcado si aún no está en marcha"""
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._loop, name='vote-flush', daemon=True)
+                self._thread.start()
+
+    def add(self, key, up_delta, down_delta):
+        """Acumular un delta; key = ('post' | 'comment', id)"""
+        self.start()
+        with self._lock:
+            current = self._pending.get(key)
+            if current:
+                current[0] += up_delta
+                current[1] += down_delta
+                self.coalesced += 1
+            else:
+                self._pending[key] = [up_delta, down_delta]
+            full = len(self._pending) >= self.max_pending
+        if full:
+            self._wakeup.set()
+
+    def totals(self, key, read_fn):
+        """
+        (up, down) guardados más los deltas pendientes de un objetivo
+
+        `read_fn()` lee los contadores guardados y se llama con el volcado
+        bloqueado: ningún lote se aplica entre las dos lecturas, así que un
+        delta no se cuenta dos veces ni se pierde.
+        """
+        with self._flush_lock:
+            upvotes, downvotes = read_fn()
+            with self._lock:
+                up_delta, down_delta = self._pending.get(key, (0, 0))
+        return upvotes + up_delta, downvotes + down_delta
+
+    def flush(self):
+        """Aplicar los deltas acumulados; se reintentan si el volcado falla"""
+        with self._flush_lock:
+            with self._lock:
+                batch, self._pending = self._pending, {}
+            batch = {key: deltas for key, deltas in batch.items() if deltas[0] or deltas[1]}
+            if not batch:
+                return 0
+
+            try:
+                self.flush_fn(batch)
+            except Exception as e:
+                self.errors += 1
+                print(f"Error volcando contadores de votos: {e}")
+                # Devolver los deltas al buffer para el siguiente intento
+                with self._lock:
+                    for key, (up_delta, down_delta) in batch.items():
+                        current = self._pending.setdefault(key, [0, 0])
+                        current[0] += up_delta
+                        current[1] += down_delta
+                return 0
+
+            self.flushes += 1
+            self.flushed_deltas += len(batch)
+            return len(batch)
+
+    def _loop(self):
+        while True:
+            self._wakeup.wait(timeout=self.flush_interval)
+            self._wakeup.clear()
+            self.flush()
+
+    def stats(self):
+        """Estado del buffer"""
+        with self._lock:
+            pending = len(self._pending)
+        return {
+            'pending_targets': pending,
+            'flushes': self.flushes,
+            'flushed_deltas': self.flushed_deltas,
+            'coalesced_votes': self.coalesced,
+            'errors': self.errors,
+            'flush_interval': self.flush_interval,
+        }